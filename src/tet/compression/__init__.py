@@ -0,0 +1,236 @@
+"""
+Response compression for Tet applications.
+
+This module provides a tween that compresses response bodies with gzip, or
+with Brotli when the ``brotli`` package is installed and the client prefers
+it. It is included automatically when using the ``compression`` feature.
+
+Features
+--------
+
+- Content negotiation on the ``Accept-Encoding`` request header
+- Buffered bodies smaller than a threshold are sent uncompressed
+- Media types that are already compressed (images, archives, ...) are skipped
+- Streamed ``app_iter`` responses are compressed chunk by chunk
+- ``Vary: Accept-Encoding`` is added, and strong ETags are made weak
+
+Settings
+--------
+
+``tet.compression.min_size``
+    Minimum size in bytes of a body of known length to compress (default 1024)
+
+``tet.compression.level``
+    gzip compression level, 1-9 (default 6)
+
+``tet.compression.brotli_quality``
+    Brotli quality, 0-11 (default 4)
+
+Example
+-------
+
+Enabling compression::
+
+    from tet.config import application_factory
+
+    @application_factory(included_features=["renderers.json", "compression"])
+    def main(config):
+        config.scan()
+"""
+
+import zlib
+from typing import Callable, Iterable, Iterator, List
+
+from pyramid.config import Configurator
+from pyramid.tweens import INGRESS
+
+INCOMPRESSIBLE_TYPES = frozenset(
+    [
+        "application/gzip",
+        "application/pdf",
+        "application/vnd.rar",
+        "application/x-7z-compressed",
+        "application/x-bzip2",
+        "application/x-gzip",
+        "application/x-rar-compressed",
+        "application/x-xz",
+        "application/zip",
+        "application/zstd",
+        "font/woff",
+        "font/woff2",
+    ]
+)
+"""Media types that are never compressed, in addition to images (other than
+SVG), audio and video."""
+
+_INCOMPRESSIBLE_PREFIXES = ("image/", "audio/", "video/")
+
+
+def is_compressible(content_type: str) -> bool:
+    """Return ``True`` if a body of the given media type should be compressed."""
+    if not content_type:
+        return False
+
+    if content_type in INCOMPRESSIBLE_TYPES:
+        return False
+
+    if content_type.startswith(_INCOMPRESSIBLE_PREFIXES):
+        return content_type == "image/svg+xml"
+
+    return True
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compressor(self):
+        # wbits=31 writes a gzip header and trailer, with a zero timestamp
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def compress(self, body: bytes) -> bytes:
+        compressor = self.compressor()
+        return compressor.compress(body) + compressor.flush()
+
+    def iter_compress(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = self.compressor()
+        for chunk in chunks:
+            # flush after every chunk so that streamed chunks are not held back
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+
+        yield compressor.flush()
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int):
+        import brotli
+
+        self.brotli = brotli
+        self.quality = quality
+
+    def compress(self, body: bytes) -> bytes:
+        return self.brotli.compress(body, quality=self.quality)
+
+    def iter_compress(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = self.brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+
+        yield compressor.finish()
+
+
+def _make_encoders(settings) -> List:
+    encoders = [_GzipEncoder(int(settings.get("tet.compression.level", 6)))]
+    try:
+        quality = int(settings.get("tet.compression.brotli_quality", 4))
+        encoders.insert(0, _BrotliEncoder(quality))
+    except ImportError:
+        pass
+
+    return encoders
+
+
+def _closing_iter(chunks: Iterator[bytes], app_iter) -> Iterator[bytes]:
+    try:
+        yield from chunks
+    finally:
+        close = getattr(app_iter, "close", None)
+        if close is not None:
+            close()
+
+
+def _add_vary(response) -> None:
+    vary = response.vary or ()
+    if "Accept-Encoding" not in vary:
+        response.vary = tuple(vary) + ("Accept-Encoding",)
+
+
+def compress_response(request, response, encoders, min_size: int) -> None:
+    """
+    Compress the body of ``response`` in place, if eligible.
+
+    :param request: The current request
+    :param response: The response to compress
+    :param encoders: Available encoders, in order of server preference
+    :param min_size: Minimum size of a body of known length to compress
+    """
+    if response.status_code == 304:
+        # a 304 must carry the Vary of the 200 it stands for (RFC 9110,
+        # section 15.4.5); its media type is not known here, so the header
+        # is added to every 304
+        _add_vary(response)
+        return
+
+    if (
+        response.content_encoding
+        or response.status_code < 200
+        or response.status_code == 204
+        or not is_compressible(response.content_type)
+        or "no-transform" in (response.headers.get("Cache-Control") or "")
+    ):
+        return
+
+    _add_vary(response)
+
+    # only a list or tuple body is in memory; other iterators, such as the
+    # FileIter of a FileResponse, may have a Content-Length but are
+    # compressed as they are read rather than being loaded in full
+    buffered = isinstance(response.app_iter, (list, tuple))
+    length = response.content_length
+    if length is not None and length < min_size:
+        return
+
+    # without the header any coding is acceptable by RFC 9110, but in
+    # practice such clients do not expect a compressed body
+    if "Accept-Encoding" not in request.headers:
+        return
+
+    offers = request.accept_encoding.acceptable_offers([e.name for e in encoders])
+    if not offers:
+        return
+
+    encoder = next(e for e in encoders if e.name == offers[0][0])
+    if buffered:
+        response.body = encoder.compress(response.body)
+    else:
+        app_iter = response.app_iter
+        response.app_iter = _closing_iter(encoder.iter_compress(app_iter), app_iter)
+        response.content_length = None
+
+    response.content_encoding = encoder.name
+
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response.headers["ETag"] = "W/" + etag
+
+
+def compression_tween_factory(handler: Callable, registry) -> Callable:
+    """Tween factory that compresses responses according to the settings."""
+    settings = registry.settings or {}
+    encoders = _make_encoders(settings)
+    min_size = int(settings.get("tet.compression.min_size", 1024))
+
+    def compression_tween(request):
+        response = handler(request)
+        compress_response(request, response, encoders, min_size)
+        return response
+
+    return compression_tween
+
+
+def includeme(config: Configurator):
+    """
+    Pyramid includeme for response compression.
+
+    Adds the compression tween at the top of the tween chain, so that it
+    compresses the final response, including error responses.
+    """
+    config.add_tween("tet.compression.compression_tween_factory", under=INGRESS)
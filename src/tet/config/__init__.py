@@ -14,10 +14,15 @@ Tet supports the following features that can be selectively included:
 - ``services`` - Dependency injection via pyramid_di
 - ``i18n`` - Internationalization support
 - ``renderers.json`` - JSON rendering with custom type adapters
+- ``renderers.msgpack`` - MessagePack rendering with the JSON adapters
+- ``renderers.cbor`` - CBOR rendering with the JSON adapters
 - ``renderers.tonnikala`` - Tonnikala template engine integration
 - ``renderers.tonnikala.i18n`` - Tonnikala with i18n support
 - ``security.authorization`` - Custom authorization policy
 - ``security.csrf`` - CSRF token protection
+- ``compression`` - gzip/Brotli response compression
+- ``etag`` - Automatic ETags and conditional GET
+- ``viewlet.cache`` - Fragment cache settings for viewlets
 
 Example
 -------
@@ -171,6 +176,9 @@ ALL_FEATURES = [
     "renderers.tonnikala.i18n",
     "security.authorization",
     "security.csrf",
+    "compression",
+    "etag",
+    "viewlet.cache",
 ]
 
 MINIMAL_FEATURES = []
@@ -0,0 +1,213 @@
+"""
+Automatic ETags and conditional GET support for Tet applications.
+
+This module adds weak ETags to rendered responses and answers conditional
+``GET`` and ``HEAD`` requests whose ``If-None-Match`` header matches with
+``304 Not Modified``. It is included automatically when using the ``etag``
+feature.
+
+Features
+--------
+
+- A weak ETag computed from the body of every buffered ``200 OK`` response
+  that does not have an ETag yet
+- ``304 Not Modified`` instead of the body when the client's copy matches
+- A cheap version key supplied by the view, so that rendering is skipped
+  altogether when the client's copy is current
+
+Settings
+--------
+
+``tet.etag.algorithm``
+    Hash used for the body ETags: ``blake2b`` (the default) or ``xxhash``,
+    if the ``xxhash`` package is installed
+
+Example
+-------
+
+Enabling the feature::
+
+    from tet.config import application_factory
+
+    @application_factory(included_features=["renderers.json", "etag"])
+    def main(config):
+        config.scan()
+
+Skipping rendering when the client already has the current version::
+
+    from pyramid.view import view_config
+
+    @view_config(
+        route_name="article",
+        renderer="templates/article.tk",
+        etag_version=lambda context, request: context.updated_at.isoformat(),
+    )
+    def article(context, request):
+        return {"article": context}
+"""
+
+import hashlib
+import warnings
+from typing import Any, Callable, Dict
+
+from pyramid.config import Configurator
+from pyramid.httpexceptions import HTTPNotModified
+from pyramid.tweens import EXCVIEW
+
+ETAG_ALGORITHMS = ("blake2b", "xxhash")
+
+_NOT_MODIFIED_HEADERS = ("Cache-Control", "Content-Location", "Date", "Expires", "Vary")
+
+
+def _blake2b_hasher() -> Callable[[bytes], str]:
+    blake2b = hashlib.blake2b
+
+    def hasher(data):
+        return blake2b(data, digest_size=16).hexdigest()
+
+    return hasher
+
+
+def _xxhash_hasher() -> Callable[[bytes], str]:
+    import xxhash
+
+    xxh3_128_hexdigest = xxhash.xxh3_128_hexdigest
+
+    def hasher(data):
+        return xxh3_128_hexdigest(data)
+
+    return hasher
+
+
+_hasher_factories: Dict[str, Callable[[], Callable[[bytes], str]]] = {
+    "blake2b": _blake2b_hasher,
+    "xxhash": _xxhash_hasher,
+}
+
+
+def get_etag_hasher(algorithm: str = "blake2b") -> Callable[[bytes], str]:
+    """
+    Return a function that hashes bytes into an ETag value.
+
+    :param algorithm: One of :data:`ETAG_ALGORITHMS`
+    :return: The hash function; the ``blake2b`` one if the library of the
+        requested algorithm is not installed
+    :raises ValueError: If the algorithm name is not known
+    """
+    try:
+        factory = _hasher_factories[algorithm]
+    except KeyError:
+        raise ValueError(
+            f"Unknown ETag algorithm {algorithm!r}, expected one of {ETAG_ALGORITHMS}"
+        ) from None
+
+    try:
+        return factory()
+    except ImportError:
+        warnings.warn(
+            f"ETag algorithm {algorithm!r} is not installed, falling back to blake2b",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+        return _blake2b_hasher()
+
+
+_hash_version = _blake2b_hasher()
+
+
+def not_modified(response) -> HTTPNotModified:
+    """
+    Return a ``304 Not Modified`` response for ``response``.
+
+    The ETag and the caching related headers of ``response`` are copied to
+    the new response.
+    """
+    headers = {"ETag": response.headers["ETag"]}
+    for name in _NOT_MODIFIED_HEADERS:
+        if name in response.headers:
+            headers[name] = response.headers[name]
+
+    return HTTPNotModified(headers=headers)
+
+
+def check_etag_version(request, version: Any) -> None:
+    """
+    Use a version key of the resource as the ETag of the response.
+
+    The version key is any cheaply computed value that changes whenever the
+    rendered response would change, such as a modification timestamp. A
+    weak ETag derived from it is set on ``request.response``. If the
+    ``If-None-Match`` header of the request matches the ETag,
+    :class:`~pyramid.httpexceptions.HTTPNotModified` is raised, so the view
+    can return early without computing or rendering anything.
+
+    :param request: The current request
+    :param version: The version key; converted to ``str`` and hashed
+    :raises HTTPNotModified: If the client's copy is current
+    """
+    etag = _hash_version(str(version).encode("utf-8"))
+    response = request.response
+    response.etag = (etag, False)
+
+    if request.method in ("GET", "HEAD") and etag in request.if_none_match:
+        raise not_modified(response)
+
+
+def etag_version_view(view, info):
+    """
+    View deriver implementing the ``etag_version`` view option.
+
+    The option is a callable taking ``(context, request)`` and returning the
+    version key passed to :func:`check_etag_version` before the view is
+    called.
+    """
+    version = info.options.get("etag_version")
+    if version is None:
+        return view
+
+    def wrapper(context, request):
+        check_etag_version(request, version(context, request))
+        return view(context, request)
+
+    return wrapper
+
+
+etag_version_view.options = ("etag_version",)
+
+
+def etag_tween_factory(handler: Callable, registry) -> Callable:
+    """Tween factory adding ETags and answering conditional requests."""
+    settings = registry.settings or {}
+    hasher = get_etag_hasher(settings.get("tet.etag.algorithm", "blake2b"))
+
+    def etag_tween(request):
+        response = handler(request)
+
+        if request.method not in ("GET", "HEAD") or response.status_code != 200:
+            return response
+
+        if "ETag" not in response.headers:
+            # only hash bodies that are already in memory; streamed and file
+            # responses would have to be read in full
+            if not isinstance(response.app_iter, (list, tuple)):
+                return response
+
+            response.etag = (hasher(response.body), False)
+
+        if response.etag in request.if_none_match:
+            return not_modified(response)
+
+        return response
+
+    return etag_tween
+
+
+def includeme(config: Configurator):
+    """
+    Pyramid includeme for automatic ETags and conditional GET.
+
+    Adds the ETag tween just below the exception view tween, and the
+    ``etag_version`` view option.
+    """
+    config.add_tween("tet.etag.etag_tween_factory", under=EXCVIEW)
+    config.add_view_deriver(etag_version_view)
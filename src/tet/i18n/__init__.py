@@ -33,51 +33,229 @@ In Tonnikala templates::
     <p>${ngettext("1 item", "{n} items", count, mapping={"n": count})}</p>
 """
 
+import logging
 import sys
+import time
+import tracemalloc
+from typing import Iterable, List, Optional
 
 from pyramid.config import Configurator
-from pyramid.i18n import TranslationStringFactory, get_localizer
+from pyramid.i18n import (
+    Localizer,
+    TranslationStringFactory,
+    get_localizer,
+    make_localizer,
+)
+from pyramid.interfaces import ILocalizer, ITranslationDirectories
+from pyramid.settings import aslist
 from pyramid.threadlocal import get_current_request
 
+from tet.i18n.catalog import make_catalog_localizer
+from tet.util.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+_MISSING = object()
+
+
+class LazyRequestAttribute:
+    """
+    A proxy of an attribute of a request, looked up on first use.
+
+    Calling the proxy calls the attribute, and other attributes of the proxy
+    are those of the attribute, so it can stand in for request methods and
+    for objects such as the localizer in templates.
+
+    :param request: The request
+    :param name: Name of the request attribute
+    """
+
+    __slots__ = ("_request", "_name", "_value")
+
+    def __init__(self, request, name: str):
+        self._request = request
+        self._name = name
+        self._value = _MISSING
+
+    def _resolve(self):
+        value = self._value
+        if value is _MISSING:
+            value = self._value = getattr(self._request, self._name)
+
+        return value
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        if self._value is _MISSING:
+            return f"<lazy request.{self._name}>"
+
+        return repr(self._value)
+
 
 def add_renderer_globals(event):
     """
     Subscriber that adds i18n functions to renderer globals.
 
-    Adds ``_``, ``gettext``, ``ngettext``, and ``localizer`` to the template context.
+    Adds ``_``, ``gettext``, ``ngettext``, and ``localizer`` to the template
+    context, as :class:`LazyRequestAttribute` proxies of the request
+    attributes, so that the localizer is only created for renderings that
+    translate something.
     """
     request = event.get("request")
 
     if request is None:
         request = get_current_request()
 
-    event["_"] = request.translate
-    event["gettext"] = request.translate
-    event["ngettext"] = request.pluralize
-    event["localizer"] = request.localizer
+    translate = LazyRequestAttribute(request, "translate")
+    event["_"] = translate
+    event["gettext"] = translate
+    event["ngettext"] = LazyRequestAttribute(request, "pluralize")
+    event["localizer"] = LazyRequestAttribute(request, "localizer")
+
+
+def create_localizer(registry, locale_name: str) -> Localizer:
+    """
+    Create the localizer of ``locale_name`` from the translation directories.
+
+    Uses the compiled catalogs of :mod:`tet.i18n.catalog` if
+    :func:`configure_i18n` was given a catalog directory, and
+    :func:`pyramid.i18n.make_localizer` otherwise.
+
+    :param registry: The application registry
+    :param locale_name: The locale name
+    """
+    tdirs = registry.queryUtility(ITranslationDirectories, default=[])
+    catalog_dir = getattr(registry, "tet_catalog_dir", None)
+    if catalog_dir:
+        return make_catalog_localizer(locale_name, tdirs, catalog_dir)
+
+    return make_localizer(locale_name, tdirs)
+
+
+def _get_localizer(request) -> Localizer:
+    registry = request.registry
+    locale_name = request.locale_name
+    localizer = registry.queryUtility(ILocalizer, name=locale_name)
+    if localizer is None:
+        localizer = create_localizer(registry, locale_name)
+        registry.registerUtility(localizer, ILocalizer, name=locale_name)
 
+    return localizer
 
-def configure_i18n(config: Configurator, default_domain: str):
+
+def preload_localizers(registry, locale_names: Iterable[str]) -> List[Localizer]:
+    """
+    Load the translations of ``locale_names`` and register their localizers.
+
+    Pyramid otherwise creates the localizer of a locale, loading all of its
+    catalogs, on the first request in that locale. The time and memory
+    taken are logged at the ``INFO`` level on the ``tet.i18n`` logger.
+
+    :param registry: The application registry, with its translation
+        directories configured
+    :param locale_names: The locales to load
+    :return: The localizers, in the order of ``locale_names``
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        localizers = []
+        for locale_name in locale_names:
+            localizer = create_localizer(registry, locale_name)
+            registry.registerUtility(localizer, ILocalizer, name=locale_name)
+            localizers.append(localizer)
+
+        memory = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    logger.info(
+        "Preloaded translations of %d locales (%s) in %.1f ms, using %.1f KiB",
+        len(localizers),
+        ", ".join(locale_names),
+        (time.perf_counter() - start) * 1000,
+        memory / 1024,
+    )
+    return localizers
+
+
+def configure_i18n(
+    config: Configurator,
+    default_domain: str,
+    *,
+    preload_locales: Iterable[str] = (),
+    catalog_dir: Optional[str] = None,
+):
     """
     Configure i18n support for a Pyramid application.
 
     Adds ``request.translate`` and ``request.pluralize`` methods, and
     registers subscribers to add i18n functions to template contexts.
 
+    Translations of plain strings without a mapping are cached by locale,
+    domain, message id and context in a least-recently-used cache of
+    ``tet.i18n.translation_cache_size`` entries (default 4096; ``0`` turns
+    the cache off), shared by all requests.
+
+    The translations of ``preload_locales``, or of the locales listed in the
+    ``tet.i18n.preload_locales`` setting, are loaded with
+    :func:`preload_localizers` when the configuration is committed, after
+    the translation directories have been added. Created before a
+    pre-forking server forks, the catalogs are shared by the workers.
+
+    With ``catalog_dir``, or the ``tet.i18n.catalog_dir`` setting, the
+    ``.mo`` files are compiled into memory-mapped catalogs in that directory
+    (see :mod:`tet.i18n.catalog`), which are shared by all processes using
+    the directory and need no parsing when loaded.
+
     :param config: Pyramid Configurator
     :param default_domain: Default translation domain
+    :param preload_locales: Locale names whose translations are loaded at
+        startup
+    :param catalog_dir: Directory of the compiled message catalogs
     """
     config.add_subscriber(add_renderer_globals, "pyramid.events.BeforeRender")
     config.add_subscriber(add_renderer_globals, "tet.viewlet.IBeforeViewletRender")
 
     config.registry.tsf = tsf = TranslationStringFactory(default_domain)
 
+    settings = config.get_settings() or {}
+    cache_size = int(settings.get("tet.i18n.translation_cache_size", 4096))
+    cache = None
+    if cache_size > 0:
+        cache = config.registry.tet_translation_cache = LRUCache(cache_size)
+
     def translate(request):
         localizer = request.localizer
+        locale_name = localizer.locale_name
 
         def auto_translate(
             string, *, domain=default_domain, mapping=None, context=None
         ):
+            # only plain strings without a mapping translate to the same
+            # text every time; TranslationStrings may carry their own
+            if cache is not None and mapping is None and type(string) is str:
+                key = (locale_name, domain, string, context)
+                translated = cache.get(key)
+                if translated is None:
+                    translated = localizer.translate(
+                        tsf(string, context=context), domain=domain
+                    )
+                    cache.set(key, translated)
+
+                return translated
+
             if isinstance(string, str):
                 string = tsf(string, context=context)
 
@@ -100,6 +278,24 @@ def configure_i18n(config: Configurator, default_domain: str):
 
         return auto_pluralize
 
+    preload_locales = list(preload_locales) or aslist(
+        settings.get("tet.i18n.preload_locales", "")
+    )
+    if preload_locales:
+        registry = config.registry
+        # after the default order, so that every translation directory has
+        # been added
+        config.action(
+            None, lambda: preload_localizers(registry, preload_locales), order=1
+        )
+
+    catalog_dir = catalog_dir or settings.get("tet.i18n.catalog_dir")
+    if catalog_dir:
+        config.registry.tet_catalog_dir = catalog_dir
+        config.add_request_method(
+            _get_localizer, name="localizer", property=True, reify=True
+        )
+
     config.add_request_method(translate, property=True, reify=True)
     config.add_request_method(pluralize, property=True, reify=True)
     config.add_request_method(get_localizer, name="localize", property=True, reify=True)
@@ -0,0 +1,372 @@
+"""
+Memory-mapped message catalogs.
+
+Pyramid parses every ``.mo`` file into a dictionary in each worker process,
+so an application with large catalogs in many locales keeps a copy of all
+of them in every worker. This module compiles each ``.mo`` file once into a
+hash table on disk and looks messages up directly in a read-only memory
+map of it. All processes mapping the same file share its pages through the
+page cache, and loading a catalog needs no parsing.
+
+The backend is enabled with the ``tet.i18n.catalog_dir`` setting, or the
+``catalog_dir`` argument of :func:`tet.i18n.configure_i18n`, naming the
+directory where the compiled catalogs are kept. A compiled catalog is
+rebuilt when its ``.mo`` file changes.
+
+File format
+-----------
+
+All integers are little-endian. The file starts with a header::
+
+    magic        8 bytes, b"TETCAT\\0\\1"
+    mo_mtime_ns  int64, mtime of the source .mo file
+    mo_size      int64, size of the source .mo file
+    count        uint32, number of messages
+    table_size   uint32, number of slots, a power of two
+    plural_len   uint32, length of the plural expression
+
+followed by the C plural expression of the ``Plural-Forms`` header in UTF-8,
+the slot table, and the UTF-8 message ids and translations. Each slot is::
+
+    hash         uint64, the first 8 bytes of the BLAKE2b hash of the key
+    key_offset   uint32, 0 for an empty slot
+    key_length   uint32
+    value_offset uint32
+    value_length uint32
+    flags        uint32, 1 for a message with plural forms
+
+The key is the message id, prefixed by its context and ``\\x04`` if it has
+one. The translations of a message with plural forms are separated by
+``\\0``. Collisions are resolved by linear probing; the table is at most
+half full.
+"""
+
+import gettext
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pyramid.i18n import Localizer
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TETCAT\0\1"
+CATALOG_FILE_SUFFIX = ".tcat"
+
+_HEADER = struct.Struct("<8sqqIII")
+_SLOT = struct.Struct("<QIIIII")
+_PLURAL = 1
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _plural_expression(translations: gettext.GNUTranslations) -> str:
+    plural_forms = translations.info().get("plural-forms", "")
+    for part in plural_forms.split(";"):
+        name, _, expression = part.partition("=")
+        if name.strip() == "plural":
+            return expression.strip()
+
+    return "n != 1"
+
+
+def compile_catalog(mo_path: str, path: str) -> None:
+    """
+    Compile the ``.mo`` file ``mo_path`` into the catalog file ``path``.
+
+    The file is written under a temporary name and renamed, so that other
+    processes never map a partially written file.
+
+    :param mo_path: Path of the GNU gettext catalog
+    :param path: Path of the compiled catalog
+    """
+    with open(mo_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        translations = gettext.GNUTranslations(f)
+
+    messages: Dict[str, Tuple[str, int]] = {}
+    plurals: Dict[str, List[Tuple[int, str]]] = {}
+    for key, value in translations._catalog.items():
+        if isinstance(key, tuple):
+            plurals.setdefault(key[0], []).append((key[1], value))
+        else:
+            messages[key] = value, 0
+
+    for key, forms in plurals.items():
+        messages[key] = "\0".join(value for _, value in sorted(forms)), _PLURAL
+
+    plural = _plural_expression(translations).encode("utf-8")
+    table_size = 8
+    while table_size < 2 * len(messages):
+        table_size *= 2
+
+    table_offset = _HEADER.size + len(plural)
+    strings_offset = table_offset + table_size * _SLOT.size
+    slots = [None] * table_size
+    strings = bytearray()
+    mask = table_size - 1
+    for key, (value, flags) in messages.items():
+        key_bytes = key.encode("utf-8")
+        value_bytes = value.encode("utf-8")
+        key_hash = _hash(key_bytes)
+        key_offset = strings_offset + len(strings)
+        strings += key_bytes
+        value_offset = strings_offset + len(strings)
+        strings += value_bytes
+
+        index = key_hash & mask
+        while slots[index] is not None:
+            index = (index + 1) & mask
+
+        slots[index] = (
+            key_hash,
+            key_offset,
+            len(key_bytes),
+            value_offset,
+            len(value_bytes),
+            flags,
+        )
+
+    empty = _SLOT.pack(0, 0, 0, 0, 0, 0)
+    data = bytearray(
+        _HEADER.pack(
+            MAGIC,
+            stat.st_mtime_ns,
+            stat.st_size,
+            len(messages),
+            table_size,
+            len(plural),
+        )
+    )
+    data += plural
+    for slot in slots:
+        data += empty if slot is None else _SLOT.pack(*slot)
+
+    data += strings
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class MmapCatalog:
+    """
+    A compiled message catalog, read from a memory map.
+
+    :param path: Path of the compiled catalog
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            self.mo_mtime_ns,
+            self.mo_size,
+            self.count,
+            table_size,
+            plural_len,
+        ) = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a compiled catalog")
+
+        plural = self._map[_HEADER.size : _HEADER.size + plural_len].decode("utf-8")
+        self.plural = gettext.c2py(plural)
+        self._mask = table_size - 1
+        self._table_offset = _HEADER.size + plural_len
+
+    def _lookup(self, key: str) -> Optional[Tuple[str, int]]:
+        data = self._map
+        key_bytes = key.encode("utf-8")
+        key_hash = _hash(key_bytes)
+        index = key_hash & self._mask
+        while True:
+            (
+                slot_hash,
+                key_offset,
+                key_length,
+                value_offset,
+                value_length,
+                flags,
+            ) = _SLOT.unpack_from(data, self._table_offset + index * _SLOT.size)
+            if not key_offset:
+                return None
+
+            if (
+                slot_hash == key_hash
+                and data[key_offset : key_offset + key_length] == key_bytes
+            ):
+                value = data[value_offset : value_offset + value_length]
+                return value.decode("utf-8"), flags
+
+            index = (index + 1) & self._mask
+
+    def gettext(self, message: str) -> Optional[str]:
+        """Return the translation of ``message``, or ``None``."""
+        entry = self._lookup(message)
+        if entry is None or entry[1] & _PLURAL:
+            return None
+
+        return entry[0]
+
+    def ngettext(self, singular: str, n: int) -> Optional[str]:
+        """Return the plural form of ``singular`` for ``n``, or ``None``."""
+        entry = self._lookup(singular)
+        if entry is None or not entry[1] & _PLURAL:
+            return None
+
+        forms = entry[0].split("\0")
+        index = self.plural(n)
+        if index >= len(forms):
+            return None
+
+        return forms[index]
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def catalog_path(catalog_dir: str, mo_path: str) -> str:
+    """Return the path of the compiled catalog of ``mo_path``."""
+    digest = hashlib.blake2b(
+        os.path.realpath(mo_path).encode("utf-8"), digest_size=10
+    ).hexdigest()
+    name = os.path.splitext(os.path.basename(mo_path))[0]
+    return os.path.join(catalog_dir, f"{name}-{digest}{CATALOG_FILE_SUFFIX}")
+
+
+def load_catalog(mo_path: str, catalog_dir: str) -> MmapCatalog:
+    """
+    Return the compiled catalog of ``mo_path``, compiling it if needed.
+
+    :param mo_path: Path of the GNU gettext catalog
+    :param catalog_dir: Directory of the compiled catalogs
+    """
+    path = catalog_path(catalog_dir, mo_path)
+    stat = os.stat(mo_path)
+    try:
+        catalog = MmapCatalog(path)
+    except (OSError, ValueError, struct.error):
+        pass
+    else:
+        if (catalog.mo_mtime_ns, catalog.mo_size) == (stat.st_mtime_ns, stat.st_size):
+            return catalog
+
+        catalog.close()
+
+    logger.info("Compiling message catalog %s", mo_path)
+    compile_catalog(mo_path, path)
+    return MmapCatalog(path)
+
+
+class CatalogTranslations:
+    """
+    Translations of a locale backed by :class:`MmapCatalog` instances.
+
+    Implements the parts of the :class:`pyramid.i18n.Translations` API used
+    by the localizer. Messages of a domain are looked up in its catalogs
+    from the most recently added one, and then, as in Pyramid, in the
+    catalogs of the default domain.
+
+    :param domain: The default domain
+    """
+
+    def __init__(self, domain: str = "messages"):
+        self.domain = domain
+        self.catalogs: Dict[str, List[MmapCatalog]] = {}
+        self._chains: Dict[str, List[MmapCatalog]] = {}
+
+    def add(self, domain: str, catalog: MmapCatalog) -> None:
+        """Add a catalog of ``domain``, overriding the earlier ones."""
+        self.catalogs.setdefault(domain, []).insert(0, catalog)
+        self._chains = {}
+
+    def _domain_catalogs(self, domain: str) -> List[MmapCatalog]:
+        chain = self._chains.get(domain)
+        if chain is None:
+            chain = self.catalogs.get(self.domain, [])
+            if domain != self.domain:
+                chain = self.catalogs.get(domain, []) + chain
+
+            self._chains[domain] = chain
+
+        return chain
+
+    def dugettext(self, domain: str, message: str) -> str:
+        for catalog in self._domain_catalogs(domain):
+            translated = catalog.gettext(message)
+            if translated is not None:
+                return translated
+
+        return message
+
+    def dungettext(self, domain: str, singular: str, plural: str, n: int) -> str:
+        for catalog in self._domain_catalogs(domain):
+            translated = catalog.ngettext(singular, n)
+            if translated is not None:
+                return translated
+
+        return singular if n == 1 else plural
+
+    def gettext(self, message: str) -> str:
+        return self.dugettext(self.domain, message)
+
+    def ngettext(self, singular: str, plural: str, n: int) -> str:
+        return self.dungettext(self.domain, singular, plural, n)
+
+    dgettext = dugettext
+    dngettext = dungettext
+    ugettext = gettext
+    ungettext = ngettext
+
+
+def make_catalog_localizer(
+    locale_name: str, translation_directories: Iterable[str], catalog_dir: str
+) -> Localizer:
+    """
+    Create a localizer using compiled catalogs.
+
+    The ``.mo`` files are found like :func:`pyramid.i18n.make_localizer`
+    finds them: in the ``LC_MESSAGES`` directories of the language and of
+    the full locale name, with the latter taking precedence.
+
+    :param locale_name: The locale name, e.g. ``fi`` or ``pt_BR``
+    :param translation_directories: The translation directories
+    :param catalog_dir: Directory of the compiled catalogs
+    """
+    locales_to_try = []
+    if "_" in locale_name:
+        locales_to_try.append(locale_name.split("_")[0])
+    locales_to_try.append(locale_name)
+
+    translations = CatalogTranslations()
+    for tdir in translation_directories:
+        for name in locales_to_try:
+            messages_dir = os.path.join(tdir, name, "LC_MESSAGES")
+            if not os.path.isdir(messages_dir):
+                continue
+
+            for filename in sorted(os.listdir(messages_dir)):
+                mo_path = os.path.realpath(os.path.join(messages_dir, filename))
+                if filename.endswith(".mo") and os.path.isfile(mo_path):
+                    catalog = load_catalog(mo_path, catalog_dir)
+                    translations.add(filename[:-3], catalog)
+
+    return Localizer(locale_name=locale_name, translations=translations)
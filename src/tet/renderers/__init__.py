@@ -4,5 +4,7 @@ Rendering utilities for Tet applications.
 This package provides integrations with various rendering systems:
 
 - :mod:`tet.renderers.json` - JSON rendering with custom type adapters
+- :mod:`tet.renderers.msgpack` - MessagePack rendering with the JSON adapters
+- :mod:`tet.renderers.cbor` - CBOR rendering with the JSON adapters
 - :mod:`tet.renderers.tonnikala` - Tonnikala template engine integration
 """
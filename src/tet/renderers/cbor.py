@@ -0,0 +1,124 @@
+"""
+CBOR rendering with the JSON type adapters for Tet applications.
+
+This module provides a `CBOR <https://cbor.io/>`_ renderer that uses the
+adapters of a JSON renderer from :mod:`tet.renderers.json`, so that views
+can serve the same data as compact binary CBOR, e.g. for service-to-service
+calls. It is included when using the ``renderers.cbor`` feature, and
+requires the ``cbor2`` package.
+
+Example
+-------
+
+Serving JSON or CBOR depending on the ``Accept`` header::
+
+    from pyramid.view import view_config
+
+    @view_config(route_name="items", renderer="json")
+    @view_config(route_name="items", renderer="cbor", accept="application/cbor")
+    def items(request):
+        return {"items": load_items(request)}
+
+Adapters added with ``config.add_json_adapter`` apply to the ``cbor``
+renderer too, since it shares the adapters of the ``json`` renderer.
+"""
+
+import datetime
+from typing import Any, Callable, Dict
+
+import cbor2
+from pyramid.config import Configurator
+
+from tet.renderers.json import _get_json_renderer_registry, hook_json_renderer
+
+
+class CBORRenderer:
+    """
+    Renderer that serializes the view result as CBOR.
+
+    Objects that CBOR cannot encode natively are converted with the adapters
+    of the wrapped JSON renderer. ``cbor2`` encodes ``datetime`` and ``date``
+    objects itself without consulting ``default``, so it is given encoders
+    for these types that convert them with the adapters, as in the ``json``
+    renderer; the value is encoded as is, without copying it. With
+    ``native_datetimes=True`` they are encoded as tagged CBOR values
+    instead; naive datetimes then need a ``timezone``.
+
+    :param json_renderer: The JSON renderer whose adapters are used
+    :param native_datetimes: Encode dates and datetimes as CBOR values
+        instead of using the adapters
+    :param kw: Keyword arguments passed to :func:`cbor2.dumps`
+    """
+
+    content_type = "application/cbor"
+
+    def __init__(self, json_renderer: Any, *, native_datetimes: bool = False, **kw):
+        self.json_renderer = json_renderer
+        self.native_datetimes = native_datetimes
+        self.kw = kw
+
+    @staticmethod
+    def _date_encoders(adapt: Callable[[Any], Any]) -> Dict[type, Callable]:
+        # cbor2 looks encoders up by exact type; subclasses of date and
+        # datetime are not encoded natively and reach ``default`` anyway
+        def encode_date(encoder, value):
+            encoder.encode(adapt(value))
+
+        return {datetime.date: encode_date, datetime.datetime: encode_date}
+
+    def add_adapter(self, type_or_iface, adapter):
+        """Add an adapter to the wrapped JSON renderer."""
+        self.json_renderer.add_adapter(type_or_iface, adapter)
+
+    def __call__(self, info):
+        """Return a render function producing ``bytes``."""
+
+        def _render(value, system):
+            request = system.get("request")
+            if request is not None:
+                response = request.response
+                if response.content_type == response.default_content_type:
+                    response.content_type = self.content_type
+
+            adapt = self.json_renderer._make_default(request)
+
+            def default(encoder, obj):
+                encoder.encode(adapt(obj))
+
+            kw = self.kw
+            if not self.native_datetimes:
+                encoders = self._date_encoders(adapt)
+                encoders.update(kw.get("encoders", ()))
+                kw = dict(kw, encoders=encoders)
+
+            return cbor2.dumps(value, default=default, **kw)
+
+        return _render
+
+
+def add_cbor_renderer(
+    config: Configurator, *, name: str = "cbor", json_renderer: str = "json", **kw
+):
+    """
+    Register a CBOR renderer sharing the adapters of a JSON renderer.
+
+    :param config: Pyramid Configurator
+    :param name: Name for the renderer (default: 'cbor')
+    :param json_renderer: Name of the JSON renderer whose adapters are used
+    :param kw: ``native_datetimes``, see :class:`CBORRenderer`, and keyword
+        arguments passed to :func:`cbor2.dumps`
+    """
+    wrapped = _get_json_renderer_registry(config)[json_renderer]
+    hook_json_renderer(config, renderer=CBORRenderer(wrapped, **kw), name=name)
+
+
+def includeme(config: Configurator):
+    """
+    Pyramid includeme function for CBOR rendering.
+
+    Includes :mod:`tet.renderers.json`, registers the ``cbor`` renderer and
+    adds the ``config.add_cbor_renderer()`` directive.
+    """
+    config.include("tet.renderers.json")
+    add_cbor_renderer(config)
+    config.add_directive("add_cbor_renderer", add_cbor_renderer)
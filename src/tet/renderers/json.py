@@ -10,8 +10,13 @@ Features
 
 - Automatic serialization of :class:`datetime.datetime` and :class:`datetime.date`
   to ISO 8601 format
-- SQLAlchemy keyed tuple support (when SQLAlchemy is installed)
-- Extensible via custom type adapters
+- SQLAlchemy ``Row``, ``RowMapping`` and result support (when SQLAlchemy is
+  installed)
+- Extensible via custom type adapters, dispatched through a per-type cache
+- Pluggable serializer backend (``stdlib``, ``orjson`` or ``ujson``)
+- ``json_stream`` renderer that streams large iterables as a JSON array
+- ``ndjson`` renderer that streams iterables as newline-delimited JSON
+- Compiled serializers for SQLAlchemy mapped classes
 
 Example
 -------
@@ -28,7 +33,37 @@ Adding a custom adapter for a model class::
         )
         config.scan()
 
-Using a custom JSON renderer factory::
+Serializing every class mapped with a declarative base::
+
+    config.add_json_model(Base, exclude=["internal_notes"])
+
+Selecting a faster serializer backend in the application settings::
+
+    [app:main]
+    tet.json.backend = orjson
+
+If the backend library is not installed, the standard library ``json``
+module is used instead and a :class:`RuntimeWarning` is issued. Adapters
+registered with ``config.add_json_adapter`` work with every backend, except
+that ``orjson`` encodes ``uuid.UUID`` and ``enum.Enum`` values itself; an
+adapter for them then issues a :class:`RuntimeWarning` and is not used.
+
+Streaming a large result set as a JSON array, without building the whole
+list or response body in memory. All but the first batch are consumed after
+``pyramid_tm`` has ended the transaction of the request, so the rows are
+read in a session of their own::
+
+    def iter_orders():
+        with Session() as session:
+            yield from session.scalars(
+                select(Order).execution_options(yield_per=1000)
+            )
+
+    @view_config(route_name="export", renderer="json_stream")
+    def export(request):
+        return iter_orders()
+
+Using a custom JSON renderer factory (the default is :class:`JSONRenderer`)::
 
     from pyramid.renderers import JSON
     from tet.renderers.json import construct_default_renderer
@@ -41,10 +76,239 @@ Using a custom JSON renderer factory::
 """
 
 import datetime
-from typing import Any, Callable, Dict
+import json
+import warnings
+from collections.abc import Mapping
+from itertools import chain, islice
+from keyword import iskeyword
+from typing import Any, Callable, Dict, Iterable, Optional
 
 from pyramid.config import Configurator
+from pyramid.interfaces import IJSONAdapter
 from pyramid.renderers import JSON
+from zope.interface import implementedBy, providedBy
+
+from tet.util.json import get_json_serializer
+
+
+def _call_json_method(obj, request):
+    return obj.__json__(request)
+
+
+class JSONRenderer(JSON):
+    """
+    A :class:`pyramid.renderers.JSON` renderer with cached adapter dispatch.
+
+    The stock renderer looks the adapter up in the component registry for
+    every object the serializer cannot encode natively. This renderer
+    resolves the adapter (or ``__json__`` method) once per type, through the
+    interfaces implemented by the class and its bases, and caches the result
+    until the next :meth:`add_adapter` call. Objects that directly provide
+    interfaces of their own are always looked up without the cache.
+    """
+
+    def __init__(self, *args, **kw):
+        self._adapter_cache: Dict[type, Any] = {}
+        super().__init__(*args, **kw)
+
+    def add_adapter(self, type_or_iface, adapter):
+        """
+        Register an adapter and clear the dispatch cache.
+
+        Warns with a :class:`RuntimeWarning` if the serializer encodes the
+        type itself, as ``orjson`` does with UUIDs and enums, so that the
+        adapter would never be called.
+        """
+        native_types = getattr(self.serializer, "native_types", None)
+        if (
+            isinstance(native_types, tuple)
+            and isinstance(type_or_iface, type)
+            and issubclass(type_or_iface, native_types)
+        ):
+            warnings.warn(
+                f"The JSON serializer encodes {type_or_iface.__name__} itself, "
+                "the adapter registered for it is not used",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+
+        super().add_adapter(type_or_iface, adapter)
+        self._adapter_cache.clear()
+
+    def _resolve_adapter(self, cls: type):
+        if hasattr(cls, "__json__"):
+            adapter = _call_json_method
+        else:
+            adapter = self.components.adapters.lookup(
+                (implementedBy(cls),), IJSONAdapter
+            )
+
+        self._adapter_cache[cls] = adapter
+        return adapter
+
+    def _make_default(self, request):
+        cache = self._adapter_cache
+        resolve = self._resolve_adapter
+        lookup = self.components.adapters.lookup
+
+        def default(obj):
+            if "__provides__" in getattr(obj, "__dict__", ()):
+                if hasattr(obj, "__json__"):
+                    return obj.__json__(request)
+
+                adapter = lookup((providedBy(obj),), IJSONAdapter)
+            else:
+                cls = type(obj)
+                try:
+                    adapter = cache[cls]
+                except KeyError:
+                    adapter = resolve(cls)
+
+            if adapter is None:
+                # named tuples, which the standard library encodes as
+                # arrays but orjson and cbor2 pass to ``default``
+                if isinstance(obj, tuple):
+                    return list(obj)
+
+                raise TypeError(f"{obj!r} is not JSON serializable")
+
+            return adapter(obj, request)
+
+        return default
+
+
+class JSONStreamRenderer:
+    """
+    Renderer that streams an iterable as a JSON array.
+
+    The value returned by the view may be any iterable of items, such as a
+    generator or an SQLAlchemy ``Query`` or ``Result``. The items are
+    serialized in batches of ``batch_size`` with the serializer and adapters
+    of the wrapped JSON renderer, and the encoded batches become the
+    response ``app_iter``, so only one batch is held in memory at a time.
+
+    The first batch is serialized before the renderer returns, so that
+    errors raised while e.g. executing a query produce an ordinary error
+    response. Later errors can only truncate the already started response.
+
+    :param json_renderer: The JSON renderer whose serializer and adapters
+        are used
+    :param batch_size: Number of items serialized and sent per chunk
+    """
+
+    content_type = "application/json"
+
+    def __init__(self, json_renderer: JSON, *, batch_size: int = 1000):
+        self.json_renderer = json_renderer
+        self.batch_size = batch_size
+
+    def add_adapter(self, type_or_iface, adapter):
+        """Add an adapter to the wrapped JSON renderer."""
+        self.json_renderer.add_adapter(type_or_iface, adapter)
+
+    def _iter_chunks(self, items, default):
+        serializer = self.json_renderer.serializer
+        kw = self.json_renderer.kw
+        batch_size = self.batch_size
+
+        prefix = "["
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+
+            # serialize the batch as a list and strip the brackets
+            yield (prefix + serializer(batch, default=default, **kw)[1:-1]).encode(
+                "utf-8"
+            )
+            prefix = ","
+
+        yield b"[]" if prefix == "[" else b"]"
+
+    def __call__(self, info):
+        """Return a render function producing an iterable of ``bytes``."""
+
+        def _render(value, system):
+            if isinstance(value, (str, bytes, Mapping)):
+                raise TypeError(
+                    f"{type(self).__name__} requires an iterable of items, "
+                    f"not {type(value).__name__}"
+                )
+
+            request = system.get("request")
+            if request is not None:
+                response = request.response
+                if response.content_type == response.default_content_type:
+                    response.content_type = self.content_type
+
+            default = self.json_renderer._make_default(request)
+            chunks = self._iter_chunks(iter(value), default)
+            return chain((next(chunks, b""),), chunks)
+
+        return _render
+
+
+class JSONLinesRenderer(JSONStreamRenderer):
+    """
+    Renderer that streams an iterable as newline-delimited JSON.
+
+    Every item is serialized on a line of its own (`JSON Lines
+    <https://jsonlines.org/>`_, also known as NDJSON) with the serializer and
+    adapters of the wrapped JSON renderer. The lines are buffered and sent as
+    one chunk of the response ``app_iter`` every ``batch_size`` items; use a
+    ``batch_size`` of 1 to flush every line as soon as it is produced, e.g.
+    for event feeds.
+
+    :param json_renderer: The JSON renderer whose serializer and adapters
+        are used
+    :param batch_size: Number of lines buffered before a chunk is sent
+    """
+
+    content_type = "application/x-ndjson"
+
+    def _iter_chunks(self, items, default):
+        kw = {k: v for k, v in self.json_renderer.kw.items() if k != "indent"}
+        serializer = self.json_renderer.serializer
+        if serializer is json.dumps and "cls" not in kw:
+            # json.dumps would construct a new encoder for every line
+            encode = json.JSONEncoder(default=default, **kw).encode
+        else:
+
+            def encode(item):
+                return serializer(item, default=default, **kw)
+
+        batch_size = self.batch_size
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+
+            yield "".join([encode(item) + "\n" for item in batch]).encode("utf-8")
+
+
+class _RowAdapter:
+    """
+    JSON adapter for SQLAlchemy ``Row`` objects.
+
+    ``Row._fields`` is recomputed on every access, and ``Row._asdict()`` goes
+    through the ``RowMapping``; instead the field names are remembered for
+    the result the last row came from, and the dict is built directly from
+    the row values. Rows of a list returned from one query share the field
+    names.
+    """
+
+    __slots__ = ("_last",)
+
+    def __init__(self):
+        self._last = (None, ())
+
+    def __call__(self, row, request):
+        last = self._last
+        parent = row._parent
+        if last[0] is not parent:
+            last = self._last = (parent, row._fields)
+
+        return dict(zip(last[1], row))
 
 
 def _get_json_renderer_registry(config: Configurator) -> Dict[str, Any]:
@@ -54,14 +318,35 @@ def _get_json_renderer_registry(config: Configurator) -> Dict[str, Any]:
     return config.registry.tet_json_renderers
 
 
-def hook_json_renderer(config: Configurator, *, renderer: Any, name: str = "json"):
+def _get_json_backend(config: Configurator) -> str:
+    return (config.get_settings() or {}).get("tet.json.backend", "stdlib")
+
+
+def hook_json_renderer(
+    config: Configurator,
+    *,
+    renderer: Any = None,
+    name: str = "json",
+    backend: Optional[str] = None,
+):
     """
     Register a JSON renderer with the given name.
 
+    If no renderer is given, a default renderer is constructed with
+    :func:`construct_default_renderer`, using the serializer backend named by
+    ``backend`` or the ``tet.json.backend`` setting.
+
     :param config: Pyramid Configurator
     :param renderer: The JSON renderer instance
     :param name: Name for the renderer (default: 'json')
+    :param backend: Serializer backend for the default renderer
     """
+    if renderer is None:
+        if backend is None:
+            backend = _get_json_backend(config)
+
+        renderer = construct_default_renderer(backend=backend)
+
     config.add_renderer(name, renderer)
     _get_json_renderer_registry(config)[name] = renderer
 
@@ -86,23 +371,142 @@ def add_json_adapter(
     )
 
 
+def compile_model_serializer(
+    fields: Iterable[str], *, name: str = "serialize"
+) -> Callable[[Any, Any], Dict[str, Any]]:
+    """
+    Generate a JSON adapter function that returns the given attributes.
+
+    The generated function builds the resulting dict with a single dict
+    display, e.g. ``{"id": obj.id, "name": obj.name}``, which is several
+    times faster than looking the attributes up in a loop.
+
+    :param fields: Names of the attributes to serialize
+    :param name: Name of the generated function
+    :return: Adapter function taking ``(obj, request)``
+    """
+    items = []
+    for field in fields:
+        if field.isidentifier() and not iskeyword(field):
+            items.append(f"{field!r}: obj.{field}")
+        else:
+            items.append(f"{field!r}: getattr(obj, {field!r})")
+
+    source = f"def {name}(obj, request):\n    return {{{', '.join(items)}}}\n"
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, f"<tet json serializer {name}>", "exec"), namespace)
+    return namespace[name]
+
+
+def _model_fields(mapper, fields, exclude):
+    if fields is not None:
+        return [field for field in fields if field not in exclude]
+
+    # deferred columns would be loaded one by one, and private attributes
+    # (such as the hash of UserPasswordMixin) must not leak by default
+    return [
+        prop.key
+        for prop in mapper.column_attrs
+        if not prop.deferred
+        and not prop.key.startswith("_")
+        and prop.key not in exclude
+    ]
+
+
+def add_json_model(
+    config: Configurator,
+    model: type,
+    *,
+    fields: Optional[Iterable[str]] = None,
+    exclude: Iterable[str] = (),
+    renderer: str = "json",
+):
+    """
+    Register compiled JSON adapters for SQLAlchemy mapped classes.
+
+    ``model`` is either a declarative base, in which case every class mapped
+    with it is registered, or a mapped class, in which case the class and
+    its mapped subclasses are registered. The mappers are inspected once,
+    when the configuration is committed, and a serializer is generated for
+    each class with :func:`compile_model_serializer`.
+
+    By default the serialized fields are the column attributes of each
+    class, except deferred columns and attributes whose name begins with an
+    underscore. Relationships are not included unless listed in ``fields``.
+
+    :param config: Pyramid Configurator
+    :param model: Declarative base or mapped class
+    :param fields: Attribute names to serialize for every registered class,
+        instead of the column attributes
+    :param exclude: Attribute names to leave out
+    :param renderer: Name of the renderer to add the adapters to
+    """
+    from sqlalchemy import inspect
+
+    exclude = frozenset(exclude)
+    if fields is not None:
+        fields = tuple(fields)
+
+    def register():
+        for mapper in list(model.registry.mappers):
+            cls = mapper.class_
+            if not issubclass(cls, model):
+                continue
+
+            adapter = compile_model_serializer(
+                _model_fields(inspect(cls), fields, exclude),
+                name=f"serialize_{cls.__name__}",
+            )
+            add_json_adapter(config, for_=cls, adapter=adapter, renderer=renderer)
+
+    config.action(("tet.renderers.json.add_json_model", renderer, model), register)
+
+
 def construct_default_renderer(
-    renderer_factory: Callable[..., Any] = JSON, **renderer_args
+    renderer_factory: Callable[..., Any] = JSONRenderer,
+    *,
+    backend: Optional[str] = None,
+    **renderer_args,
 ):
     """
     Construct a JSON renderer with default type adapters.
 
     Adds adapters for:
     - ``datetime.datetime`` and ``datetime.date`` (ISO 8601 format)
-    - SQLAlchemy ``AbstractKeyedTuple`` (converted to dict)
+    - SQLAlchemy ``Row`` and ``RowMapping`` (converted to dict), and
+      ``Result``, ``MappingResult`` and ``ScalarResult`` (converted to list)
+    - SQLAlchemy < 1.4 ``AbstractKeyedTuple`` (converted to dict)
 
     :param renderer_factory: Factory callable for creating the renderer
+    :param backend: Name of the serializer backend, see
+        :func:`tet.util.json.get_json_serializer`; ignored if an explicit
+        ``serializer`` is given
     :param renderer_args: Additional arguments passed to the factory
     :return: Configured JSON renderer instance
     """
+    if backend is not None and "serializer" not in renderer_args:
+        renderer_args["serializer"] = get_json_serializer(backend)
+
     json_renderer = renderer_factory(**renderer_args)
 
     try:
+        from sqlalchemy.engine import (
+            MappingResult,
+            Result,
+            Row,
+            RowMapping,
+            ScalarResult,
+        )
+
+        json_renderer.add_adapter(Row, _RowAdapter())
+        json_renderer.add_adapter(RowMapping, lambda o, req: dict(o))
+        for result_type in (Result, MappingResult, ScalarResult):
+            json_renderer.add_adapter(result_type, lambda o, req: o.all())
+    except ImportError:
+        pass
+
+    try:
+        # SQLAlchemy < 1.4
         from sqlalchemy.util._collections import AbstractKeyedTuple
 
         json_renderer.add_adapter(AbstractKeyedTuple, lambda o, req: o._asdict())
@@ -119,11 +523,28 @@ def includeme(config: Configurator):
     """
     Pyramid includeme function for JSON rendering.
 
-    Registers a default JSON renderer and adds configuration directives:
+    Registers a default JSON renderer, using the serializer backend named by
+    the ``tet.json.backend`` setting, and ``json_stream`` and ``ndjson``
+    renderers sharing its adapters, with the batch sizes given by the
+    ``tet.json.stream_batch_size`` and ``tet.json.ndjson_batch_size``
+    settings. Adds configuration directives:
     - ``config.add_json_renderer()``
     - ``config.add_json_adapter()``
+    - ``config.add_json_model()``
     """
-    renderer = construct_default_renderer()
+    settings = config.get_settings() or {}
+    renderer = construct_default_renderer(backend=_get_json_backend(config))
+    stream_renderer = JSONStreamRenderer(
+        renderer, batch_size=int(settings.get("tet.json.stream_batch_size", 1000))
+    )
+
+    lines_renderer = JSONLinesRenderer(
+        renderer, batch_size=int(settings.get("tet.json.ndjson_batch_size", 1000))
+    )
+
+    hook_json_renderer(config, renderer=stream_renderer, name="json_stream")
+    hook_json_renderer(config, renderer=lines_renderer, name="ndjson")
     hook_json_renderer(config, renderer=renderer)
     config.add_directive("add_json_renderer", hook_json_renderer)
     config.add_directive("add_json_adapter", add_json_adapter)
+    config.add_directive("add_json_model", add_json_model)
@@ -0,0 +1,95 @@
+"""
+MessagePack rendering with the JSON type adapters for Tet applications.
+
+This module provides a `MessagePack <https://msgpack.org/>`_ renderer that
+uses the adapters of a JSON renderer from :mod:`tet.renderers.json`, so that
+views can serve the same data as compact binary MessagePack, e.g. for
+service-to-service calls. It is included when using the
+``renderers.msgpack`` feature, and requires the ``msgpack`` package.
+
+Example
+-------
+
+Serving JSON or MessagePack depending on the ``Accept`` header::
+
+    from pyramid.view import view_config
+
+    @view_config(route_name="items", renderer="json")
+    @view_config(route_name="items", renderer="msgpack", accept="application/msgpack")
+    def items(request):
+        return {"items": load_items(request)}
+
+Adapters added with ``config.add_json_adapter`` apply to the ``msgpack``
+renderer too, since it shares the adapters of the ``json`` renderer.
+"""
+
+from typing import Any
+
+import msgpack
+from pyramid.config import Configurator
+
+from tet.renderers.json import _get_json_renderer_registry, hook_json_renderer
+
+
+class MessagePackRenderer:
+    """
+    Renderer that serializes the view result as MessagePack.
+
+    Objects that MessagePack cannot encode natively, including ``datetime``
+    objects, are converted with the adapters of the wrapped JSON renderer.
+
+    :param json_renderer: The JSON renderer whose adapters are used
+    :param kw: Keyword arguments passed to :func:`msgpack.packb`
+    """
+
+    content_type = "application/msgpack"
+
+    def __init__(self, json_renderer: Any, **kw):
+        self.json_renderer = json_renderer
+        self.kw = kw
+
+    def add_adapter(self, type_or_iface, adapter):
+        """Add an adapter to the wrapped JSON renderer."""
+        self.json_renderer.add_adapter(type_or_iface, adapter)
+
+    def __call__(self, info):
+        """Return a render function producing ``bytes``."""
+
+        def _render(value, system):
+            request = system.get("request")
+            if request is not None:
+                response = request.response
+                if response.content_type == response.default_content_type:
+                    response.content_type = self.content_type
+
+            default = self.json_renderer._make_default(request)
+            return msgpack.packb(value, default=default, **self.kw)
+
+        return _render
+
+
+def add_msgpack_renderer(
+    config: Configurator, *, name: str = "msgpack", json_renderer: str = "json", **kw
+):
+    """
+    Register a MessagePack renderer sharing the adapters of a JSON renderer.
+
+    :param config: Pyramid Configurator
+    :param name: Name for the renderer (default: 'msgpack')
+    :param json_renderer: Name of the JSON renderer whose adapters are used
+    :param kw: Keyword arguments passed to :func:`msgpack.packb`
+    """
+    wrapped = _get_json_renderer_registry(config)[json_renderer]
+    hook_json_renderer(config, renderer=MessagePackRenderer(wrapped, **kw), name=name)
+
+
+def includeme(config: Configurator):
+    """
+    Pyramid includeme function for MessagePack rendering.
+
+    Includes :mod:`tet.renderers.json`, registers the ``msgpack`` renderer
+    and adds the ``config.add_msgpack_renderer()`` directive.
+    """
+    config.include("tet.renderers.json")
+    add_msgpack_renderer(config)
+    config.add_directive("add_msgpack_renderer", add_msgpack_renderer)
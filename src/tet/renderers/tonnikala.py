@@ -72,9 +72,746 @@ With internationalization support::
     def main(config):
         config.add_route("home", "/")
         config.scan()
+
+Compiled template cache
+-----------------------
+
+Compiling a template to Python code takes much longer than rendering it,
+and every worker process compiles every template on first use. With the
+``tet.tonnikala.cache_dir`` setting, or the ``set_tonnikala_cache_dir``
+directive, the compiled code is stored in that directory, keyed by a hash
+of the template source, the Tonnikala version and the Python version, and
+workers load it from there instead of compiling again::
+
+    config.set_tonnikala_cache_dir("/var/cache/myapp/templates")
+
+Warming templates
+-----------------
+
+``config.warm_tonnikala_templates()`` compiles the templates of all views
+with a Tonnikala renderer, and all templates in the Tonnikala search paths,
+when the configuration is committed. Run in the master process of a
+pre-forking server (e.g. ``gunicorn --preload``), the workers then share the
+compiled templates. The ``tet-warm-templates`` command does the same for an
+application given by its PasteDeploy configuration file, which fills the
+compiled template cache during a deploy::
+
+    tet-warm-templates production.ini
+
+Streaming
+---------
+
+With the ``stream_template=True`` view option, the page is sent in chunks
+while the template renders, instead of being rendered into one string
+first::
+
+    @view_config(route_name="report", renderer="report.tk", stream_template=True)
+    def report(request):
+        return {"rows": query_rows(request)}
+
+Tonnikala compiles each block into a function filling a buffer; the
+streaming loader adds a generator variant of each block, which yields the
+buffered output before loops and calls into application code.
 """
 
+import ast
+import copy
+import hashlib
+import logging
+import marshal
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+import tonnikala
 from pyramid.config import Configurator
+from pyramid.csrf import get_csrf_token
+from pyramid.events import BeforeRender
+from pyramid.exceptions import ConfigurationError
+from pyramid.interfaces import IRendererFactory
+from pyramid.threadlocal import manager
+from tonnikala.languages.python.generator import Generator
+from tonnikala.loader import (
+    Template,
+    TemplateInfo,
+    _new_globals,
+    make_template_context,
+    parsers,
+)
+from tonnikala.pyramid import PyramidTonnikalaLoader, resource_filepath
+from tonnikala.runtime.exceptions import TemplateSyntaxError
+from tonnikala.runtime.python import escape
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_SUFFIX = ".tkc"
+
+
+def _tonnikala_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("tonnikala")
+    except Exception:
+        return getattr(tonnikala, "__version__", "unknown")
+
+
+_CACHE_VERSION_TAG = "\0".join(
+    ["tet-tonnikala-1", _tonnikala_version(), sys.implementation.cache_tag or ""]
+)
+
+
+def _replace_filename(code, filename: str):
+    # the compiled code is shared between paths with the same source, for
+    # example between release directories; tracebacks must show the path
+    # that the template was actually loaded from
+    consts = tuple(
+        _replace_filename(const, filename) if hasattr(const, "co_filename") else const
+        for const in code.co_consts
+    )
+    return code.replace(co_filename=filename, co_consts=consts)
+
+
+class _StreamBuffer:
+    """The output buffer of the streaming variant of a template function."""
+
+    __slots__ = ("_parts", "size")
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def __call__(self, *objs):
+        for obj in objs:
+            text = str(obj)
+            self._parts.append(text)
+            self.size += len(text)
+
+    def output_boolean_attr(self, name, value):
+        if value is None or value is True or value is False:
+            if value:
+                self(" " + name + '="' + name + '"')
+
+            return
+
+        self(" " + name + '="', escape(value), '"')
+
+    def take(self) -> str:
+        """Return the buffered output and empty the buffer."""
+        text = "".join(self._parts)
+        self._parts = []
+        self.size = 0
+        return text
+
+
+def _attach_stream(stream):
+    def decorate(func):
+        func.__tk_stream__ = stream
+        return func
+
+    return decorate
+
+
+def _stream_call(func):
+    stream = getattr(func, "__tk_stream__", None)
+    if stream is None:
+        yield str(func())
+    else:
+        yield from stream()
+
+
+_STREAM_GLOBALS = {
+    "__TK__stream_buffer": _StreamBuffer,
+    "__TK__attach_stream": _attach_stream,
+    "__TK__stream_call": _stream_call,
+    "__TK__chunk_size": 16384,
+}
+
+# calls that only format values, as opposed to calls into application code
+# that may take a while, such as viewlets or lazy database queries
+_FORMATTING_CALLS = frozenset(
+    ["__TK__escape", "__TK__output", "__TK__output_attrs", "literal"]
+)
+
+
+def _statements(source: str) -> list:
+    return ast.parse(source).body
+
+
+def _is_output(stmt) -> bool:
+    return (
+        isinstance(stmt, ast.Expr)
+        and isinstance(stmt.value, ast.Call)
+        and isinstance(stmt.value.func, ast.Name)
+        and stmt.value.func.id == "__TK__output"
+    )
+
+
+def _is_block_call(node) -> bool:
+    # blocks are output by calling them without arguments, unescaped
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and not node.func.id.startswith("__TK__")
+        and not node.args
+        and not node.keywords
+    )
+
+
+def _is_formatting_call(node) -> bool:
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        func = func.value
+
+    return isinstance(func, ast.Name) and func.id in _FORMATTING_CALLS
+
+
+def _calls_application(stmt) -> bool:
+    return any(
+        isinstance(node, ast.Call) and not _is_formatting_call(node)
+        for node in ast.walk(stmt)
+    )
+
+
+def _stream_body(body: list, in_loop: bool) -> list:
+    """
+    Transform the body of a template function into the body of a generator
+    yielding its output.
+
+    Outside loops, the output so far is yielded before every statement that
+    calls into application code, so that the client receives it before a
+    slow section starts. Inside loops, it is yielded after an iteration once
+    it exceeds the chunk size. Blocks are streamed with their own streaming
+    variants.
+    """
+    flush = "if __TK__output.size:\n    yield __TK__output.take()"
+    result = []
+    for stmt in body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            result.append(stmt)
+            continue
+
+        if (
+            isinstance(stmt, ast.Assign)
+            and isinstance(stmt.value, ast.Call)
+            and isinstance(stmt.value.func, ast.Name)
+            and stmt.value.func.id == "__TK__mkbuffer"
+            and [getattr(t, "id", None) for t in stmt.targets] == ["__TK__output"]
+        ):
+            new = _statements("__TK__output = __TK__stream_buffer()")
+
+        elif isinstance(stmt, ast.Return):
+            new = _statements("yield __TK__output.take()\nreturn")
+
+        elif _is_output(stmt) and any(map(_is_block_call, stmt.value.args)):
+            new = []
+            pending = []
+            for arg in stmt.value.args + [None]:
+                if arg is not None and not _is_block_call(arg):
+                    pending.append(arg)
+                    continue
+
+                if pending:
+                    call = ast.Call(ast.Name("__TK__output", ast.Load()), pending, [])
+                    new.append(ast.Expr(call))
+                    pending = []
+
+                if arg is not None:
+                    new += _statements(flush)
+                    new += _statements(f"yield from __TK__stream_call({arg.func.id})")
+
+        else:
+            new = []
+            if not in_loop and (
+                isinstance(stmt, (ast.For, ast.While)) or _calls_application(stmt)
+            ):
+                new += _statements(flush)
+
+            if isinstance(stmt, (ast.For, ast.AsyncFor, ast.While)):
+                stmt.body = _stream_body(stmt.body, True) + _statements(
+                    "if __TK__output.size >= __TK__chunk_size:\n"
+                    "    yield __TK__output.take()"
+                )
+                stmt.orelse = _stream_body(stmt.orelse, in_loop)
+            elif isinstance(stmt, ast.If):
+                stmt.body = _stream_body(stmt.body, in_loop)
+                stmt.orelse = _stream_body(stmt.orelse, in_loop)
+            elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+                stmt.body = _stream_body(stmt.body, in_loop)
+            elif isinstance(stmt, ast.Try):
+                stmt.body = _stream_body(stmt.body, in_loop)
+                for handler in stmt.handlers:
+                    handler.body = _stream_body(handler.body, in_loop)
+                stmt.orelse = _stream_body(stmt.orelse, in_loop)
+                stmt.finalbody = _stream_body(stmt.finalbody, in_loop)
+
+            new.append(stmt)
+
+        for node in new:
+            ast.copy_location(node, stmt)
+
+        result += new
+
+    return result
+
+
+def _add_stream_functions(module: ast.Module) -> ast.Module:
+    """
+    Add a streaming variant of the main function and the blocks of a
+    compiled template.
+
+    The variant is a generator function yielding the output in chunks. It
+    is attached to the original function as its ``__tk_stream__``
+    attribute, so it is found whether the function was overridden by a
+    child template or not.
+    """
+    for binder in module.body:
+        if isinstance(binder, ast.FunctionDef) and binder.name == "__TK__binder":
+            break
+    else:
+        return module
+
+    body = []
+    for stmt in binder.body:
+        if (
+            isinstance(stmt, ast.FunctionDef)
+            and any(
+                isinstance(d, ast.Name) and d.id == "__TK__bindblock"
+                for d in stmt.decorator_list
+            )
+            and not (stmt.args.args or stmt.args.vararg or stmt.args.kwonlyargs)
+        ):
+            stream = copy.deepcopy(stmt)
+            stream.name = stmt.name + "__TK__stream"
+            stream.decorator_list = []
+            stream.body = _stream_body(stream.body, False)
+            body.append(stream)
+
+            attach = ast.Call(
+                ast.Name("__TK__attach_stream", ast.Load()),
+                [ast.Name(stream.name, ast.Load())],
+                [],
+            )
+            stmt.decorator_list.append(ast.copy_location(attach, stmt))
+
+        body.append(stmt)
+
+    binder.body = body
+    return ast.fix_missing_locations(module)
+
+
+class TetTonnikalaLoader(PyramidTonnikalaLoader):
+    """
+    Tonnikala loader for Pyramid used by Tet when compiled templates are
+    cached on disk or streamed.
+
+    :param cache_dir: Directory where the compiled code of the templates is
+        stored, or ``None`` to compile them in memory only
+    :param streaming: If true, templates are compiled with the streaming
+        variants of their main function and blocks used by
+        :func:`iter_template`
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, *, streaming: bool = False):
+        super().__init__()
+        self.cache_dir = cache_dir
+        self.streaming = streaming
+
+    def cache_key(self, source: str) -> str:
+        """Return the cache key of a template with the given source."""
+        digest = hashlib.blake2b(digest_size=20)
+        header = "\0".join(
+            [
+                _CACHE_VERSION_TAG,
+                self.syntax,
+                str(bool(self.translatable)),
+                str(bool(self.streaming)),
+                "",
+            ]
+        )
+        digest.update(header.encode("utf-8"))
+        digest.update(source.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def cache_path(self, source: str) -> str:
+        """Return the path of the cache file of a template."""
+        return os.path.join(self.cache_dir, self.cache_key(source) + CACHE_FILE_SUFFIX)
+
+    def load_string(self, string, filename="<string>"):
+        if self.debug:
+            return super().load_string(string, filename)
+
+        cached = None
+        if self.cache_dir is not None:
+            path = self.cache_path(string)
+            cached = self._read_cache(path)
+
+        if cached is not None:
+            code, lnotab = cached
+            code = _replace_filename(code, filename)
+        else:
+            code, lnotab = self._compile(string, filename)
+            if self.cache_dir is not None:
+                self._write_cache(path, code, lnotab)
+
+        runtime = self.runtime()
+        runtime.loader = self
+        glob = _new_globals(runtime)
+        glob.update(_STREAM_GLOBALS)
+        glob["__TK_template_info__"] = TemplateInfo(filename, lnotab)
+        exec(code, glob, glob)
+        return Template(glob["__TK__binder"])
+
+    def _compile(self, string, filename):
+        try:
+            tree = parsers[self.syntax](
+                filename, string, translatable=self.translatable
+            )
+            generator = Generator(tree)
+            code = generator.generate_ast()
+            if self.streaming:
+                code = _add_stream_functions(code)
+        except TemplateSyntaxError as e:
+            if e.source is None:
+                e.source = string
+            if e.filename is None:
+                e.filename = filename
+
+            self.handle_exception(sys.exc_info(), string, tb_override=None)
+
+        return compile(code, filename, "exec"), generator.lnotab_info()
+
+    def _read_cache(self, path):
+        try:
+            with open(path, "rb") as f:
+                code, lnotab = marshal.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError):
+            logger.warning("Ignoring unreadable template cache file %s", path)
+            return None
+
+        return code, lnotab
+
+    def _write_cache(self, path, code, lnotab):
+        # write to a temporary file and rename, so that concurrently
+        # starting workers never read a partially written file
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    marshal.dump((code, lnotab), f)
+
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning("Unable to write template cache file %s: %s", path, e)
+
+
+def _replace_loader(factory, loader) -> None:
+    old_loader = factory.loader
+    loader.search_paths = old_loader.search_paths
+    loader.paths = old_loader.paths
+    loader.translatable = old_loader.translatable
+    loader.set_reload(old_loader.reload)
+    factory.loader = loader
+
+
+def set_tonnikala_cache_dir(config: Configurator, cache_dir: Optional[str]):
+    """
+    Store the compiled code of Tonnikala templates in ``cache_dir``.
+
+    The loader of the Tonnikala renderer factory is replaced with a
+    :class:`TetTonnikalaLoader` that reads compiled templates from the
+    directory and writes newly compiled ones into it; the directory is
+    created if needed. Cache files are never removed automatically: a
+    template whose source changes simply gets a new file. Passing ``None``
+    turns the cache off.
+
+    :param config: Pyramid Configurator
+    :param cache_dir: Path of the cache directory
+    """
+    factory = config.registry.tonnikala_renderer_factory
+    streaming = getattr(factory.loader, "streaming", False)
+    if cache_dir is None and not streaming:
+        loader = PyramidTonnikalaLoader()
+    else:
+        if cache_dir is not None:
+            cache_dir = os.path.abspath(cache_dir)
+
+        loader = TetTonnikalaLoader(cache_dir, streaming=streaming)
+
+    _replace_loader(factory, loader)
+
+
+def iter_template(template: Template, context: dict) -> Iterator[str]:
+    """
+    Render a Tonnikala template in chunks.
+
+    Templates loaded by a :class:`TetTonnikalaLoader` with streaming
+    enabled yield their output whenever a slow section, such as a loop or a
+    call into application code, starts, and within loops whenever the
+    output exceeds 16 KiB. Other templates yield their output as one chunk.
+
+    :param template: A template returned by the loader
+    :param context: The template variables
+    :return: An iterator of the rendered chunks
+    """
+    try:
+        context = make_template_context(context)
+        template.bind(context)
+        main = context["__main__"]
+        stream = getattr(main, "__tk_stream__", None)
+        if stream is None:
+            yield main().join()
+        else:
+            for chunk in stream():
+                if chunk:
+                    yield chunk
+
+    except Exception:
+        exc_info = sys.exc_info()
+        try:
+            template.handle_exception(exc_info)
+        finally:
+            del exc_info
+
+
+class _TemplateAppIter:
+    """
+    The ``app_iter`` of a streamed template response.
+
+    The first chunk is rendered when the object is created, so that errors
+    before any output reach the exception views. The rest is rendered with
+    the thread locals of the request pushed, as the WSGI server iterates
+    after the request has been handled.
+    """
+
+    def __init__(self, chunks, registry, request, encoding):
+        self.chunks = chunks
+        self.registry = registry
+        self.request = request
+        self.encoding = encoding
+        self.first = next(chunks, "")
+
+    def __iter__(self):
+        if self.first:
+            yield self.first.encode(self.encoding)
+            self.first = ""
+
+        while True:
+            manager.push({"registry": self.registry, "request": self.request})
+            try:
+                chunk = next(self.chunks, None)
+            finally:
+                manager.pop()
+
+            if chunk is None:
+                return
+
+            yield chunk.encode(self.encoding)
+
+    def close(self):
+        self.chunks.close()
+
+
+def _enable_streaming(registry) -> None:
+    factory = registry.tonnikala_renderer_factory
+    loader = factory.loader
+    if getattr(loader, "streaming", False):
+        return
+
+    if isinstance(loader, TetTonnikalaLoader):
+        loader.streaming = True
+        # templates compiled without the streaming functions
+        loader.cache.clear()
+    else:
+        _replace_loader(factory, TetTonnikalaLoader(streaming=True))
+
+
+def stream_template_view(view, info):
+    """
+    View deriver implementing the ``stream_template`` view option.
+
+    With ``stream_template=True``, the Tonnikala template of the view is
+    rendered while the response body is sent, using :func:`iter_template`.
+    The view must have a Tonnikala template renderer. If the view returns
+    something other than a dictionary, such as a response, it is returned
+    unchanged.
+    """
+    if not info.options.get("stream_template"):
+        return view
+
+    registry = info.registry
+    helper = info.options.get("renderer")
+    factory = getattr(registry, "tonnikala_renderer_factory", None)
+    if (
+        helper is None
+        or factory is None
+        or registry.queryUtility(IRendererFactory, name=helper.type) is not factory
+    ):
+        raise ConfigurationError(
+            "stream_template requires a Tonnikala template renderer, "
+            f"got {getattr(helper, 'name', None)!r}"
+        )
+
+    _enable_streaming(registry)
+    original_view = info.original_view
+
+    def wrapper(context, request):
+        value = view(context, request)
+        if not isinstance(value, dict):
+            return value
+
+        system = BeforeRender(
+            {
+                "view": original_view,
+                "renderer_name": helper.name,
+                "renderer_info": helper,
+                "context": context,
+                "request": request,
+                "req": request,
+                "get_csrf_token": partial(get_csrf_token, request),
+            },
+            value,
+        )
+        registry.notify(system)
+        system.update(value)
+
+        template = registry.tonnikala_renderer_factory.loader.load(helper.name)
+        response = request.response
+        encoding = response.charset or "utf-8"
+        response.app_iter = _TemplateAppIter(
+            iter_template(template, system), registry, request, encoding
+        )
+        return response
+
+    return wrapper
+
+
+stream_template_view.options = ("stream_template",)
+
+
+class TemplateTiming(NamedTuple):
+    """The result of compiling one template in :func:`warm_templates`."""
+
+    name: str
+    seconds: float
+    error: Optional[Exception] = None
+
+
+def _tonnikala_extensions(registry) -> List[str]:
+    factory = registry.tonnikala_renderer_factory
+    return [
+        name
+        for name, renderer_factory in registry.getUtilitiesFor(IRendererFactory)
+        if renderer_factory is factory and name.startswith(".")
+    ]
+
+
+def find_tonnikala_templates(registry) -> List[str]:
+    """
+    Return the names of the known Tonnikala templates.
+
+    These are the renderer names of the views whose renderer is a template
+    with a Tonnikala extension, followed by the paths of the files with a
+    Tonnikala extension in the search paths, relative to the search path.
+    Each name is returned once.
+
+    :param registry: The application registry, after the configuration
+        has been committed
+    :return: The template names, as passed to the Tonnikala loader
+    """
+    extensions = tuple(_tonnikala_extensions(registry))
+    if not extensions:
+        return []
+
+    names = {}
+    for intr in registry.introspector.get_category("templates") or ():
+        name = intr["introspectable"]["name"]
+        if name.endswith(extensions):
+            names[name] = None
+
+    loader = registry.tonnikala_renderer_factory.loader
+    for module, directory in loader.search_paths:
+        try:
+            base = resource_filepath(module, directory) if module else directory
+        except Exception:
+            continue
+
+        for root, dirs, files in os.walk(base):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.endswith(extensions):
+                    path = os.path.relpath(os.path.join(root, filename), base)
+                    names[path.replace(os.sep, "/")] = None
+
+    return list(names)
+
+
+def warm_templates(registry, names: Sequence[str] = ()) -> List[TemplateTiming]:
+    """
+    Load and compile Tonnikala templates into the cache of the loader.
+
+    A template that fails to compile is reported, but does not stop the
+    others from being compiled.
+
+    :param registry: The application registry
+    :param names: Template names to compile; by default the ones returned
+        by :func:`find_tonnikala_templates`
+    :return: The time taken by each template, and the error if it failed
+    """
+    loader = registry.tonnikala_renderer_factory.loader
+    results = []
+    for name in names or find_tonnikala_templates(registry):
+        start = time.perf_counter()
+        error = None
+        try:
+            loader.load(name)
+        except Exception as e:
+            error = e
+            logger.error("Unable to compile template %s: %s", name, e)
+        else:
+            logger.info(
+                "Compiled template %s in %.1f ms",
+                name,
+                (time.perf_counter() - start) * 1000,
+            )
+
+        results.append(TemplateTiming(name, time.perf_counter() - start, error))
+
+    return results
+
+
+def warm_tonnikala_templates(config: Configurator, *names: str):
+    """
+    Compile Tonnikala templates when the configuration is committed.
+
+    The templates are compiled by :func:`warm_templates` after all views
+    have been added, and the timing of each template is logged at the
+    ``INFO`` level on the ``tet.renderers.tonnikala`` logger.
+
+    :param config: Pyramid Configurator
+    :param names: Template names to compile; by default all known templates
+    """
+    registry = config.registry
+
+    def register():
+        results = warm_templates(registry, names)
+        logger.info(
+            "Compiled %d Tonnikala templates in %.1f ms",
+            len(results),
+            sum(result.seconds for result in results) * 1000,
+        )
+
+    # after the default order, so that every view has been added
+    config.action(None, register, order=1)
 
 
 def i18n(config: Configurator):
@@ -92,6 +829,19 @@ def includeme(config: Configurator):
     Pyramid includeme function for Tonnikala templates.
 
     Registers the Tonnikala renderer and adds ``.tk`` as a template extension.
+    Adds the ``set_tonnikala_cache_dir`` and ``warm_tonnikala_templates``
+    directives, and calls the former if the ``tet.tonnikala.cache_dir``
+    setting is set. Adds the ``stream_template`` view option.
     """
     config.include("tonnikala.pyramid")
     config.add_tonnikala_extensions(".tk")
+    config.add_directive("set_tonnikala_cache_dir", set_tonnikala_cache_dir)
+    config.add_directive("warm_tonnikala_templates", warm_tonnikala_templates)
+    # directly around the view, so that it sees the value returned by it
+    config.add_view_deriver(
+        stream_template_view, under="rendered_view", over="mapped_view"
+    )
+
+    cache_dir = (config.registry.settings or {}).get("tet.tonnikala.cache_dir")
+    if cache_dir:
+        config.set_tonnikala_cache_dir(cache_dir)
@@ -0,0 +1,6 @@
+"""
+Console scripts for Tet applications.
+
+- :mod:`tet.scripts.warm_templates` - ``tet-warm-templates``, compiles the
+  Tonnikala templates of an application
+"""
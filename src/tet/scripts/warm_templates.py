@@ -0,0 +1,67 @@
+"""
+Compile the Tonnikala templates of a Tet application.
+
+The ``tet-warm-templates`` command loads the application from a PasteDeploy
+configuration file and compiles its templates with
+:func:`tet.renderers.tonnikala.warm_templates`, printing the time taken by
+each. With the ``tet.tonnikala.cache_dir`` setting, this fills the compiled
+template cache, so that no worker has to compile a template after a deploy.
+
+Usage::
+
+    tet-warm-templates production.ini
+    tet-warm-templates production.ini#main templates/home.tk
+
+The command exits with status 1 if any template fails to compile.
+"""
+
+import argparse
+import sys
+from typing import List, Optional
+
+from pyramid.paster import bootstrap, setup_logging
+
+from tet.renderers.tonnikala import warm_templates
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the ``tet-warm-templates`` command."""
+    parser = argparse.ArgumentParser(
+        prog="tet-warm-templates",
+        description="Compile the Tonnikala templates of an application.",
+    )
+    parser.add_argument("config_uri", help="PasteDeploy configuration file")
+    parser.add_argument(
+        "names", nargs="*", help="templates to compile; by default all known ones"
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="only report failures"
+    )
+    args = parser.parse_args(argv)
+
+    setup_logging(args.config_uri)
+    with bootstrap(args.config_uri) as env:
+        registry = env["registry"]
+        if not hasattr(registry, "tonnikala_renderer_factory"):
+            print("The application does not use Tonnikala", file=sys.stderr)
+            return 1
+
+        results = warm_templates(registry, args.names)
+
+    failed = 0
+    for result in results:
+        if result.error is not None:
+            failed += 1
+            print(f"FAILED {result.name}: {result.error}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"{result.seconds * 1000:9.1f} ms  {result.name}")
+
+    if not args.quiet:
+        total = sum(result.seconds for result in results)
+        print(f"{total * 1000:9.1f} ms  total, {len(results)} templates")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
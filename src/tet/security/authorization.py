@@ -37,6 +37,24 @@ Using the policy::
     def main(config):
         config.set_authorization_policy(MyAuthorizationPolicy())
         config.scan()
+
+Caching decisions
+-----------------
+
+Views and templates often check the same permissions many times during a
+request. With ``AuthorizationPolicyWrapper(policy, cache=True)`` the
+decisions of the wrapped policy are memoized for the rest of the request,
+keyed by the identity of the context, the principals and the permission::
+
+    config.set_authorization_policy(
+        AuthorizationPolicyWrapper(MyAuthorizationPolicy(), cache=True)
+    )
+
+Call :func:`invalidate_authorization_cache` after changing something the
+policy depends on, for example after granting a role during the request.
+Pyramid does not pass the request to ``permits``, so the wrapper looks it
+up with ``get_current_request``; code that has the request at hand can pass
+it as ``request=`` to skip the lookup.
 """
 
 from typing import Any
@@ -47,7 +65,7 @@ from pyramid.interfaces import IAuthorizationPolicy
 from pyramid.threadlocal import get_current_request
 from zope.interface import Interface, implementer
 
-__all__ = ["INewAuthorizationPolicy"]
+__all__ = ["INewAuthorizationPolicy", "invalidate_authorization_cache"]
 
 
 class INewAuthorizationPolicy(Interface):
@@ -68,25 +86,63 @@ class INewAuthorizationPolicy(Interface):
         used."""
 
 
+def invalidate_authorization_cache(request) -> None:
+    """
+    Forget the authorization decisions cached for ``request``.
+
+    :param request: The request
+    """
+    request.__dict__.pop("_tet_authorization_cache", None)
+
+
 @implementer(IAuthorizationPolicy)
 class AuthorizationPolicyWrapper:
     """
     Wrapper that adapts INewAuthorizationPolicy to IAuthorizationPolicy.
 
     Automatically injects the current request into policy method calls.
+
+    :param wrapped: The :class:`INewAuthorizationPolicy`
+    :param cache: Memoize the results of ``permits`` for each request
     """
 
-    def __init__(self, wrapped):
+    def __init__(self, wrapped, *, cache: bool = False):
         self.wrapped = wrapped
+        self.cache = cache
 
-    def permits(self, context, principals, permission):
-        """Check if principals are allowed the permission on context."""
-        request = get_current_request()
-        return self.wrapped.permits(request, context, principals, permission)
+    def permits(self, context, principals, permission, request=None):
+        """
+        Check if principals are allowed the permission on context.
+
+        The current request is used unless ``request`` is given.
+        """
+        if request is None:
+            request = get_current_request()
+
+        if not self.cache or request is None:
+            return self.wrapped.permits(request, context, principals, permission)
+
+        decisions = request.__dict__.setdefault("_tet_authorization_cache", {})
+        key = (id(context), frozenset(principals), permission)
+        cached = decisions.get(key)
+        # the key holds only the id of the context; the decision keeps a
+        # reference to the context itself to rule out a reused id
+        if cached is not None and cached[0] is context:
+            return cached[1]
+
+        result = self.wrapped.permits(request, context, principals, permission)
+        decisions[key] = (context, result)
+        return result
+
+    def principals_allowed_by_permission(self, context, permission, request=None):
+        """
+        Return principals allowed the permission on context.
+
+        The current request is used unless ``request`` is given.
+        """
+        if request is None:
+            request = get_current_request()
 
-    def principals_allowed_by_permission(self, context, permission):
-        """Return principals allowed the permission on context."""
-        request = get_current_request()
         return self.wrapped.principals_allowed_by_permission(
             request, context, permission
         )
@@ -4,6 +4,7 @@ Utility functions and classes for Tet applications.
 This package provides various utilities:
 
 - :mod:`tet.util.base64` - Base64 and Crockford Base32 encoding
+- :mod:`tet.util.cache` - In-process LRU cache
 - :mod:`tet.util.collections` - Collection utilities (flatten)
 - :mod:`tet.util.crypt` - Password hashing utilities
 - :mod:`tet.util.export` - Module export decorator
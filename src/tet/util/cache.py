@@ -0,0 +1,125 @@
+"""
+In-process caches for Tet applications.
+
+This module provides a small thread-safe least-recently-used cache with
+optional time-based expiry, used by the caching helpers of Tet.
+
+Example
+-------
+
+Caching computed values::
+
+    from tet.util.cache import LRUCache
+
+    cache = LRUCache(maxsize=256, ttl=60)
+
+    value = cache.get("key")
+    if value is None:
+        value = compute()
+        cache.set("key", value)
+
+    cache.info()
+    # CacheInfo(hits=0, misses=1, maxsize=256, currsize=1)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a cache, like :func:`functools.lru_cache` reports."""
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache:
+    """
+    A thread-safe least-recently-used cache with optional expiry.
+
+    When the cache is full, setting a new key evicts the least recently used
+    entry. With ``ttl``, entries also expire that many seconds after they
+    were set; expired entries are dropped when they are looked up.
+
+    :param maxsize: Maximum number of entries
+    :param ttl: Seconds after which an entry expires, or ``None`` to keep
+        entries until they are evicted
+    :param timer: Monotonic clock used for expiry
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: Optional[float] = None,
+        *,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the value of ``key``, or ``default`` if it is not cached or
+        has expired. Lookups are counted as hits and misses.
+        """
+        with self._lock:
+            try:
+                value, expires = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires is not None and expires <= self.timer():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache ``value`` for ``key``, evicting the least recently used
+        entry if the cache is full."""
+        expires = None if self.ttl is None else self.timer() + self.ttl
+        with self._lock:
+            self._data[key] = value, expires
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        """Remove ``key`` from the cache, if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def info(self) -> CacheInfo:
+        """Return the statistics of the cache."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > self.timer())
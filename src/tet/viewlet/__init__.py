@@ -32,6 +32,12 @@ Creating a viewlet class and registering it as a template global::
         if request:
             event["viewlets"] = MyViewlets(request=request)
 
+Viewlets can cache their output with ``cache_key``, ``ttl`` and ``tags``;
+see :mod:`tet.viewlet.cache`. Containers deriving from :class:`Viewlets` can
+run the functions of slow viewlets in a thread pool ahead of time::
+
+    event["viewlets"] = MyViewlets(request).prefetch("sidebar")
+
 In templates, use ``$literal()`` to render viewlet output::
 
     <div class="sidebar">
@@ -43,17 +49,76 @@ In templates, use ``$literal()`` to render viewlet output::
     </div>
 """
 
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import wraps
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple, Union
 
 from pyramid.events import BeforeRender
 from pyramid.interfaces import Attribute, IDict
 from pyramid.renderers import get_renderer
-from zope.interface import Interface, implementer
+from pyramid.settings import asbool
+from pyramid.threadlocal import get_current_registry, manager
+from zope.interface import Interface, implementer, implementer_only
+
+from tet.viewlet.cache import get_viewlet_cache
+
+# relative template names are resolved against this package, as they were
+# when get_renderer was called from render_fragment without a package
+_package = sys.modules[__name__]
+
+_executor_lock = threading.Lock()
+
+
+def get_fragment_renderer(tpl, registry=None):
+    """
+    Return the renderer of the template ``tpl``.
+
+    The renderer of each template is looked up once per registry and then
+    reused, unless the ``pyramid.reload_templates`` setting is on.
+
+    :param tpl: Template asset specification
+    :param registry: The registry; by default the current registry
+    """
+    if registry is None:
+        registry = get_current_registry()
+
+    settings = registry.settings or {}
+    if asbool(settings.get("pyramid.reload_templates")):
+        return get_renderer(tpl, package=_package, registry=registry)
+
+    renderers = getattr(registry, "tet_fragment_renderers", None)
+    if renderers is None:
+        renderers = registry.tet_fragment_renderers = {}
+
+    renderer = renderers.get(tpl)
+    if renderer is None:
+        renderer = get_renderer(tpl, package=_package, registry=registry)
+        renderers[tpl] = renderer
+
+    return renderer
+
+
+def invalidate_fragment_renderers(registry=None):
+    """
+    Forget the renderers cached by :func:`get_fragment_renderer`.
+
+    Call this after replacing a renderer factory, or when the templates
+    must be looked up again.
+
+    :param registry: The registry; by default the current registry
+    """
+    if registry is None:
+        registry = get_current_registry()
+
+    registry.tet_fragment_renderers = {}
 
 
 def render_fragment(tpl, dct, system):
     """Render a template fragment with the given data and system values."""
-    renderer = get_renderer(tpl)
+    request = system.get("request")
+    renderer = get_fragment_renderer(tpl, getattr(request, "registry", None))
     return renderer.fragment(tpl, dct, system)
 
 
@@ -75,6 +140,18 @@ class IBeforeViewletRender(IDict):
     )
 
 
+class IBeforeEachViewletRender(IDict):
+    """
+    Event interface fired before rendering each viewlet.
+
+    Unlike :class:`IBeforeViewletRender`, which is fired once per request,
+    this event is fired for every viewlet rendered, so its subscribers can
+    add values that depend on the viewlet.
+    """
+
+    rendering_val = Attribute("The value returned by the viewlet function.")
+
+
 @implementer(IBeforeViewletRender)
 class BeforeViewletRender(dict):
     """Event fired before rendering a viewlet, allowing subscriber injection."""
@@ -84,28 +161,235 @@ class BeforeViewletRender(dict):
         self.rendering_val = rendering_val
 
 
-def viewlet(renderer):
+@implementer_only(IBeforeEachViewletRender)
+class BeforeEachViewletRender(BeforeViewletRender):
+    """Event fired before rendering each viewlet."""
+
+
+def get_viewlet_system(request, rendering_val=None) -> BeforeEachViewletRender:
+    """
+    Return the system values for rendering a viewlet.
+
+    The :class:`BeforeViewletRender` event is fired on the first call in a
+    request, and the values added by its subscribers are reused for the
+    rest of the request. The :class:`BeforeEachViewletRender` event is then
+    fired on a copy of them for every call.
+
+    :param request: The current request
+    :param rendering_val: The value returned by the viewlet function
+    """
+    registry = request.registry
+    base = getattr(request, "_tet_viewlet_system", None)
+    if base is None:
+        event = BeforeViewletRender({"request": request}, rendering_val)
+        registry.notify(event)
+        base = request._tet_viewlet_system = dict(event)
+
+    system = BeforeEachViewletRender(base, rendering_val)
+    registry.notify(system)
+    return system
+
+
+def viewlet(
+    renderer,
+    *,
+    cache_key: Optional[Callable[..., Hashable]] = None,
+    ttl: Optional[float] = None,
+    tags: Union[Iterable[str], Callable[..., Iterable[str]]] = (),
+):
     """
     Decorator that creates a viewlet from a function.
 
     The decorated function should return a dict of template variables.
     The viewlet renders the specified template and returns HTML.
 
+    With ``cache_key``, the rendered HTML is kept in the viewlet cache of
+    the registry (see :mod:`tet.viewlet.cache`). ``cache_key`` is called
+    with the arguments of the viewlet and returns the key of the fragment
+    among the fragments of this viewlet, or ``None`` to render it without
+    the cache. On a hit, neither the function nor the template is run.
+
     :param renderer: Template asset specification (e.g., 'myapp:templates/foo.tk')
+    :param cache_key: Callable returning the cache key of a call
+    :param ttl: Seconds after which a cached fragment expires, or ``None``
+        to keep it until it is evicted or invalidated
+    :param tags: Tags of the cached fragments, for
+        :func:`~tet.viewlet.cache.invalidate_viewlet_tags`; or a callable
+        returning them, called with the arguments of the viewlet
     :return: Decorator that wraps the function as a viewlet
     """
 
     def wrap(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        def render(request, self_or_req, *a, **kw):
+            future = _claim_prefetched(self_or_req, func, a, kw)
+            if future is None:
+                renderval = func(self_or_req, *a, **kw)
+            else:
+                renderval = future.result()
+
+            system = get_viewlet_system(request, renderval)
+            return render_fragment(renderer, renderval, system)
+
         @wraps(func)
         def wrapper(self_or_req, *a, **kw):
             request = get_request(self_or_req)
 
-            renderval = func(self_or_req, *a, **kw)
+            key = None
+            if cache_key is not None:
+                key = cache_key(self_or_req, *a, **kw)
 
-            system = BeforeViewletRender({"request": request}, renderval)
-            request.registry.notify(system)
-            return render_fragment(renderer, renderval, system)
+            if key is None:
+                return render(request, self_or_req, *a, **kw)
+
+            cache = get_viewlet_cache(request.registry)
+            viewlet_tags = tags(self_or_req, *a, **kw) if callable(tags) else tags
+            store_key = cache.make_key(name, (renderer, key), viewlet_tags)
+            rv = cache.get(name, store_key)
+            if rv is None:
+                # a plain str, as returned on a hit, so that a template
+                # escapes the output of a cached viewlet the same way
+                # whether or not it was cached
+                rv = str(render(request, self_or_req, *a, **kw))
+                cache.set(store_key, rv, ttl)
+
+            return rv
 
+        wrapper.viewlet_func = func
         return wrapper
 
     return wrap
+
+
+def get_viewlet_executor(registry) -> ThreadPoolExecutor:
+    """
+    Return the thread pool running the prefetched viewlets of ``registry``.
+
+    The pool is created on first use, with at most
+    ``tet.viewlet.prefetch_workers`` threads (default 4).
+    """
+    executor = getattr(registry, "tet_viewlet_executor", None)
+    if executor is None:
+        with _executor_lock:
+            executor = getattr(registry, "tet_viewlet_executor", None)
+            if executor is None:
+                settings = registry.settings or {}
+                workers = int(settings.get("tet.viewlet.prefetch_workers", 4))
+                executor = registry.tet_viewlet_executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="tet-viewlet"
+                )
+
+    return executor
+
+
+def _run_with_threadlocals(registry, request, func, *a, **kw):
+    manager.push({"registry": registry, "request": request})
+    try:
+        return func(*a, **kw)
+    finally:
+        manager.pop()
+
+
+def _claim_prefetched(viewlets, func, a, kw) -> Optional[Future]:
+    pending = getattr(viewlets, "_prefetched", None)
+    if not pending:
+        return None
+
+    for i, (pending_func, pending_a, pending_kw, future) in enumerate(pending):
+        if pending_func is func and pending_a == a and pending_kw == kw:
+            del pending[i]
+            return future
+
+    return None
+
+
+class _ClosingAppIter:
+    """An ``app_iter`` calling ``callback`` after closing the wrapped one."""
+
+    def __init__(self, app_iter, callback: Callable[[], None]):
+        self.app_iter = app_iter
+        self.callback = callback
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        try:
+            close = getattr(self.app_iter, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self.callback()
+
+
+class Viewlets:
+    """
+    Base class of viewlet containers.
+
+    Besides storing the request, it allows the data of viewlets to be
+    computed ahead of time with :meth:`prefetch`.
+
+    :param request: The current request
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._prefetched: List[Tuple[Callable, tuple, dict, Future]] = []
+
+    def prefetch(self, *names: str) -> "Viewlets":
+        """
+        Start running the functions of the named viewlets in the thread pool.
+
+        When the template later calls a prefetched viewlet, it waits for
+        the result of the function instead of calling it, and renders the
+        template of the viewlet as usual. The functions run with the
+        request and registry of this container as the current ones.
+
+        :param names: Names of viewlets called without arguments
+        :return: This container, so that it can be returned from a
+            ``BeforeRender`` subscriber in one expression
+        """
+        for name in names:
+            self.prefetch_call(name)
+
+        return self
+
+    def prefetch_call(self, name: str, *a, **kw) -> "Viewlets":
+        """
+        Start running the function of the named viewlet with arguments.
+
+        The prefetched result is used by a call with equal arguments.
+        """
+        func = getattr(getattr(type(self), name), "viewlet_func", None)
+        if func is None:
+            raise TypeError(f"{name!r} is not a viewlet")
+
+        request = self.request
+        registry = request.registry
+        if not self._prefetched:
+            request.add_finished_callback(self._cancel_prefetched)
+
+        future = get_viewlet_executor(registry).submit(
+            _run_with_threadlocals, registry, request, func, self, *a, **kw
+        )
+        self._prefetched.append((func, a, kw, future))
+        return self
+
+    def _cancel_prefetched(self, request):
+        # finished callbacks run before the WSGI server iterates the body;
+        # a streamed template renders its viewlets only then, so wait until
+        # the server closes the app_iter
+        response = request.__dict__.get("response")
+        app_iter = getattr(response, "app_iter", None)
+        if app_iter is not None and not isinstance(app_iter, (list, tuple)):
+            response.app_iter = _ClosingAppIter(app_iter, self._cancel_unclaimed)
+        else:
+            self._cancel_unclaimed()
+
+    def _cancel_unclaimed(self):
+        # viewlets that were prefetched but never rendered
+        for *_, future in self._prefetched:
+            future.cancel()
+
+        self._prefetched = []
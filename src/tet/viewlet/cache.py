@@ -0,0 +1,352 @@
+"""
+Fragment cache for viewlets.
+
+Viewlets declared with a ``cache_key`` (see :func:`tet.viewlet.viewlet`)
+store their rendered HTML in the viewlet cache of the registry and skip
+both the viewlet function and the template on a hit. The cache keeps its
+entries in a pluggable store:
+
+- :class:`MemoryViewletStore` - a least-recently-used cache in the process;
+  the default
+- :class:`FileViewletStore` - files in a directory, shared by all worker
+  processes on the host; put the directory on a ``tmpfs`` such as
+  ``/dev/shm`` to keep it in memory
+
+Entries can be tagged, and all entries with a tag are invalidated at once
+with :func:`invalidate_viewlet_tags`. Each tag has a generation that is part
+of the keys of its entries; invalidating the tag moves it to a new
+generation, so the old entries are no longer found and age out of the store.
+
+Settings
+--------
+
+``tet.viewlet.cache_dir``
+    Directory of a :class:`FileViewletStore`; without it the cache is kept
+    in memory
+
+``tet.viewlet.cache_maxsize``
+    Maximum number of fragments in the memory store (default 1024)
+
+Example
+-------
+
+Caching a sidebar for five minutes, per language::
+
+    from tet.viewlet import viewlet
+    from tet.viewlet.cache import invalidate_viewlet_tags
+
+    class MyViewlets:
+        def __init__(self, request):
+            self.request = request
+
+        @viewlet(
+            "myapp:templates/sidebar.tk",
+            cache_key=lambda self: self.request.locale_name,
+            ttl=300,
+            tags=["posts"],
+        )
+        def sidebar(self):
+            return {"recent_posts": get_recent_posts(self.request)}
+
+    def add_post(request):
+        ...
+        invalidate_viewlet_tags(request, "posts")
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Hashable, Iterable, NamedTuple, Optional
+
+from pyramid.config import Configurator
+from zope.interface import Interface, implementer
+
+from tet.util.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+class IViewletStore(Interface):
+    """The storage of the viewlet fragment cache."""
+
+    def get(key):
+        """Return the fragment stored under ``key``, or ``None`` if it is
+        missing or has expired."""
+
+    def set(key, value, ttl):
+        """Store the fragment ``value`` under ``key``, expiring after
+        ``ttl`` seconds, or never if ``ttl`` is ``None``."""
+
+    def generation(tag):
+        """Return the current generation of ``tag``, a string."""
+
+    def bump(tag):
+        """Move ``tag`` to a new generation."""
+
+    def clear():
+        """Remove all fragments."""
+
+
+@implementer(IViewletStore)
+class MemoryViewletStore:
+    """
+    Store fragments in a least-recently-used cache in the process.
+
+    :param maxsize: Maximum number of fragments
+    :param timer: Monotonic clock used for expiry
+    """
+
+    def __init__(self, maxsize: int = 1024, *, timer=time.monotonic):
+        self.cache = LRUCache(maxsize)
+        self.timer = timer
+        self.generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+
+        value, expires = entry
+        if expires is not None and expires <= self.timer():
+            self.cache.discard(key)
+            return None
+
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        expires = None if ttl is None else self.timer() + ttl
+        self.cache.set(key, (value, expires))
+
+    def generation(self, tag: str) -> str:
+        return str(self.generations.get(tag, 0))
+
+    def bump(self, tag: str) -> None:
+        with self._lock:
+            self.generations[tag] = self.generations.get(tag, 0) + 1
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+@implementer(IViewletStore)
+class FileViewletStore:
+    """
+    Store fragments as files in a directory.
+
+    Every process using the same directory shares the fragments and the tag
+    generations. Files are written to a temporary name and renamed, so a
+    reader never sees a partially written fragment. Expired fragments are
+    removed when they are read; fragments of old tag generations are never
+    read again, so remove old files periodically, for example with
+    ``find DIRECTORY -type f -mmin +60 -delete``.
+
+    :param directory: The cache directory; created if needed
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+
+    def _path(self, kind: str, key: str) -> str:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.directory, kind, digest[:2], digest)
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Unable to read viewlet cache file %s: %s", path, e)
+            return None
+
+    def _write(self, path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning("Unable to write viewlet cache file %s: %s", path, e)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path("fragments", key)
+        data = self._read(path)
+        if data is None:
+            return None
+
+        header, _, value = data.partition(b"\n")
+        try:
+            expires = float(header)
+        except ValueError:
+            return None
+
+        if expires and expires <= time.time():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+            return None
+
+        return value.decode("utf-8")
+
+    def set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        expires = 0 if ttl is None else time.time() + ttl
+        data = b"%r\n" % expires + value.encode("utf-8")
+        self._write(self._path("fragments", key), data)
+
+    def generation(self, tag: str) -> str:
+        data = self._read(self._path("tags", tag))
+        return "0" if data is None else data.decode("ascii")
+
+    def bump(self, tag: str) -> None:
+        # a random value cannot be lost by concurrent bumps, unlike a count
+        self._write(self._path("tags", tag), os.urandom(8).hex().encode("ascii"))
+
+    def clear(self) -> None:
+        for root, _dirs, files in os.walk(os.path.join(self.directory, "fragments")):
+            for filename in files:
+                try:
+                    os.unlink(os.path.join(root, filename))
+                except OSError:
+                    pass
+
+
+class ViewletCacheStats(NamedTuple):
+    """The hit and miss counts of a cached viewlet."""
+
+    hits: int
+    misses: int
+
+
+class ViewletCache:
+    """
+    The fragment cache of the viewlets of an application.
+
+    :param store: The :class:`IViewletStore` keeping the fragments
+    """
+
+    def __init__(self, store: IViewletStore):
+        self.store = store
+        self.stats: Dict[str, ViewletCacheStats] = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, name: str, key: Hashable, tags: Iterable[str] = ()) -> str:
+        """
+        Return the store key of a fragment.
+
+        The key combines the viewlet name, the key given by the viewlet and
+        the current generation of each tag, so it must have a stable
+        ``repr``, like strings, numbers and tuples of them.
+        """
+        generations = tuple((tag, self.store.generation(tag)) for tag in tags)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((name, key, generations)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, name: str, key: str) -> Optional[str]:
+        """Return the fragment of the viewlet ``name`` stored under ``key``,
+        counting the lookup as a hit or a miss."""
+        value = self.store.get(key)
+        with self._lock:
+            hits, misses = self.stats.get(name, (0, 0))
+            if value is None:
+                misses += 1
+            else:
+                hits += 1
+
+            self.stats[name] = ViewletCacheStats(hits, misses)
+
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Store a rendered fragment."""
+        self.store.set(key, str(value), ttl)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        """Invalidate every fragment tagged with any of ``tags``."""
+        for tag in tags:
+            self.store.bump(tag)
+
+    def info(self) -> Dict[str, ViewletCacheStats]:
+        """Return the hit and miss counts of each viewlet, by name."""
+        with self._lock:
+            return dict(self.stats)
+
+    def clear(self) -> None:
+        """Remove all fragments and reset the statistics."""
+        self.store.clear()
+        with self._lock:
+            self.stats.clear()
+
+
+def get_viewlet_cache(registry) -> ViewletCache:
+    """
+    Return the viewlet cache of ``registry``.
+
+    A cache with a :class:`MemoryViewletStore` is created on first use if
+    none has been set with ``config.set_viewlet_cache``.
+    """
+    cache = getattr(registry, "tet_viewlet_cache", None)
+    if cache is None:
+        with _lock:
+            cache = getattr(registry, "tet_viewlet_cache", None)
+            if cache is None:
+                cache = registry.tet_viewlet_cache = ViewletCache(MemoryViewletStore())
+
+    return cache
+
+
+def invalidate_viewlet_tags(request, *tags: str) -> None:
+    """
+    Invalidate every cached viewlet fragment tagged with any of ``tags``.
+
+    :param request: The current request
+    :param tags: The tags to invalidate
+    """
+    get_viewlet_cache(request.registry).invalidate_tags(*tags)
+
+
+def set_viewlet_cache(config: Configurator, store: IViewletStore):
+    """
+    Keep the cached viewlet fragments in ``store``.
+
+    :param config: Pyramid Configurator
+    :param store: An :class:`IViewletStore`, such as a
+        :class:`FileViewletStore`
+    """
+    config.registry.tet_viewlet_cache = ViewletCache(store)
+
+
+def includeme(config: Configurator):
+    """
+    Pyramid includeme for the viewlet fragment cache.
+
+    Adds the ``set_viewlet_cache`` directive and configures the store from
+    the ``tet.viewlet.cache_dir`` and ``tet.viewlet.cache_maxsize``
+    settings.
+    """
+    config.add_directive("set_viewlet_cache", set_viewlet_cache)
+
+    settings = config.registry.settings or {}
+    cache_dir = settings.get("tet.viewlet.cache_dir")
+    if cache_dir:
+        store = FileViewletStore(cache_dir)
+    else:
+        store = MemoryViewletStore(int(settings.get("tet.viewlet.cache_maxsize", 1024)))
+
+    config.set_viewlet_cache(store)
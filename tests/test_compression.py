@@ -0,0 +1,225 @@
+"""
+Tests for tet.compression module - Response compression tween.
+"""
+
+import gzip
+import json
+import zlib
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.request import Request
+from pyramid.response import FileResponse, Response
+from tet.compression import compression_tween_factory, includeme, is_compressible
+
+BODY = json.dumps([{"id": i, "name": f"item {i}"} for i in range(200)]).encode()
+
+
+def make_app(settings=None, **views):
+    config = Configurator(settings=settings or {})
+    includeme(config)
+    for name, view in views.items():
+        config.add_route(name, "/" + name)
+        config.add_view(view, route_name=name)
+
+    return config.make_wsgi_app()
+
+
+def json_view(request):
+    return Response(body=BODY, content_type="application/json")
+
+
+def get(app, path, accept_encoding="gzip"):
+    request = Request.blank(path)
+    if accept_encoding is not None:
+        request.headers["Accept-Encoding"] = accept_encoding
+
+    return request.get_response(app)
+
+
+class TestIsCompressible:
+    """Test media type classification."""
+
+    @pytest.mark.parametrize(
+        "content_type",
+        ["text/html", "application/json", "application/x-ndjson", "image/svg+xml"],
+    )
+    def test_compressible(self, content_type):
+        """Test that text-like media types are compressed."""
+        assert is_compressible(content_type)
+
+    @pytest.mark.parametrize(
+        "content_type", ["image/png", "video/mp4", "application/zip", "font/woff2", ""]
+    )
+    def test_incompressible(self, content_type):
+        """Test that already compressed media types are skipped."""
+        assert not is_compressible(content_type)
+
+
+class TestCompressionTween:
+    """Test the compression tween through a WSGI application."""
+
+    def test_gzip(self):
+        """Test that a large body is gzip compressed."""
+        response = get(make_app(json=json_view), "/json")
+
+        assert response.content_encoding == "gzip"
+        assert "Accept-Encoding" in response.vary
+        assert gzip.decompress(response.body) == BODY
+        assert response.content_length == len(response.body)
+
+    def test_no_accept_encoding(self):
+        """Test that the body is sent as is without Accept-Encoding."""
+        response = get(make_app(json=json_view), "/json", accept_encoding=None)
+
+        assert response.content_encoding is None
+        assert response.body == BODY
+        assert "Accept-Encoding" in response.vary
+
+    def test_encoding_refused(self):
+        """Test that encodings with q=0 are not used."""
+        response = get(make_app(json=json_view), "/json", "gzip;q=0, identity")
+
+        assert response.content_encoding is None
+
+    def test_below_threshold(self):
+        """Test that small bodies are not compressed."""
+        app = make_app({"tet.compression.min_size": str(len(BODY) + 1)}, json=json_view)
+
+        assert get(app, "/json").body == BODY
+
+    def test_skips_compressed_media_types(self):
+        """Test that images are not compressed."""
+
+        def png_view(request):
+            return Response(body=b"\x89PNG" * 1000, content_type="image/png")
+
+        response = get(make_app(png=png_view), "/png")
+
+        assert response.content_encoding is None
+        assert response.vary is None
+
+    def test_skips_encoded_response(self):
+        """Test that responses that are already encoded are left alone."""
+
+        def encoded_view(request):
+            response = json_view(request)
+            response.content_encoding = "identity"
+            return response
+
+        response = get(make_app(encoded=encoded_view), "/encoded")
+
+        assert response.body == BODY
+
+    def test_streamed_response(self):
+        """Test that an app_iter response is compressed chunk by chunk."""
+        closed = []
+
+        class Chunks:
+            def __iter__(self):
+                return iter([b"[1,", b"2,", b"3]"])
+
+            def close(self):
+                closed.append(True)
+
+        def stream_view(request):
+            response = Response(content_type="application/json")
+            response.app_iter = Chunks()
+            return response
+
+        response = get(make_app(stream=stream_view), "/stream")
+
+        assert response.content_encoding == "gzip"
+        chunks = list(response.app_iter)
+        response.app_iter.close()
+        assert gzip.decompress(b"".join(chunks)) == b"[1,2,3]"
+        assert closed == [True]
+
+        # every chunk is flushed so that it can be decoded on arrival
+        decompressor = zlib.decompressobj(31)
+        assert decompressor.decompress(chunks[0]) == b"[1,"
+
+    def test_file_response_not_buffered(self, tmp_path):
+        """Test that a file is compressed as it is read, not loaded in full."""
+        path = tmp_path / "data.csv"
+        data = b"".join(b"%d,item %d\n" % (i, i) for i in range(20000))
+        path.write_bytes(data)
+
+        def file_view(request):
+            return FileResponse(str(path), request, content_type="text/csv")
+
+        response = get(make_app(file=file_view), "/file")
+
+        assert response.content_encoding == "gzip"
+        assert response.content_length is None
+        assert not isinstance(response.app_iter, (list, tuple))
+        chunks = list(response.app_iter)
+        response.app_iter.close()
+        assert len(chunks) > 2
+        assert gzip.decompress(b"".join(chunks)) == data
+
+    def test_strong_etag_made_weak(self):
+        """Test that a strong ETag is weakened for the encoded body."""
+
+        def etag_view(request):
+            response = json_view(request)
+            response.etag = "abc"
+            return response
+
+        response = get(make_app(etag=etag_view), "/etag")
+
+        assert response.headers["ETag"] == 'W/"abc"'
+
+    def test_not_modified_varies(self):
+        """Test that a 304 from the etag tween has the Vary of the 200."""
+        config = Configurator()
+        includeme(config)
+        config.include("tet.etag")
+        config.add_route("json", "/json")
+        config.add_view(json_view, route_name="json")
+        app = config.make_wsgi_app()
+
+        response = get(app, "/json")
+        assert response.vary == ("Accept-Encoding",)
+
+        request = Request.blank("/json", if_none_match=response.etag)
+        request.headers["Accept-Encoding"] = "gzip"
+        not_modified = request.get_response(app)
+
+        assert not_modified.status_code == 304
+        assert not_modified.vary == ("Accept-Encoding",)
+
+    def test_gzip_level_setting(self):
+        """Test that the compression level setting is used."""
+        fast = get(make_app({"tet.compression.level": "1"}, json=json_view), "/json")
+        best = get(make_app({"tet.compression.level": "9"}, json=json_view), "/json")
+
+        # the XFL byte of the gzip header records the compression level used
+        assert fast.body[8] == 4
+        assert best.body[8] == 2
+
+    def test_brotli(self):
+        """Test that Brotli is preferred when installed and accepted."""
+        brotli = pytest.importorskip("brotli")
+
+        response = get(make_app(json=json_view), "/json", "gzip, br")
+
+        assert response.content_encoding == "br"
+        assert brotli.decompress(response.body) == BODY
+
+    def test_client_preference(self):
+        """Test that the client's q-values take precedence."""
+        pytest.importorskip("brotli")
+
+        response = get(make_app(json=json_view), "/json", "gzip, br;q=0.5")
+
+        assert response.content_encoding == "gzip"
+
+    def test_tween_factory_without_settings(self):
+        """Test that the tween factory works with no settings."""
+        registry = type("Registry", (), {"settings": None})()
+        request = Request.blank("/", headers={"Accept-Encoding": "gzip"})
+
+        tween = compression_tween_factory(json_view, registry)
+
+        assert tween(request).content_encoding == "gzip"
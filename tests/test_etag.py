@@ -0,0 +1,230 @@
+"""
+Tests for tet.etag module - Automatic ETags and conditional GET.
+"""
+
+import sys
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.request import Request
+from pyramid.response import Response
+from tet.etag import check_etag_version, get_etag_hasher, includeme
+
+
+def make_app(settings=None, **views):
+    config = Configurator(settings=settings or {})
+    includeme(config)
+    for name, view in views.items():
+        config.add_route(name, "/" + name)
+        config.add_view(view, route_name=name, renderer="json")
+
+    return config.make_wsgi_app(), config
+
+
+def get(app, path, if_none_match=None, method="GET"):
+    request = Request.blank(path, method=method)
+    if if_none_match is not None:
+        request.headers["If-None-Match"] = if_none_match
+
+    return request.get_response(app)
+
+
+def data_view(request):
+    request.response.cache_control = "max-age=60"
+    return {"items": list(range(10))}
+
+
+class TestGetEtagHasher:
+    """Test ETag hash selection."""
+
+    def test_blake2b(self):
+        """Test that blake2b produces a 128-bit hex digest."""
+        assert len(get_etag_hasher("blake2b")(b"body")) == 32
+
+    def test_unknown_algorithm(self):
+        """Test that unknown algorithm names are rejected."""
+        with pytest.raises(ValueError, match="Unknown ETag algorithm"):
+            get_etag_hasher("md5")
+
+    def test_missing_library_falls_back(self, monkeypatch):
+        """Test fallback to blake2b when xxhash is not installed."""
+        monkeypatch.setitem(sys.modules, "xxhash", None)
+
+        with pytest.warns(RuntimeWarning, match="xxhash"):
+            hasher = get_etag_hasher("xxhash")
+
+        assert hasher(b"body") == get_etag_hasher("blake2b")(b"body")
+
+    def test_xxhash(self):
+        """Test that the xxhash hasher is deterministic."""
+        pytest.importorskip("xxhash")
+        hasher = get_etag_hasher("xxhash")
+
+        assert hasher(b"body") == hasher(b"body") != hasher(b"other")
+
+
+class TestEtagTween:
+    """Test the ETag tween through a WSGI application."""
+
+    def test_adds_weak_etag(self):
+        """Test that a rendered response gets a weak ETag."""
+        app, _ = make_app(data=data_view)
+
+        response = get(app, "/data")
+
+        assert response.status_code == 200
+        assert response.headers["ETag"].startswith('W/"')
+
+    def test_same_body_same_etag(self):
+        """Test that the ETag only depends on the body."""
+        app, _ = make_app(data=data_view)
+
+        assert get(app, "/data").etag == get(app, "/data").etag
+
+    def test_not_modified(self):
+        """Test that a matching If-None-Match is answered with 304."""
+        app, _ = make_app(data=data_view)
+        etag = get(app, "/data").headers["ETag"]
+
+        response = get(app, "/data", if_none_match=etag)
+
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["ETag"] == etag
+        assert response.headers["Cache-Control"] == "max-age=60"
+
+    def test_head_not_modified(self):
+        """Test that conditional HEAD requests are answered with 304."""
+        app, _ = make_app(data=data_view)
+        etag = get(app, "/data").headers["ETag"]
+
+        assert get(app, "/data", if_none_match=etag, method="HEAD").status_code == 304
+
+    def test_mismatch_sends_body(self):
+        """Test that a stale If-None-Match gets the full response."""
+        app, _ = make_app(data=data_view)
+
+        response = get(app, "/data", if_none_match='W/"stale"')
+
+        assert response.status_code == 200
+        assert response.json == {"items": list(range(10))}
+
+    def test_post_not_tagged(self):
+        """Test that only GET and HEAD responses are tagged."""
+        app, _ = make_app(data=data_view)
+
+        assert "ETag" not in get(app, "/data", method="POST").headers
+
+    def test_existing_etag_kept(self):
+        """Test that an ETag set by the view is used as is."""
+
+        def tagged_view(request):
+            response = Response(json_body={"a": 1})
+            response.etag = "v1"
+            return response
+
+        app, _ = make_app(tagged=tagged_view)
+
+        assert get(app, "/tagged").headers["ETag"] == '"v1"'
+        assert get(app, "/tagged", if_none_match='"v1"').status_code == 304
+
+    def test_streamed_response_not_hashed(self):
+        """Test that streamed responses are not buffered for hashing."""
+
+        def stream_view(request):
+            response = Response()
+            response.app_iter = iter([b"a", b"b"])
+            return response
+
+        app, _ = make_app(stream=stream_view)
+
+        response = get(app, "/stream")
+
+        assert "ETag" not in response.headers
+        assert response.body == b"ab"
+
+    def test_xxhash_setting(self):
+        """Test that the algorithm setting is used."""
+        pytest.importorskip("xxhash")
+        app, _ = make_app({"tet.etag.algorithm": "xxhash"}, data=data_view)
+
+        response = get(app, "/data")
+
+        expected = get_etag_hasher("xxhash")(response.body)
+        assert response.headers["ETag"] == f'W/"{expected}"'
+
+
+class TestEtagVersion:
+    """Test view supplied version keys."""
+
+    def make_versioned_app(self, calls):
+        config = Configurator()
+        includeme(config)
+
+        def view(request):
+            calls.append(True)
+            return {"rendered": True}
+
+        config.add_route("doc", "/doc")
+        config.add_view(
+            view,
+            route_name="doc",
+            renderer="json",
+            etag_version=lambda context, request: 42,
+        )
+        return config.make_wsgi_app()
+
+    def test_version_etag(self):
+        """Test that the version key determines the ETag."""
+        app = self.make_versioned_app([])
+
+        first = get(app, "/doc").headers["ETag"]
+
+        assert first == get(app, "/doc").headers["ETag"]
+        assert first.startswith('W/"')
+
+    def test_version_skips_view(self):
+        """Test that the view is not called when the version matches."""
+        calls = []
+        app = self.make_versioned_app(calls)
+        etag = get(app, "/doc").headers["ETag"]
+
+        response = get(app, "/doc", if_none_match=etag)
+
+        assert response.status_code == 304
+        assert calls == [True]
+
+    def test_check_etag_version_sets_etag(self):
+        """Test check_etag_version on a request without a match."""
+        request = Request.blank("/")
+        request.response = Response()
+
+        check_etag_version(request, "v1")
+
+        assert request.response.headers["ETag"].startswith('W/"')
+
+
+class TestWithCompression:
+    """Test the ETag feature together with response compression."""
+
+    def test_etag_of_uncompressed_body(self):
+        """Test that the ETag is computed before compression."""
+        config = Configurator(settings={"tet.compression.min_size": "0"})
+        config.include("tet.compression")
+        includeme(config)
+        config.add_route("data", "/data")
+        config.add_view(data_view, route_name="data", renderer="json")
+        app = config.make_wsgi_app()
+
+        plain = get(app, "/data")
+        request = Request.blank("/data", headers={"Accept-Encoding": "gzip"})
+        compressed = request.get_response(app)
+
+        assert compressed.content_encoding == "gzip"
+        assert compressed.headers["ETag"] == plain.headers["ETag"]
+
+        request = Request.blank(
+            "/data",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]},
+        )
+        assert request.get_response(app).status_code == 304
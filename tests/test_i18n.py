@@ -0,0 +1,384 @@
+"""
+Tests for tet.i18n module - Internationalization support.
+"""
+
+import logging
+import os
+import struct
+import tracemalloc
+
+import pytest
+from pyramid.config import Configurator
+from pyramid.i18n import TranslationString, make_localizer
+from pyramid.interfaces import ILocalizer
+from pyramid.request import Request, apply_request_extensions
+from tet.i18n import add_renderer_globals, configure_i18n, preload_localizers
+from tet.i18n.catalog import (
+    CatalogTranslations,
+    MmapCatalog,
+    catalog_path,
+    compile_catalog,
+    load_catalog,
+    make_catalog_localizer,
+)
+
+
+def write_mo(path, messages):
+    """Write a GNU gettext catalog with the given ``{msgid: msgstr}``."""
+    items = sorted(
+        (key.encode("utf-8"), value.encode("utf-8")) for key, value in messages.items()
+    )
+    count = len(items)
+    ids = strs = b""
+    offsets = []
+    for msgid, msgstr in items:
+        offsets.append((len(ids), len(msgid), len(strs), len(msgstr)))
+        ids += msgid + b"\0"
+        strs += msgstr + b"\0"
+
+    keys_start = 7 * 4 + 16 * count
+    values_start = keys_start + len(ids)
+    keys = []
+    values = []
+    for id_offset, id_length, str_offset, str_length in offsets:
+        keys += [id_length, keys_start + id_offset]
+        values += [str_length, values_start + str_offset]
+
+    header = struct.pack(
+        "Iiiiiii", 0x950412DE, 0, count, 7 * 4, 7 * 4 + count * 8, 0, 0
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(
+        header
+        + struct.pack(f"{len(keys)}i", *keys)
+        + struct.pack(f"{len(values)}i", *values)
+        + ids
+        + strs
+    )
+
+
+MESSAGES = {
+    "": "Content-Type: text/plain; charset=UTF-8\n",
+    "Hello": "Hei",
+    "Hello ${name}": "Hei ${name}",
+    "menu\x04Open": "Avaa",
+}
+
+
+@pytest.fixture
+def locale_dir(tmp_path):
+    write_mo(tmp_path / "fi" / "LC_MESSAGES" / "myapp.mo", MESSAGES)
+    return tmp_path
+
+
+def make_request(locale_dir, settings=None, locale="fi"):
+    config = Configurator(settings=settings or {})
+    configure_i18n(config, "myapp")
+    config.add_translation_dirs(str(locale_dir))
+    config.commit()
+
+    return blank_request(config.registry, locale)
+
+
+def blank_request(registry, locale):
+    request = Request.blank("/")
+    request.registry = registry
+    request._LOCALE_ = locale
+    apply_request_extensions(request)
+    return request
+
+
+class TestTranslate:
+    """Test request.translate and its translation cache."""
+
+    def test_translate(self, locale_dir):
+        """Test translating strings, with mapping and context."""
+        request = make_request(locale_dir)
+
+        assert request.translate("Hello") == "Hei"
+        assert request.translate("Hello ${name}", mapping={"name": "Ann"}) == (
+            "Hei Ann"
+        )
+        assert request.translate("Open", context="menu") == "Avaa"
+        assert request.translate("Open") == "Open"
+        assert request.translate("Missing") == "Missing"
+
+    def test_cached_by_locale_domain_and_context(self, locale_dir):
+        """Test that plain strings are cached with their full key."""
+        request = make_request(locale_dir)
+        request.translate("Hello")
+        request.translate("Hello")
+        request.translate("Open", context="menu")
+        request.translate("Hello", domain="other")
+
+        cache = request.registry.tet_translation_cache
+        assert ("fi", "myapp", "Hello", None) in cache
+        assert ("fi", "myapp", "Open", "menu") in cache
+        assert ("fi", "other", "Hello", None) in cache
+        assert cache.info().hits == 1
+
+        english = blank_request(request.registry, "en")
+        assert english.translate("Hello") == "Hello"
+        assert ("en", "myapp", "Hello", None) in cache
+
+    def test_mapping_and_translation_strings_not_cached(self, locale_dir):
+        """Test that interpolated values are not cached."""
+        request = make_request(locale_dir)
+        request.translate("Hello ${name}", mapping={"name": "Ann"})
+        ts = TranslationString("Hello ${name}", mapping={"name": "Bob"})
+
+        assert request.translate(ts) == "Hei Bob"
+        assert request.registry.tet_translation_cache.info().currsize == 0
+
+    def test_cache_size_setting(self, locale_dir):
+        """Test that the cache is bounded, and can be turned off."""
+        request = make_request(locale_dir, {"tet.i18n.translation_cache_size": "2"})
+        for msgid in ["a", "b", "c"]:
+            request.translate(msgid)
+        assert len(request.registry.tet_translation_cache) == 2
+
+        request = make_request(locale_dir, {"tet.i18n.translation_cache_size": "0"})
+        assert request.translate("Hello") == "Hei"
+        assert not hasattr(request.registry, "tet_translation_cache")
+
+
+class TestPreloadLocales:
+    """Test loading translations at startup."""
+
+    def test_preload_setting(self, locale_dir, caplog):
+        """Test that localizers are registered when the config is committed."""
+        config = Configurator(settings={"tet.i18n.preload_locales": "fi sv"})
+        configure_i18n(config, "myapp")
+        config.add_translation_dirs(str(locale_dir))
+
+        with caplog.at_level(logging.INFO, logger="tet.i18n"):
+            config.commit()
+
+        localizer = config.registry.queryUtility(ILocalizer, name="fi")
+        assert localizer is not None
+        assert config.registry.queryUtility(ILocalizer, name="sv") is not None
+        assert "Preloaded translations of 2 locales (fi, sv)" in caplog.text
+        assert "KiB" in caplog.text
+
+        request = blank_request(config.registry, "fi")
+        assert request.localizer is localizer
+        assert request.translate("Hello") == "Hei"
+
+    def test_preload_argument(self, locale_dir):
+        """Test that locales can be passed to configure_i18n."""
+        config = Configurator()
+        configure_i18n(config, "myapp", preload_locales=["fi"])
+        config.add_translation_dirs(str(locale_dir))
+        config.commit()
+
+        localizer = config.registry.queryUtility(ILocalizer, name="fi")
+        assert localizer.translate(TranslationString("Hello", domain="myapp")) == "Hei"
+
+    def test_no_preload_by_default(self, locale_dir):
+        """Test that nothing is loaded without preload locales."""
+        request = make_request(locale_dir)
+
+        assert request.registry.queryUtility(ILocalizer, name="fi") is None
+
+    def test_preload_localizers(self, locale_dir):
+        """Test preloading directly, leaving tracemalloc as it was."""
+        request = make_request(locale_dir)
+
+        [localizer] = preload_localizers(request.registry, ["fi"])
+        assert localizer.locale_name == "fi"
+        assert not tracemalloc.is_tracing()
+
+
+class TestRendererGlobals:
+    """Test the lazy i18n template globals."""
+
+    def test_globals_are_lazy(self, locale_dir):
+        """Test that rendering without translating creates no localizer."""
+        request = make_request(locale_dir)
+        system = {"request": request}
+
+        add_renderer_globals(system)
+
+        assert set(system) == {"request", "_", "gettext", "ngettext", "localizer"}
+        assert "localizer" not in request.__dict__
+        assert "translate" not in request.__dict__
+        assert repr(system["_"]) == "<lazy request.translate>"
+
+    def test_globals_resolve_on_use(self, locale_dir):
+        """Test that the proxies behave like the request attributes."""
+        request = make_request(locale_dir)
+        system = {"request": request}
+        add_renderer_globals(system)
+
+        assert system["_"]("Hello") == "Hei"
+        assert system["gettext"]("Open", context="menu") == "Avaa"
+        assert system["ngettext"]("Apple", "Apples", 2) == "Apples"
+        assert system["localizer"].locale_name == "fi"
+        assert "localizer" in request.__dict__
+
+    def test_json_rendering_skips_localizer(self, locale_dir):
+        """Test that a JSON view does not touch the localizer."""
+        config = Configurator()
+        configure_i18n(config, "myapp")
+        config.add_translation_dirs(str(locale_dir))
+        config.add_route("data", "/data")
+        config.add_view(lambda request: {"a": 1}, route_name="data", renderer="json")
+        app = config.make_wsgi_app()
+
+        requests = []
+        config.add_subscriber(
+            lambda event: requests.append(event.request), "pyramid.events.NewResponse"
+        )
+        config.commit()
+
+        response = Request.blank("/data").get_response(app)
+        assert response.json == {"a": 1}
+        assert "localizer" not in requests[0].__dict__
+
+
+PLURAL_MESSAGES = {
+    "": "Content-Type: text/plain; charset=UTF-8\n"
+    "Plural-Forms: nplurals=3; plural=(n==1 ? 0 : n==2 ? 1 : 2);\n",
+    "Hello": "Hei",
+    "menu\x04Open": "Avaa",
+    "Apple\x00Apples": "Omena\x00Kaksi omenaa\x00Omenoita",
+}
+
+
+class TestCatalog:
+    """Test the memory-mapped message catalogs."""
+
+    def test_compile_and_lookup(self, tmp_path):
+        """Test looking up messages, contexts and plural forms."""
+        mo_path = tmp_path / "myapp.mo"
+        write_mo(mo_path, PLURAL_MESSAGES)
+        compile_catalog(str(mo_path), str(tmp_path / "myapp.tcat"))
+
+        catalog = MmapCatalog(str(tmp_path / "myapp.tcat"))
+        assert catalog.count == 4
+        assert catalog.gettext("Hello") == "Hei"
+        assert catalog.gettext("menu\x04Open") == "Avaa"
+        assert catalog.gettext("Open") is None
+        assert catalog.gettext("Apple") is None
+        assert [catalog.ngettext("Apple", n) for n in (1, 2, 5)] == [
+            "Omena",
+            "Kaksi omenaa",
+            "Omenoita",
+        ]
+        assert catalog.ngettext("Hello", 1) is None
+        catalog.close()
+
+    def test_many_messages(self, tmp_path):
+        """Test that every message is found with colliding slots."""
+        messages = {f"msg {i}": f"viesti {i}" for i in range(500)}
+        write_mo(tmp_path / "big.mo", messages)
+        compile_catalog(str(tmp_path / "big.mo"), str(tmp_path / "big.tcat"))
+
+        catalog = MmapCatalog(str(tmp_path / "big.tcat"))
+        assert all(catalog.gettext(k) == v for k, v in messages.items())
+        assert catalog.gettext("msg 500") is None
+
+    def test_recompiled_when_stale(self, tmp_path):
+        """Test that a changed .mo file is compiled again."""
+        mo_path = tmp_path / "myapp.mo"
+        write_mo(mo_path, {"Hello": "Hei"})
+        catalog_dir = str(tmp_path / "catalogs")
+
+        assert load_catalog(str(mo_path), catalog_dir).gettext("Hello") == "Hei"
+        path = catalog_path(catalog_dir, str(mo_path))
+        mtime = os.stat(path).st_mtime_ns
+        assert load_catalog(str(mo_path), catalog_dir).gettext("Hello") == "Hei"
+        assert os.stat(path).st_mtime_ns == mtime
+
+        write_mo(mo_path, {"Hello": "Moi!"})
+        assert load_catalog(str(mo_path), catalog_dir).gettext("Hello") == "Moi!"
+
+    def test_corrupt_file_recompiled(self, tmp_path):
+        """Test that an unreadable compiled catalog is replaced."""
+        mo_path = tmp_path / "myapp.mo"
+        write_mo(mo_path, {"Hello": "Hei"})
+        catalog_dir = str(tmp_path / "catalogs")
+        os.makedirs(catalog_dir)
+        with open(catalog_path(catalog_dir, str(mo_path)), "wb") as f:
+            f.write(b"garbage")
+
+        assert load_catalog(str(mo_path), catalog_dir).gettext("Hello") == "Hei"
+
+    def test_later_catalogs_override(self, tmp_path):
+        """Test that the most recently added catalog of a domain wins."""
+        catalog_dir = str(tmp_path / "catalogs")
+        write_mo(tmp_path / "a.mo", {"Hello": "Hei", "Bye": "Hei hei"})
+        write_mo(tmp_path / "b.mo", {"Hello": "Moi"})
+
+        translations = CatalogTranslations("myapp")
+        translations.add("myapp", load_catalog(str(tmp_path / "a.mo"), catalog_dir))
+        translations.add("myapp", load_catalog(str(tmp_path / "b.mo"), catalog_dir))
+
+        assert translations.gettext("Hello") == "Moi"
+        assert translations.gettext("Bye") == "Hei hei"
+        assert translations.dugettext("other", "Hello") == "Moi"
+        assert translations.dugettext("other", "Missing") == "Missing"
+        assert translations.ngettext("Apple", "Apples", 1) == "Apple"
+        assert translations.ngettext("Apple", "Apples", 3) == "Apples"
+
+    def test_same_as_pyramid_localizer(self, tmp_path):
+        """Test that both localizers translate every domain alike."""
+        messages_dir = tmp_path / "fi" / "LC_MESSAGES"
+        write_mo(messages_dir / "messages.mo", {"Default": "Oletus", "Hello": "Moi"})
+        write_mo(messages_dir / "myapp.mo", PLURAL_MESSAGES)
+        tdirs = [str(tmp_path)]
+
+        pyramid_localizer = make_localizer("fi", tdirs)
+        catalog_localizer = make_catalog_localizer(
+            "fi", tdirs, str(tmp_path / "catalogs")
+        )
+
+        for domain in ["messages", "myapp", "otherdomain"]:
+            for msgid in ["Default", "Hello", "Missing"]:
+                ts = TranslationString(msgid, domain=domain)
+                assert catalog_localizer.translate(ts) == (
+                    pyramid_localizer.translate(ts)
+                )
+
+            for n in [1, 2, 5]:
+                assert catalog_localizer.pluralize(
+                    "Apple", "Apples", n, domain=domain
+                ) == pyramid_localizer.pluralize("Apple", "Apples", n, domain=domain)
+
+        ts = TranslationString("Default", domain="otherdomain")
+        assert catalog_localizer.translate(ts) == "Oletus"
+
+    def test_request_translations(self, tmp_path):
+        """Test translating through the request with the catalog backend."""
+        write_mo(tmp_path / "fi" / "LC_MESSAGES" / "myapp.mo", PLURAL_MESSAGES)
+        write_mo(tmp_path / "fi_FI" / "LC_MESSAGES" / "myapp.mo", {"Hello": "Moi"})
+        catalog_dir = tmp_path / "catalogs"
+        request = make_request(
+            tmp_path, {"tet.i18n.catalog_dir": str(catalog_dir)}, locale="fi_FI"
+        )
+
+        assert isinstance(request.localizer.translations, CatalogTranslations)
+        assert request.translate("Hello") == "Moi"
+        assert request.translate("Open", context="menu") == "Avaa"
+        assert request.pluralize("Apple", "Apples", 2) == "Kaksi omenaa"
+        assert request.pluralize("Pear", "Pears", 2) == "Pears"
+        assert len(os.listdir(catalog_dir)) == 2
+
+        other = blank_request(request.registry, "fi_FI")
+        assert other.localizer is request.localizer
+
+    def test_preload_with_catalogs(self, locale_dir, tmp_path):
+        """Test that preloading uses the catalog backend."""
+        config = Configurator()
+        configure_i18n(
+            config,
+            "myapp",
+            preload_locales=["fi"],
+            catalog_dir=str(tmp_path / "catalogs"),
+        )
+        config.add_translation_dirs(str(locale_dir))
+        config.commit()
+
+        localizer = config.registry.queryUtility(ILocalizer, name="fi")
+        assert isinstance(localizer.translations, CatalogTranslations)
+        assert localizer.translate(TranslationString("Hello", domain="myapp")) == "Hei"
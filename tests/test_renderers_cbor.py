@@ -0,0 +1,124 @@
+"""
+Tests for tet.renderers.cbor module - CBOR renderer with JSON adapters.
+"""
+
+import datetime
+from decimal import Decimal
+
+import pytest
+
+cbor2 = pytest.importorskip("cbor2")
+
+from pyramid.config import Configurator  # noqa: E402
+from pyramid.request import Request  # noqa: E402
+from tet.renderers.cbor import CBORRenderer, includeme  # noqa: E402
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+@pytest.fixture
+def config():
+    config = Configurator()
+    includeme(config)
+    return config
+
+
+class TestCBORRenderer:
+    """Test CBOR rendering."""
+
+    def render(self, renderer, value):
+        return cbor2.loads(renderer({})(value, {}))
+
+    def test_includeme_registers_renderer(self, config):
+        """Test that includeme registers cbor next to json."""
+        renderers = config.registry.tet_json_renderers
+
+        assert isinstance(renderers["cbor"], CBORRenderer)
+        assert renderers["cbor"].json_renderer is renderers["json"]
+
+    def test_shares_json_adapters(self, config):
+        """Test that adapters added to json apply to cbor."""
+        config.add_json_adapter(for_=Point, adapter=lambda p, req: [p.x, p.y])
+        renderer = config.registry.tet_json_renderers["cbor"]
+
+        assert self.render(renderer, {"p": Point(1, 2), "n": None}) == {
+            "p": [1, 2],
+            "n": None,
+        }
+
+    def test_native_types(self, config):
+        """Test that types CBOR supports natively are kept."""
+        renderer = config.registry.tet_json_renderers["cbor"]
+
+        assert self.render(renderer, [Decimal("1.5"), b"\x00"]) == [
+            Decimal("1.5"),
+            b"\x00",
+        ]
+
+    def test_datetimes_use_json_adapters(self, config):
+        """Test that dates go through the adapters of the json renderer."""
+        renderer = config.registry.tet_json_renderers["cbor"]
+        naive = datetime.datetime(2024, 1, 15, 12, 30)
+        aware = datetime.datetime(2024, 1, 15, tzinfo=datetime.timezone.utc)
+
+        assert self.render(
+            renderer, {"naive": naive, "nested": [(aware, datetime.date(2024, 1, 2))]}
+        ) == {
+            "naive": "2024-01-15T12:30:00",
+            "nested": [["2024-01-15T00:00:00+00:00", "2024-01-02"]],
+        }
+
+        config.add_json_adapter(for_=datetime.datetime, adapter=lambda d, req: "dt")
+        config.add_json_adapter(for_=Point, adapter=lambda p, req: {"at": naive})
+        assert self.render(renderer, [naive, Point(1, 2)]) == ["dt", {"at": "dt"}]
+
+    def test_value_not_copied(self, config, monkeypatch):
+        """Test that the value is encoded as is, with tuples as arrays."""
+        from tet.renderers import cbor as tet_cbor
+
+        encoded = []
+        original_dumps = cbor2.dumps
+
+        def dumps(obj, **kw):
+            encoded.append(obj)
+            return original_dumps(obj, **kw)
+
+        monkeypatch.setattr(tet_cbor.cbor2, "dumps", dumps)
+        renderer = config.registry.tet_json_renderers["cbor"]
+        value = {"rows": [(1, datetime.date(2024, 1, 2)), (2, None)]}
+
+        assert self.render(renderer, value) == {"rows": [[1, "2024-01-02"], [2, None]]}
+        assert encoded == [value]
+        assert encoded[0] is value
+
+    def test_timezone_option(self, config):
+        """Test that native datetimes can be encoded with a timezone."""
+        config.add_cbor_renderer(
+            name="cbor_utc", native_datetimes=True, timezone=datetime.timezone.utc
+        )
+        renderer = config.registry.tet_json_renderers["cbor_utc"]
+
+        assert self.render(renderer, datetime.datetime(2024, 1, 15)) == (
+            datetime.datetime(2024, 1, 15, tzinfo=datetime.timezone.utc)
+        )
+
+    def test_content_negotiation(self, config):
+        """Test serving CBOR for Accept: application/cbor."""
+        config.add_route("point", "/point")
+        config.add_view(
+            lambda request: {"p": Point(1, 2)},
+            route_name="point",
+            renderer="cbor",
+            accept="application/cbor",
+        )
+        config.add_json_adapter(for_=Point, adapter=lambda p, req: [p.x, p.y])
+        app = config.make_wsgi_app()
+
+        response = Request.blank("/point", accept="application/cbor").get_response(app)
+
+        assert response.content_type == "application/cbor"
+        assert cbor2.loads(response.body) == {"p": [1, 2]}
@@ -3,16 +3,30 @@ Tests for tet.renderers.json module - Enhanced JSON renderer with adapters.
 """
 
 import datetime
+import enum
+import json
+import sys
+import uuid
+from collections import namedtuple
 from unittest.mock import Mock
 
+import pytest
+from pyramid.config import Configurator
+from pyramid import testing
 from pyramid.renderers import JSON
+from pyramid.request import Request
 from tet.renderers.json import (
+    JSONLinesRenderer,
+    JSONRenderer,
+    JSONStreamRenderer,
     _get_json_renderer_registry,
     add_json_adapter,
+    compile_model_serializer,
     construct_default_renderer,
     hook_json_renderer,
     includeme,
 )
+from zope.interface import Interface, alsoProvides, implementer
 
 
 class TestJsonRendererRegistry:
@@ -176,6 +190,581 @@ class TestConstructDefaultRenderer:
         assert parsed["d"] == "2024-03-15"
 
 
+class TestJSONRendererDispatch:
+    """Test the cached adapter dispatch of JSONRenderer."""
+
+    def render(self, renderer, value):
+        return json.loads(renderer({})(value, {}))
+
+    def test_adapter_resolved_through_mro(self):
+        """Test that subclasses use the adapter registered for a base."""
+
+        class Base:
+            pass
+
+        class Derived(Base):
+            pass
+
+        renderer = JSONRenderer()
+        renderer.add_adapter(Base, lambda o, req: type(o).__name__)
+
+        assert self.render(renderer, [Base(), Derived()]) == ["Base", "Derived"]
+        assert renderer._adapter_cache[Derived] is renderer._adapter_cache[Base]
+
+    def test_interface_adapter(self):
+        """Test adapters registered for an interface implemented by a class."""
+
+        class IThing(Interface):
+            pass
+
+        @implementer(IThing)
+        class Thing:
+            pass
+
+        renderer = JSONRenderer()
+        renderer.add_adapter(IThing, lambda o, req: "thing")
+
+        assert self.render(renderer, [Thing(), Thing()]) == ["thing", "thing"]
+
+    def test_directly_provided_interface_bypasses_cache(self):
+        """Test that directly provided interfaces are honoured per object."""
+
+        class IMarked(Interface):
+            pass
+
+        class Plain:
+            pass
+
+        renderer = JSONRenderer()
+        renderer.add_adapter(IMarked, lambda o, req: "marked")
+        renderer.add_adapter(Plain, lambda o, req: "plain")
+
+        marked = Plain()
+        alsoProvides(marked, IMarked)
+
+        assert self.render(renderer, [Plain(), marked, Plain()]) == [
+            "plain",
+            "marked",
+            "plain",
+        ]
+
+    def test_json_method(self):
+        """Test that __json__ is called with the request."""
+
+        class WithJson:
+            def __json__(self, request):
+                return {"request": request}
+
+        renderer = JSONRenderer()
+        result = renderer({})({"o": WithJson()}, {"request": None})
+        assert json.loads(result) == {"o": {"request": None}}
+
+    def test_add_adapter_clears_cache(self):
+        """Test that adding an adapter invalidates cached dispatch."""
+
+        class Base:
+            pass
+
+        class Derived(Base):
+            pass
+
+        renderer = JSONRenderer()
+        renderer.add_adapter(Base, lambda o, req: "base")
+        assert self.render(renderer, [Derived()]) == ["base"]
+
+        renderer.add_adapter(Derived, lambda o, req: "derived")
+        assert self.render(renderer, [Derived()]) == ["derived"]
+
+    def test_unserializable_raises_type_error(self):
+        """Test that objects without an adapter are rejected."""
+
+        class Unknown:
+            pass
+
+        renderer = JSONRenderer()
+        with pytest.raises(TypeError, match="not JSON serializable"):
+            renderer({})([Unknown()], {})
+
+    def test_add_json_adapter_clears_cache(self, pyramid_config):
+        """Test that the add_json_adapter directive invalidates the cache."""
+        includeme(pyramid_config)
+        renderer = pyramid_config.registry.tet_json_renderers["json"]
+
+        class Model:
+            pass
+
+        with pytest.raises(TypeError):
+            renderer({})([Model()], {})
+
+        pyramid_config.add_json_adapter(for_=Model, adapter=lambda o, req: 1)
+        assert renderer({})([Model()], {}) == "[1]"
+
+
+class TestJSONStreamRenderer:
+    """Test the streaming JSON array renderer."""
+
+    def render(self, renderer, value, system=None):
+        return renderer({})(value, system or {})
+
+    def test_streams_generator_in_batches(self):
+        """Test that a generator is rendered as a chunked JSON array."""
+        renderer = JSONStreamRenderer(JSONRenderer(), batch_size=2)
+
+        chunks = list(self.render(renderer, (i for i in range(5))))
+
+        assert chunks == [b"[0, 1", b",2, 3", b",4", b"]"]
+        assert json.loads(b"".join(chunks)) == [0, 1, 2, 3, 4]
+
+    def test_empty_iterable(self):
+        """Test that an empty iterable renders an empty array."""
+        renderer = JSONStreamRenderer(JSONRenderer())
+
+        assert b"".join(self.render(renderer, iter(()))) == b"[]"
+
+    def test_first_batch_is_eager(self):
+        """Test that errors in the first batch are raised immediately."""
+
+        def failing():
+            raise RuntimeError("query failed")
+            yield
+
+        renderer = JSONStreamRenderer(JSONRenderer())
+        with pytest.raises(RuntimeError, match="query failed"):
+            self.render(renderer, failing())
+
+    def test_consumes_lazily(self):
+        """Test that only the first batch is consumed before iteration."""
+        consumed = []
+
+        def items():
+            for i in range(10):
+                consumed.append(i)
+                yield i
+
+        renderer = JSONStreamRenderer(JSONRenderer(), batch_size=3)
+        result = self.render(renderer, items())
+
+        assert consumed == [0, 1, 2]
+        assert json.loads(b"".join(result)) == list(range(10))
+
+    def test_applies_adapters(self):
+        """Test that adapters of the wrapped renderer are applied."""
+        json_renderer = construct_default_renderer()
+        renderer = JSONStreamRenderer(json_renderer)
+
+        class Item:
+            def __init__(self, n):
+                self.n = n
+
+        renderer.add_adapter(Item, lambda o, req: {"n": o.n})
+        rows = ({"item": Item(i), "d": datetime.date(2024, 1, i)} for i in (1, 2))
+
+        assert json.loads(b"".join(self.render(renderer, rows))) == [
+            {"item": {"n": 1}, "d": "2024-01-01"},
+            {"item": {"n": 2}, "d": "2024-01-02"},
+        ]
+
+    def test_rejects_mapping(self):
+        """Test that a dict is not mistaken for an iterable of items."""
+        renderer = JSONStreamRenderer(JSONRenderer())
+
+        with pytest.raises(TypeError, match="iterable of items"):
+            self.render(renderer, {"a": 1})
+
+    def test_sets_content_type(self):
+        """Test that the response content type is set."""
+        request = testing.DummyRequest()
+        renderer = JSONStreamRenderer(JSONRenderer())
+
+        self.render(renderer, [1], {"request": request})
+
+        assert request.response.content_type == "application/json"
+
+    def test_streams_sqlalchemy_result(self):
+        """Test streaming the rows of an SQLAlchemy Result."""
+        sa = pytest.importorskip("sqlalchemy")
+        engine = sa.create_engine("sqlite://")
+        renderer = JSONStreamRenderer(JSONRenderer(), batch_size=2)
+
+        with engine.connect() as conn:
+            result = conn.execute(
+                sa.text("SELECT 1 AS n UNION ALL SELECT 2 UNION ALL SELECT 3")
+            )
+            body = b"".join(self.render(renderer, result.scalars()))
+
+        assert json.loads(body) == [1, 2, 3]
+
+    def test_streams_view_response(self):
+        """Test a view rendered with json_stream through a WSGI app."""
+        config = Configurator()
+        includeme(config)
+        config.add_route("rows", "/rows")
+        config.add_view(
+            lambda request: ({"id": i} for i in range(3)),
+            route_name="rows",
+            renderer="json_stream",
+        )
+        app = config.make_wsgi_app()
+
+        response = Request.blank("/rows").get_response(app)
+
+        assert response.content_type == "application/json"
+        assert response.json == [{"id": 0}, {"id": 1}, {"id": 2}]
+
+    def test_includeme_registers_json_stream(self, pyramid_config):
+        """Test that includeme registers json_stream sharing the adapters."""
+        includeme(pyramid_config)
+        renderers = pyramid_config.registry.tet_json_renderers
+
+        assert isinstance(renderers["json_stream"], JSONStreamRenderer)
+        assert renderers["json_stream"].json_renderer is renderers["json"]
+
+        class Model:
+            pass
+
+        pyramid_config.add_json_adapter(for_=Model, adapter=lambda o, req: "m")
+        result = self.render(renderers["json_stream"], [Model()])
+        assert b"".join(result) == b'["m"]'
+
+
+class TestJSONLinesRenderer:
+    """Test the newline-delimited JSON renderer."""
+
+    def render(self, renderer, value, system=None):
+        return renderer({})(value, system or {})
+
+    def test_one_item_per_line(self):
+        """Test that each item is serialized on its own line."""
+        renderer = JSONLinesRenderer(JSONRenderer(indent=2), batch_size=2)
+
+        chunks = list(self.render(renderer, ({"n": i} for i in range(3))))
+
+        assert chunks == [b'{"n": 0}\n{"n": 1}\n', b'{"n": 2}\n']
+
+    def test_flush_every_line(self):
+        """Test that a batch size of 1 sends every line separately."""
+        renderer = JSONLinesRenderer(JSONRenderer(), batch_size=1)
+
+        assert list(self.render(renderer, [1, "a"])) == [b"1\n", b'"a"\n']
+
+    def test_empty_iterable(self):
+        """Test that an empty iterable renders an empty body."""
+        renderer = JSONLinesRenderer(JSONRenderer())
+
+        assert b"".join(self.render(renderer, [])) == b""
+
+    def test_applies_adapters(self):
+        """Test that the adapters of the wrapped renderer are applied."""
+        renderer = JSONLinesRenderer(construct_default_renderer())
+
+        body = b"".join(self.render(renderer, [datetime.date(2024, 1, 15)]))
+
+        assert body == b'"2024-01-15"\n'
+
+    def test_custom_serializer(self):
+        """Test rendering lines with a non-stdlib serializer."""
+        pytest.importorskip("orjson")
+        renderer = JSONLinesRenderer(construct_default_renderer(backend="orjson"))
+
+        body = b"".join(self.render(renderer, [{"a": [1, 2]}, {"b": None}]))
+
+        assert body == b'{"a":[1,2]}\n{"b":null}\n'
+
+    def test_sets_content_type(self):
+        """Test that the NDJSON content type is set."""
+        request = testing.DummyRequest()
+        renderer = JSONLinesRenderer(JSONRenderer())
+
+        self.render(renderer, [1], {"request": request})
+
+        assert request.response.content_type == "application/x-ndjson"
+
+    def test_includeme_registers_ndjson(self, pyramid_config):
+        """Test that includeme registers ndjson sharing the adapters."""
+        includeme(pyramid_config)
+        renderers = pyramid_config.registry.tet_json_renderers
+
+        assert isinstance(renderers["ndjson"], JSONLinesRenderer)
+        assert renderers["ndjson"].json_renderer is renderers["json"]
+
+
+class TestSQLAlchemyRows:
+    """Test the SQLAlchemy Row and result adapters."""
+
+    @pytest.fixture
+    def connection(self):
+        sa = pytest.importorskip("sqlalchemy")
+        engine = sa.create_engine("sqlite://")
+        with engine.connect() as conn:
+            yield conn
+
+    def execute(self, conn, sql):
+        from sqlalchemy import text
+
+        return conn.execute(text(sql))
+
+    def render(self, value):
+        renderer = construct_default_renderer()
+        return json.loads(renderer({})(value, {}))
+
+    def test_rows(self, connection):
+        """Test that a list of rows is serialized as a list of objects."""
+        rows = self.execute(
+            connection, "SELECT 1 AS id, 'a' AS name UNION ALL SELECT 2, 'b'"
+        ).all()
+
+        assert self.render(rows) == [
+            {"id": 1, "name": "a"},
+            {"id": 2, "name": "b"},
+        ]
+
+    def test_rows_of_different_results(self, connection):
+        """Test that field names are not shared between results."""
+        first = self.execute(connection, "SELECT 1 AS a").one()
+        second = self.execute(connection, "SELECT 2 AS b, 3 AS c").one()
+
+        assert self.render([first, second, first]) == [
+            {"a": 1},
+            {"b": 2, "c": 3},
+            {"a": 1},
+        ]
+
+    def test_row_mappings(self, connection):
+        """Test that RowMapping objects are serialized as objects."""
+        mappings = self.execute(connection, "SELECT 1 AS id").mappings().all()
+
+        assert self.render(mappings) == [{"id": 1}]
+
+    def test_results(self, connection):
+        """Test that unconsumed results are serialized as lists."""
+        sql = "SELECT 1 AS id UNION ALL SELECT 2"
+
+        assert self.render(self.execute(connection, sql)) == [{"id": 1}, {"id": 2}]
+        assert self.render(self.execute(connection, sql).scalars()) == [1, 2]
+        assert self.render(self.execute(connection, sql).mappings()) == [
+            {"id": 1},
+            {"id": 2},
+        ]
+
+
+class TestCompileModelSerializer:
+    """Test generation of attribute serializers."""
+
+    def test_serializes_fields(self):
+        """Test that the generated function returns the listed attributes."""
+
+        class Obj:
+            id = 1
+            name = "x"
+
+        serialize = compile_model_serializer(["id", "name"], name="serialize_obj")
+
+        assert serialize(Obj(), None) == {"id": 1, "name": "x"}
+        assert serialize.__name__ == "serialize_obj"
+
+    def test_non_identifier_fields(self):
+        """Test attributes whose names are not plain identifiers."""
+        obj = type("Obj", (), {"class": "c", "odd-name": 2})()
+
+        serialize = compile_model_serializer(["class", "odd-name"])
+
+        assert serialize(obj, None) == {"class": "c", "odd-name": 2}
+
+
+class TestAddJsonModel:
+    """Test the add_json_model directive."""
+
+    @pytest.fixture
+    def models(self):
+        from sqlalchemy import Column, Date, ForeignKey, Integer, String, orm
+
+        Base = orm.declarative_base()
+
+        class Author(Base):
+            __tablename__ = "authors"
+            id = Column(Integer, primary_key=True)
+            name = Column(String)
+            born = Column(Date)
+            _secret = Column("secret", String)
+            bio = orm.deferred(Column(String))
+
+        class Book(Base):
+            __tablename__ = "books"
+            id = Column(Integer, primary_key=True)
+            title = Column(String)
+            author_id = Column(Integer, ForeignKey("authors.id"))
+            author = orm.relationship(Author)
+
+        return Base, Author, Book
+
+    def render(self, config, value):
+        config.commit()
+        renderer = config.registry.tet_json_renderers["json"]
+        return json.loads(renderer({})(value, {}))
+
+    def test_registers_all_mapped_classes(self, pyramid_config, models):
+        """Test that every class of a declarative base is serialized."""
+        Base, Author, Book = models
+        includeme(pyramid_config)
+        pyramid_config.add_json_model(Base)
+
+        author = Author(id=1, name="Tove", born=datetime.date(1914, 8, 9))
+        book = Book(id=2, title="Moomins", author_id=1, author=author)
+
+        assert self.render(pyramid_config, [author, book]) == [
+            {"id": 1, "name": "Tove", "born": "1914-08-09"},
+            {"id": 2, "title": "Moomins", "author_id": 1},
+        ]
+
+    def test_fields_and_exclude(self, pyramid_config, models):
+        """Test explicit fields and exclusions for a mapped class."""
+        Base, Author, Book = models
+        includeme(pyramid_config)
+        pyramid_config.add_json_model(Book, fields=["id", "title", "author"])
+        pyramid_config.add_json_model(Author, exclude=["born"])
+
+        book = Book(id=2, title="Moomins", author=Author(id=1, name="Tove"))
+
+        assert self.render(pyramid_config, book) == {
+            "id": 2,
+            "title": "Moomins",
+            "author": {"id": 1, "name": "Tove"},
+        }
+
+    def test_mapped_subclasses(self, pyramid_config):
+        """Test that mapped subclasses get serializers of their own."""
+        from sqlalchemy import Column, Integer, String, orm
+
+        Base = orm.declarative_base()
+
+        class Animal(Base):
+            __tablename__ = "animals"
+            id = Column(Integer, primary_key=True)
+            kind = Column(String)
+            __mapper_args__ = {"polymorphic_on": kind, "polymorphic_identity": "a"}
+
+        class Dog(Animal):
+            __mapper_args__ = {"polymorphic_identity": "dog"}
+            barks = Column(Integer)
+
+        includeme(pyramid_config)
+        pyramid_config.add_json_model(Animal)
+
+        assert self.render(pyramid_config, [Animal(id=1), Dog(id=2, barks=3)]) == [
+            {"id": 1, "kind": "a"},
+            {"id": 2, "kind": "dog", "barks": 3},
+        ]
+
+
+class TestJsonBackend:
+    """Test selecting the serializer backend."""
+
+    def test_construct_default_renderer_backend(self):
+        """Test constructing a renderer on a named backend."""
+        pytest.importorskip("orjson")
+        renderer = construct_default_renderer(backend="orjson")
+
+        dt = datetime.datetime(2024, 1, 15, 12, 30, 45)
+        result = renderer({})({"dt": dt, "n": [1, 2]}, {})
+        assert result == '{"dt":"2024-01-15T12:30:45","n":[1,2]}'
+
+    @pytest.mark.parametrize("backend", ["stdlib", "orjson", "ujson"])
+    def test_json_method(self, backend):
+        """Test that __json__ is called with the request on every backend."""
+        if backend != "stdlib":
+            pytest.importorskip(backend)
+
+        class WithJson:
+            def __json__(self, request):
+                return {"request": request}
+
+        renderer = construct_default_renderer(backend=backend)
+        result = renderer({})({"o": WithJson(), "n": [1]}, {"request": None})
+        assert json.loads(result) == {"o": {"request": None}, "n": [1]}
+
+    @pytest.mark.parametrize("backend", ["stdlib", "orjson", "ujson"])
+    def test_uuid_and_enum_adapters(self, backend):
+        """Test UUID and Enum adapters, which orjson cannot honour."""
+        if backend != "stdlib":
+            pytest.importorskip(backend)
+
+        class Color(enum.Enum):
+            RED = 1
+
+        renderer = construct_default_renderer(backend=backend)
+        value = [uuid.UUID(int=0), Color.RED]
+        if backend == "orjson":
+            with pytest.warns(RuntimeWarning, match="encodes UUID itself"):
+                renderer.add_adapter(uuid.UUID, lambda o, req: f"UUID:{o.hex[:4]}")
+            with pytest.warns(RuntimeWarning, match="encodes Color itself"):
+                renderer.add_adapter(Color, lambda o, req: f"E:{o.name}")
+
+            expected = ["00000000-0000-0000-0000-000000000000", 1]
+        else:
+            renderer.add_adapter(uuid.UUID, lambda o, req: f"UUID:{o.hex[:4]}")
+            renderer.add_adapter(Color, lambda o, req: f"E:{o.name}")
+            expected = ["UUID:0000", "E:RED"]
+
+        assert json.loads(renderer({})(value, {})) == expected
+
+    @pytest.mark.parametrize("backend", ["stdlib", "orjson", "ujson"])
+    def test_namedtuple(self, backend):
+        """Test that named tuples are arrays on every backend."""
+        if backend != "stdlib":
+            pytest.importorskip(backend)
+
+        Point = namedtuple("Point", "x y")
+        renderer = construct_default_renderer(backend=backend)
+
+        result = renderer({})({"p": Point(1, 2), "t": (3,)}, {})
+        assert json.loads(result) == {"p": [1, 2], "t": [3]}
+
+    def test_explicit_serializer_wins(self):
+        """Test that an explicit serializer overrides the backend."""
+        serializer = Mock(return_value="{}")
+        renderer = construct_default_renderer(backend="orjson", serializer=serializer)
+
+        assert renderer({})({}, {}) == "{}"
+        serializer.assert_called_once()
+
+    def test_includeme_uses_backend_setting(self):
+        """Test that includeme honours the tet.json.backend setting."""
+        pytest.importorskip("orjson")
+        config = Configurator(settings={"tet.json.backend": "orjson"})
+        includeme(config)
+
+        class Point:
+            def __init__(self, x, y):
+                self.x = x
+                self.y = y
+
+        config.add_json_adapter(for_=Point, adapter=lambda p, req: [p.x, p.y])
+        renderer = config.registry.tet_json_renderers["json"]
+
+        result = renderer({})({"p": Point(1, 2)}, {})
+        assert result == '{"p":[1,2]}'
+
+    def test_includeme_missing_backend_falls_back(self, monkeypatch):
+        """Test that a missing backend library falls back to the stdlib."""
+        monkeypatch.setitem(sys.modules, "orjson", None)
+        config = Configurator(settings={"tet.json.backend": "orjson"})
+
+        with pytest.warns(RuntimeWarning):
+            includeme(config)
+
+        renderer = config.registry.tet_json_renderers["json"]
+        assert renderer.serializer is json.dumps
+
+    def test_hook_json_renderer_without_renderer(self, pyramid_config):
+        """Test that hooking without a renderer constructs a default one."""
+        hook_json_renderer(pyramid_config, name="fast", backend="stdlib")
+
+        renderer = pyramid_config.registry.tet_json_renderers["fast"]
+        assert isinstance(renderer, JSON)
+        d = datetime.date(2024, 1, 15)
+        assert renderer({})({"d": d}, {}) == '{"d": "2024-01-15"}'
+
+
 class TestIncludeme:
     """Test the includeme configuration function."""
 
@@ -193,13 +782,14 @@ class TestIncludeme:
         assert isinstance(call_args[0][1], JSON)
 
         # Should add directives
-        assert pyramid_config.add_directive.call_count == 2
+        assert pyramid_config.add_directive.call_count == 3
 
         # Check directives added
         calls = pyramid_config.add_directive.call_args_list
         directive_names = [call[0][0] for call in calls]
         assert "add_json_renderer" in directive_names
         assert "add_json_adapter" in directive_names
+        assert "add_json_model" in directive_names
 
     def test_includeme_creates_registry(self, pyramid_config):
         """Test that includeme creates the renderer registry."""
@@ -0,0 +1,95 @@
+"""
+Tests for tet.renderers.msgpack module - MessagePack renderer with JSON adapters.
+"""
+
+import datetime
+
+import pytest
+
+msgpack = pytest.importorskip("msgpack")
+
+from pyramid.config import Configurator  # noqa: E402
+from pyramid.request import Request  # noqa: E402
+from tet.renderers.msgpack import MessagePackRenderer, includeme  # noqa: E402
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+@pytest.fixture
+def config():
+    config = Configurator()
+    includeme(config)
+    return config
+
+
+class TestMessagePackRenderer:
+    """Test MessagePack rendering."""
+
+    def render(self, renderer, value):
+        return msgpack.unpackb(renderer({})(value, {}))
+
+    def test_includeme_registers_renderer(self, config):
+        """Test that includeme registers msgpack next to json."""
+        renderers = config.registry.tet_json_renderers
+
+        assert isinstance(renderers["msgpack"], MessagePackRenderer)
+        assert renderers["msgpack"].json_renderer is renderers["json"]
+
+    def test_default_adapters(self, config):
+        """Test that the default JSON adapters are applied."""
+        renderer = config.registry.tet_json_renderers["msgpack"]
+        value = {"when": datetime.datetime(2024, 1, 15, 12, 30), "n": [1, 2]}
+
+        assert self.render(renderer, value) == {
+            "when": "2024-01-15T12:30:00",
+            "n": [1, 2],
+        }
+
+    def test_shares_json_adapters(self, config):
+        """Test that adapters added to json apply to msgpack."""
+        config.add_json_adapter(for_=Point, adapter=lambda p, req: [p.x, p.y])
+        renderer = config.registry.tet_json_renderers["msgpack"]
+
+        assert self.render(renderer, {"p": Point(1, 2)}) == {"p": [1, 2]}
+
+    def test_binary_values(self, config):
+        """Test that bytes are encoded as binary."""
+        renderer = config.registry.tet_json_renderers["msgpack"]
+
+        assert self.render(renderer, {"data": b"\x00\x01"}) == {"data": b"\x00\x01"}
+
+    def test_add_msgpack_renderer_directive(self, config):
+        """Test registering another renderer with packb options."""
+        config.add_msgpack_renderer(name="msgpack_tuples", use_single_float=True)
+        renderer = config.registry.tet_json_renderers["msgpack_tuples"]
+
+        assert len(renderer({})(1.5, {})) == 5
+
+    def test_content_negotiation(self, config):
+        """Test choosing JSON or MessagePack with the Accept header."""
+        config.add_route("point", "/point")
+        for renderer, accept in [
+            ("json", "application/json"),
+            ("msgpack", "application/msgpack"),
+        ]:
+            config.add_view(
+                lambda request: {"p": Point(1, 2)},
+                route_name="point",
+                renderer=renderer,
+                accept=accept,
+            )
+        config.add_json_adapter(for_=Point, adapter=lambda p, req: [p.x, p.y])
+        app = config.make_wsgi_app()
+
+        response = Request.blank("/point", accept="application/msgpack").get_response(
+            app
+        )
+        assert response.content_type == "application/msgpack"
+        assert msgpack.unpackb(response.body) == {"p": [1, 2]}
+
+        response = Request.blank("/point", accept="application/json").get_response(app)
+        assert response.json == {"p": [1, 2]}
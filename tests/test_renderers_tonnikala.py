@@ -0,0 +1,420 @@
+"""
+Tests for tet.renderers.tonnikala module - Tonnikala integration.
+"""
+
+import marshal
+import os
+
+import pytest
+
+pytest.importorskip("tonnikala")
+
+from pyramid.config import Configurator  # noqa: E402
+from pyramid.renderers import render  # noqa: E402
+from tet.renderers import tonnikala as tet_tonnikala  # noqa: E402
+from tet.renderers.tonnikala import TetTonnikalaLoader  # noqa: E402
+
+TEMPLATE = """<html><body><h1>Hello $name.</h1>
+<p py:for="item in items">$item</p></body></html>"""
+
+
+@pytest.fixture
+def template_dir(tmp_path):
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "page.tk").write_text(TEMPLATE)
+    return templates
+
+
+def make_config(settings=None):
+    config = Configurator(settings=settings or {})
+    config.include("tet.renderers.tonnikala")
+    config.commit()
+    return config
+
+
+def render_page(config, template_dir):
+    return render(
+        str(template_dir / "page.tk"),
+        {"name": "World", "items": ["<a>", "b"]},
+        request=None,
+        package=None,
+    )
+
+
+class TestTemplateCache:
+    """Test the on-disk cache of compiled templates."""
+
+    def render(self, config, template_dir):
+        config.begin()
+        try:
+            return render_page(config, template_dir)
+        finally:
+            config.end()
+
+    def test_setting_installs_caching_loader(self, tmp_path):
+        """Test that tet.tonnikala.cache_dir replaces the loader."""
+        config = make_config({"tet.tonnikala.cache_dir": str(tmp_path / "cache")})
+        loader = config.registry.tonnikala_renderer_factory.loader
+
+        assert isinstance(loader, TetTonnikalaLoader)
+        assert loader.cache_dir == str(tmp_path / "cache")
+
+    def test_no_cache_by_default(self):
+        """Test that the loader is not replaced without the setting."""
+        config = make_config()
+        loader = config.registry.tonnikala_renderer_factory.loader
+
+        assert not isinstance(loader, TetTonnikalaLoader)
+
+    def test_writes_and_reuses_compiled_code(self, tmp_path, template_dir, monkeypatch):
+        """Test that a fresh loader reuses the compiled code from the cache."""
+        cache_dir = tmp_path / "cache"
+        settings = {"tet.tonnikala.cache_dir": str(cache_dir)}
+        expected = self.render(make_config(settings), template_dir)
+        assert "Hello World." in expected
+        assert "&lt;a&gt;" in expected
+
+        files = os.listdir(cache_dir)
+        assert len(files) == 1
+        assert files[0].endswith(".tkc")
+
+        def fail(*args, **kwargs):
+            raise AssertionError("template was compiled again")
+
+        monkeypatch.setattr(TetTonnikalaLoader, "_compile", fail)
+        assert self.render(make_config(settings), template_dir) == expected
+
+    def test_changed_source_gets_new_entry(self, tmp_path, template_dir):
+        """Test that the cache key depends on the template source."""
+        cache_dir = tmp_path / "cache"
+        settings = {"tet.tonnikala.cache_dir": str(cache_dir)}
+        self.render(make_config(settings), template_dir)
+
+        (template_dir / "page.tk").write_text(TEMPLATE.replace("Hello", "Hi"))
+        result = self.render(make_config(settings), template_dir)
+
+        assert "Hi World." in result
+        assert len(os.listdir(cache_dir)) == 2
+
+    def test_cache_key_includes_translatable(self, tmp_path):
+        """Test that translatable templates are cached separately."""
+        loader = TetTonnikalaLoader(str(tmp_path))
+        key = loader.cache_key(TEMPLATE)
+        loader.translatable = True
+
+        assert loader.cache_key(TEMPLATE) != key
+
+    def test_filename_of_cached_code(self, tmp_path):
+        """Test that cached code reports the path it was loaded from."""
+        loader = TetTonnikalaLoader(str(tmp_path))
+        loader.load_string(TEMPLATE, filename="/release-1/page.tk")
+
+        with open(loader.cache_path(TEMPLATE), "rb") as f:
+            code, lnotab = marshal.load(f)
+        assert code.co_filename == "/release-1/page.tk"
+
+        replaced = tet_tonnikala._replace_filename(code, "/release-2/page.tk")
+        filenames = []
+
+        def collect(code):
+            filenames.append(code.co_filename)
+            for const in code.co_consts:
+                if hasattr(const, "co_filename"):
+                    collect(const)
+
+        collect(replaced)
+        assert len(filenames) > 1
+        assert set(filenames) == {"/release-2/page.tk"}
+
+    def test_corrupt_cache_file_is_ignored(self, tmp_path):
+        """Test that an unreadable cache file is recompiled."""
+        loader = TetTonnikalaLoader(str(tmp_path))
+        with open(loader.cache_path(TEMPLATE), "wb") as f:
+            f.write(b"garbage")
+
+        template = loader.load_string(TEMPLATE, filename="page.tk")
+
+        assert "Hello World." in template.render({"name": "World", "items": []})
+
+    def test_unwritable_cache_dir(self, tmp_path):
+        """Test that templates still render if the cache cannot be written."""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        loader = TetTonnikalaLoader(str(blocker / "cache"))
+
+        template = loader.load_string(TEMPLATE, filename="page.tk")
+
+        assert "Hello World." in template.render({"name": "World", "items": []})
+
+    def test_set_cache_dir_keeps_loader_state(self, tmp_path):
+        """Test that the directive keeps search paths and flags."""
+        config = make_config()
+        config.add_tonnikala_search_paths("tet:templates")
+        config.set_tonnikala_l10n(True)
+
+        config.set_tonnikala_cache_dir(str(tmp_path))
+        loader = config.registry.tonnikala_renderer_factory.loader
+
+        assert loader.search_paths == [("tet", "templates")]
+        assert loader.translatable
+
+        config.set_tonnikala_cache_dir(None)
+        loader = config.registry.tonnikala_renderer_factory.loader
+        assert not isinstance(loader, TetTonnikalaLoader)
+        assert loader.search_paths == [("tet", "templates")]
+
+
+def dummy_view(request):
+    return {}
+
+
+@pytest.fixture
+def search_path_config(tmp_path, template_dir):
+    (template_dir / "partials").mkdir()
+    (template_dir / "partials" / "item.tk").write_text("<p>$item</p>")
+    (template_dir / "notes.txt").write_text("not a template")
+
+    config = Configurator()
+    config.include("tet.renderers.tonnikala")
+    config.add_tonnikala_search_paths(str(template_dir))
+    return config
+
+
+class TestWarmTemplates:
+    """Test compiling templates ahead of the first request."""
+
+    def test_find_templates(self, search_path_config, template_dir):
+        """Test that view templates and search path files are found."""
+        config = search_path_config
+        config.add_view(dummy_view, name="a", renderer="page.tk")
+        config.add_view(dummy_view, name="b", renderer="other.tk")
+        config.add_view(dummy_view, name="c", renderer="json")
+        config.commit()
+
+        assert tet_tonnikala.find_tonnikala_templates(config.registry) == [
+            "page.tk",
+            "other.tk",
+            "partials/item.tk",
+        ]
+
+    def test_directive_compiles_templates(self, search_path_config):
+        """Test that warm_tonnikala_templates fills the loader cache."""
+        config = search_path_config
+        config.warm_tonnikala_templates()
+        config.add_view(dummy_view, renderer="page.tk")
+        config.commit()
+
+        loader = config.registry.tonnikala_renderer_factory.loader
+        assert set(loader.cache) == {"page.tk", "partials/item.tk"}
+
+    def test_explicit_names(self, search_path_config):
+        """Test that only the given templates are compiled."""
+        config = search_path_config
+        config.warm_tonnikala_templates("partials/item.tk")
+        config.commit()
+
+        loader = config.registry.tonnikala_renderer_factory.loader
+        assert set(loader.cache) == {"partials/item.tk"}
+
+    def test_failures_are_reported(self, search_path_config, template_dir):
+        """Test that a broken template does not stop the others."""
+        (template_dir / "broken.tk").write_text("<p py:for=''>$</p>")
+        config = search_path_config
+        config.commit()
+
+        results = tet_tonnikala.warm_templates(
+            config.registry, ["broken.tk", "missing.tk", "page.tk"]
+        )
+
+        assert [r.name for r in results] == ["broken.tk", "missing.tk", "page.tk"]
+        assert results[0].error is not None
+        assert results[1].error is not None
+        assert results[2].error is None
+        assert results[2].seconds > 0
+
+    def test_command(self, search_path_config, monkeypatch, capsys):
+        """Test the tet-warm-templates command."""
+        from tet.scripts import warm_templates
+
+        config = search_path_config
+        config.commit()
+
+        class Env(dict):
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+        monkeypatch.setattr(warm_templates, "setup_logging", lambda uri: None)
+        monkeypatch.setattr(
+            warm_templates, "bootstrap", lambda uri: Env(registry=config.registry)
+        )
+
+        assert warm_templates.main(["app.ini"]) == 0
+        output = capsys.readouterr().out
+        assert "page.tk" in output
+        assert "partials/item.tk" in output
+        assert "2 templates" in output
+
+        assert warm_templates.main(["app.ini", "missing.tk"]) == 1
+        assert "FAILED missing.tk" in capsys.readouterr().err
+
+
+BASE_TEMPLATE = """<html><head><title>$title</title></head><body>
+<py:block name="content">default</py:block>
+<input checked="$checked" value="$value"/>
+<p py:attrs="attrs">attrs</p>
+<py:def function="greet(who)">Hi $who!</py:def>${greet(title)}
+</body></html>"""
+
+CHILD_TEMPLATE = """<py:extends href="base.tk"><py:block name="content">
+<ul><li py:for="item in items" class="$item">$item</li></ul>
+<py:with vars="n = len(items)"><p>$n ${sidebar()}</p></py:with>
+<py:if test="items">$literal(items[0])</py:if>
+</py:block></py:extends>"""
+
+
+@pytest.fixture
+def stream_config(template_dir):
+    (template_dir / "base.tk").write_text(BASE_TEMPLATE)
+    (template_dir / "child.tk").write_text(CHILD_TEMPLATE)
+
+    config = Configurator()
+    config.include("tet.renderers.tonnikala")
+    config.add_tonnikala_search_paths(str(template_dir))
+    return config
+
+
+def stream_values(count=3):
+    return {
+        "title": "<T>",
+        "items": [f"<i{n}>" for n in range(count)],
+        "checked": True,
+        "value": "a&b",
+        "attrs": {"id": "x", "hidden": False},
+        "sidebar": lambda: "side",
+    }
+
+
+class TestStreaming:
+    """Test rendering templates in chunks."""
+
+    def test_chunks_match_render(self, stream_config):
+        """Test that the chunks join to the output of a normal render."""
+        plain = stream_config.registry.tonnikala_renderer_factory.loader
+        streaming = TetTonnikalaLoader(streaming=True)
+        streaming.add_search_path(*plain.search_paths[0])
+
+        for name in ["base.tk", "child.tk"]:
+            expected = plain.load(name).render(stream_values())
+            chunks = list(
+                tet_tonnikala.iter_template(streaming.load(name), stream_values())
+            )
+
+            assert "".join(chunks) == expected
+            assert len(chunks) > 1
+
+        assert '<li class="&lt;i0&gt;">&lt;i0&gt;</li>' in expected
+        assert 'checked="checked" value="a&amp;b"' in expected
+        assert '<p id="x">' in expected
+        assert "Hi &lt;T&gt;!" in expected
+
+    def test_loops_flush_by_size(self, stream_config, monkeypatch):
+        """Test that loops yield chunks once the chunk size is exceeded."""
+        monkeypatch.setitem(tet_tonnikala._STREAM_GLOBALS, "__TK__chunk_size", 100)
+        loader = TetTonnikalaLoader(streaming=True)
+        loader.add_search_path(
+            *stream_config.registry.tonnikala_renderer_factory.loader.search_paths[0]
+        )
+
+        chunks = list(
+            tet_tonnikala.iter_template(loader.load("child.tk"), stream_values(200))
+        )
+
+        assert len(chunks) > 20
+        assert max(map(len, chunks)) < 200
+
+    def test_template_without_streaming(self, stream_config):
+        """Test that other templates are yielded as one chunk."""
+        loader = stream_config.registry.tonnikala_renderer_factory.loader
+        template = loader.load("child.tk")
+
+        chunks = list(tet_tonnikala.iter_template(template, stream_values()))
+        assert chunks == [template.render(stream_values())]
+
+    def test_streaming_view(self, stream_config):
+        """Test that a view with stream_template streams its response."""
+        from pyramid.testing import DummyRequest
+        from pyramid.threadlocal import get_current_request
+        from pyramid.view import render_view_to_response
+
+        seen = []
+
+        def sidebar():
+            seen.append(get_current_request())
+            return "side"
+
+        def view(request):
+            return dict(stream_values(), sidebar=sidebar)
+
+        config = stream_config
+        config.add_view(view, name="page", renderer="child.tk", stream_template=True)
+        config.add_view(lambda request: {}, name="plain", renderer="base.tk")
+        config.commit()
+
+        request = DummyRequest()
+        request.registry = config.registry
+        response = render_view_to_response(None, request, name="page")
+
+        app_iter = response.app_iter
+        assert not isinstance(app_iter, (list, tuple))
+        assert app_iter.first.startswith("<html><head><title>&lt;T&gt;")
+        assert seen == []
+
+        body = b"".join(app_iter).decode("utf-8")
+        app_iter.close()
+        assert seen == [request]
+        assert get_current_request() is None
+
+        expected = config.registry.tonnikala_renderer_factory.loader.load(
+            "child.tk"
+        ).render(dict(stream_values(), request=request))
+        assert body == expected
+
+    def test_streaming_view_returns_response(self, stream_config):
+        """Test that a response returned by the view is used as is."""
+        from pyramid.response import Response
+        from pyramid.testing import DummyRequest
+        from pyramid.view import render_view_to_response
+
+        config = stream_config
+        config.add_view(
+            lambda request: Response("direct"),
+            renderer="child.tk",
+            stream_template=True,
+        )
+        config.commit()
+
+        request = DummyRequest()
+        request.registry = config.registry
+        assert render_view_to_response(None, request).body == b"direct"
+
+    def test_requires_tonnikala_renderer(self, stream_config):
+        """Test that other renderers are rejected."""
+        from pyramid.exceptions import ConfigurationError
+
+        config = stream_config
+        config.add_view(dummy_view, renderer="json", stream_template=True)
+
+        with pytest.raises(ConfigurationError, match="stream_template"):
+            config.commit()
+
+    def test_cache_key_includes_streaming(self, tmp_path):
+        """Test that streaming templates are cached separately."""
+        loader = TetTonnikalaLoader(str(tmp_path))
+        key = loader.cache_key(TEMPLATE)
+        loader.streaming = True
+
+        assert loader.cache_key(TEMPLATE) != key
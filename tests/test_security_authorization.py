@@ -4,10 +4,14 @@ Tests for tet.security.authorization module - Enhanced authorization policies.
 
 from unittest.mock import Mock, patch
 
+from pyramid.config import Configurator
+from pyramid.interfaces import IAuthorizationPolicy
+from pyramid.request import Request
 from tet.security.authorization import (
     AuthorizationPolicyWrapper,
     INewAuthorizationPolicy,
     includeme,
+    invalidate_authorization_cache,
 )
 from zope.interface import implementer
 
@@ -97,6 +101,100 @@ class TestAuthorizationPolicyWrapper:
         assert policy.permits.call_args[0][0] is None
 
 
+class CountingPolicy(MockNewAuthorizationPolicy):
+    def __init__(self):
+        self.calls = []
+
+    def permits(self, request, context, principals, permission):
+        self.calls.append((context, permission))
+        return permission == "view"
+
+
+class TestDecisionCache:
+    """Test memoizing authorization decisions per request."""
+
+    def test_cached_per_request(self):
+        """Test that a repeated check does not call the policy again."""
+        policy = CountingPolicy()
+        wrapper = AuthorizationPolicyWrapper(policy, cache=True)
+        request = Request.blank("/")
+        context = object()
+
+        assert wrapper.permits(context, ["a", "b"], "view", request=request)
+        assert wrapper.permits(context, ("b", "a"), "view", request=request)
+        assert not wrapper.permits(context, ["a"], "edit", request=request)
+        assert not wrapper.permits(context, ["a"], "edit", request=request)
+        assert len(policy.calls) == 2
+
+        wrapper.permits(object(), ["a"], "edit", request=request)
+        wrapper.permits(context, ["a"], "view", request=request)
+        wrapper.permits(context, ["a"], "edit", request=Request.blank("/"))
+        assert len(policy.calls) == 5
+
+    def test_context_identity_checked(self):
+        """Test that a new context with a reused id is not a cache hit."""
+        policy = CountingPolicy()
+        wrapper = AuthorizationPolicyWrapper(policy, cache=True)
+        request = Request.blank("/")
+        context = object()
+        wrapper.permits(context, ["a"], "view", request=request)
+
+        [key] = request._tet_authorization_cache
+        request._tet_authorization_cache[key] = (object(), False)
+        assert wrapper.permits(context, ["a"], "view", request=request)
+        assert len(policy.calls) == 2
+
+    def test_invalidate(self):
+        """Test that invalidation makes the policy decide again."""
+        policy = CountingPolicy()
+        wrapper = AuthorizationPolicyWrapper(policy, cache=True)
+        request = Request.blank("/")
+        context = object()
+
+        wrapper.permits(context, ["a"], "view", request=request)
+        invalidate_authorization_cache(request)
+        invalidate_authorization_cache(request)
+        wrapper.permits(context, ["a"], "view", request=request)
+        assert len(policy.calls) == 2
+
+    def test_not_cached_by_default(self):
+        """Test that the cache is opt-in."""
+        policy = CountingPolicy()
+        wrapper = AuthorizationPolicyWrapper(policy)
+        request = Request.blank("/")
+        context = object()
+
+        wrapper.permits(context, ["a"], "view", request=request)
+        wrapper.permits(context, ["a"], "view", request=request)
+        assert len(policy.calls) == 2
+        assert "_tet_authorization_cache" not in request.__dict__
+
+    @patch("tet.security.authorization.get_current_request")
+    def test_given_request_skips_threadlocal(self, mock_get_request):
+        """Test that the current request is not looked up when given."""
+        policy = Mock()
+        wrapper = AuthorizationPolicyWrapper(policy)
+        request = Request.blank("/")
+
+        wrapper.permits(None, [], "view", request=request)
+        wrapper.principals_allowed_by_permission(None, "view", request=request)
+
+        mock_get_request.assert_not_called()
+        policy.permits.assert_called_once_with(request, None, [], "view")
+
+    def test_wrapper_registered(self):
+        """Test that a caching wrapper passes through the directive."""
+        config = Configurator()
+        config.include("tet.security.authorization")
+        config.set_authentication_policy(Mock())
+        wrapper = AuthorizationPolicyWrapper(CountingPolicy(), cache=True)
+
+        config.set_authorization_policy(wrapper)
+        config.commit()
+
+        assert config.registry.getUtility(IAuthorizationPolicy) is wrapper
+
+
 class TestIncludeme:
     """Test the includeme configuration function."""
 
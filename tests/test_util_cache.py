@@ -0,0 +1,98 @@
+"""
+Tests for tet.util.cache module - in-process LRU cache.
+"""
+
+import pytest
+from tet.util.cache import CacheInfo, LRUCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    """Test the LRU cache."""
+
+    def test_get_and_set(self):
+        """Test that set values are returned by get."""
+        cache = LRUCache()
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("b", "missing") == "missing"
+        assert "a" in cache
+        assert "b" not in cache
+        assert len(cache) == 1
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_set_existing_key_refreshes(self):
+        """Test that setting an existing key makes it most recently used."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("a", 10)
+        cache.set("c", 3)
+
+        assert cache.get("a") == 10
+        assert "b" not in cache
+
+    def test_ttl(self):
+        """Test that entries expire after ttl seconds."""
+        timer = FakeTimer()
+        cache = LRUCache(ttl=10, timer=timer)
+        cache.set("a", 1)
+
+        timer.now += 9.5
+        assert cache.get("a") == 1
+
+        timer.now += 1
+        assert "a" not in cache
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_statistics(self):
+        """Test that hits and misses are counted."""
+        cache = LRUCache(maxsize=10)
+        cache.get("a")
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+
+        assert cache.info() == CacheInfo(hits=2, misses=1, maxsize=10, currsize=1)
+
+    def test_discard_and_clear(self):
+        """Test removing entries."""
+        cache = LRUCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+
+        cache.discard("a")
+        cache.discard("missing")
+        assert "a" not in cache
+        assert "b" in cache
+
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.info().hits == 0
+
+    def test_invalid_maxsize(self):
+        """Test that maxsize must be positive."""
+        with pytest.raises(ValueError):
+            LRUCache(maxsize=0)
@@ -2,9 +2,20 @@
 Tests for tet.util.json module - JavaScript-safe JSON serialization.
 """
 
+import datetime
 import json
+import sys
+from types import MappingProxyType
 
-from tet.util.json import js_safe_dumps
+import pytest
+from tet.util.json import (
+    CachedJsSafeDumps,
+    get_json_serializer,
+    js_safe_dumps,
+    js_safe_iterdumps,
+    rep,
+    subs,
+)
 
 
 class TestJsSafeDumps:
@@ -127,3 +138,214 @@ class TestJsSafeDumps:
         assert js_safe_dumps(None) == "null"
         assert js_safe_dumps(True) == "true"
         assert js_safe_dumps(False) == "false"
+
+    def test_matches_regex_substitution(self):
+        """Test that the output equals the original regex-based escaping."""
+        data = {
+            "a/b": ["</script>", "x & y", "\u2028\u2029", "café"],
+            "<k>": {"n": 1.5, "t": True, "none": None},
+        }
+        expected = rep.sub(lambda m: subs[m.group(0)], json.dumps(data))
+        assert js_safe_dumps(data) == expected
+
+    def test_default_hook(self):
+        """Test that default is used for unknown types."""
+        result = js_safe_dumps(
+            {"when": datetime.date(2024, 1, 15)}, default=lambda o: f"<{o}>"
+        )
+        assert result == '{"when": "\\u003c2024-01-15\\u003e"}'
+
+    def test_unserializable_without_default(self):
+        """Test that unknown types raise TypeError without a default."""
+        with pytest.raises(TypeError):
+            js_safe_dumps(object())
+
+    @pytest.mark.parametrize("backend", ["orjson", "ujson"])
+    def test_backend_escapes(self, backend):
+        """Test that fast backends produce equally safe output."""
+        pytest.importorskip(backend)
+        data = {"s": "</script>&\u2028\u2029é", "d": datetime.date(2024, 1, 15)}
+
+        result = js_safe_dumps(data, default=str, backend=backend)
+        for char in subs:
+            assert char not in result
+
+        assert json.loads(result) == {
+            "s": "</script>&\u2028\u2029é",
+            "d": "2024-01-15",
+        }
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected."""
+        with pytest.raises(ValueError, match="Unknown JSON backend"):
+            js_safe_dumps({}, backend="simplejson")
+
+
+class TestGetJsonSerializer:
+    """Test JSON serializer backend selection."""
+
+    def test_stdlib_backend(self):
+        """Test that the stdlib backend is json.dumps."""
+        assert get_json_serializer("stdlib") is json.dumps
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected."""
+        with pytest.raises(ValueError, match="Unknown JSON backend"):
+            get_json_serializer("simplejson")
+
+    def test_missing_backend_falls_back(self, monkeypatch):
+        """Test fallback to the stdlib when the library is missing."""
+        monkeypatch.setitem(sys.modules, "orjson", None)
+
+        with pytest.warns(RuntimeWarning, match="orjson"):
+            assert get_json_serializer("orjson") is json.dumps
+
+    @pytest.mark.parametrize("backend", ["orjson", "ujson"])
+    def test_backend_default_hook(self, backend):
+        """Test that backends call default for unknown types."""
+        pytest.importorskip(backend)
+        dumps = get_json_serializer(backend)
+
+        class Custom:
+            pass
+
+        result = dumps({"c": Custom(), 1: "a/b"}, default=lambda o: "custom")
+        assert json.loads(result) == {"c": "custom", "1": "a/b"}
+
+    @pytest.mark.parametrize("backend", ["orjson", "ujson"])
+    def test_backend_datetime_uses_default(self, backend):
+        """Test that datetimes are passed to the default hook."""
+        pytest.importorskip(backend)
+        dumps = get_json_serializer(backend)
+
+        dt = datetime.datetime(2024, 1, 15, 12, 30)
+        result = dumps([dt], default=lambda o: "adapted")
+        assert json.loads(result) == ["adapted"]
+
+    @pytest.mark.parametrize("backend", ["orjson", "ujson"])
+    def test_backend_sort_keys(self, backend):
+        """Test that sort_keys is supported."""
+        pytest.importorskip(backend)
+        dumps = get_json_serializer(backend)
+
+        assert list(json.loads(dumps({"b": 1, "a": 2}, sort_keys=True))) == [
+            "a",
+            "b",
+        ]
+
+
+class TestJsSafeIterdumps:
+    """Test incremental JavaScript-safe JSON dumping."""
+
+    def test_matches_js_safe_dumps(self):
+        """Test that the joined chunks equal the js_safe_dumps output."""
+        data = {
+            "routes": {f"r{i}": f"/app/{i}/<id>/" for i in range(200)},
+            "text": ["a & b\u2028c\u2029", "</script>", "café"],
+            "nested": [{"n": i, "f": i / 3, "b": None} for i in range(50)],
+        }
+        chunks = list(js_safe_iterdumps(data, chunk_size=100))
+
+        assert len(chunks) > 1
+        assert "".join(chunks) == js_safe_dumps(data)
+
+    def test_chunk_size(self):
+        """Test that chunks are at least chunk_size characters, except the last."""
+        chunks = list(js_safe_iterdumps(list(range(1000)), chunk_size=256))
+
+        assert all(len(chunk) >= 256 for chunk in chunks[:-1])
+        assert json.loads("".join(chunks)) == list(range(1000))
+
+    def test_escapes_every_chunk(self):
+        """Test that dangerous characters are escaped in every chunk."""
+        chunks = list(js_safe_iterdumps(["</script>"] * 100, chunk_size=16))
+
+        for chunk in chunks:
+            for char in subs:
+                assert char not in chunk
+
+    def test_is_lazy(self):
+        """Test that serialization happens while iterating."""
+
+        def default(obj):
+            raise TypeError("not serializable")
+
+        chunks = js_safe_iterdumps([object()], default=default)
+        with pytest.raises(TypeError, match="not serializable"):
+            next(chunks)
+
+    def test_default_hook(self):
+        """Test that default is used for unknown types."""
+        result = "".join(js_safe_iterdumps([datetime.date(2024, 1, 15)], default=str))
+        assert result == '["2024-01-15"]'
+
+    def test_scalar(self):
+        """Test that a scalar is yielded as a single chunk."""
+        assert list(js_safe_iterdumps("<b>")) == ['"\\u003cb\\u003e"']
+
+
+class TestCachedJsSafeDumps:
+    """Test the caching js_safe_dumps variant."""
+
+    def test_explicit_key(self):
+        """Test that values are cached under an explicit key."""
+        dumps = CachedJsSafeDumps()
+        data = {"url": "/a/"}
+
+        first = dumps(data, key="config")
+        data["url"] = "/b/"
+        second = dumps(data, key="config")
+
+        assert first == second == js_safe_dumps({"url": "/a/"})
+        assert dumps.info().hits == 1
+        assert dumps.info().misses == 1
+
+    def test_frozen_mapping_identity(self):
+        """Test that immutable mappings are cached by identity."""
+        dumps = CachedJsSafeDumps()
+        config = MappingProxyType({"html": "<b>", "n": 1})
+
+        assert dumps(config) == js_safe_dumps({"html": "<b>", "n": 1})
+        assert dumps(config) == js_safe_dumps({"html": "<b>", "n": 1})
+        assert dumps(MappingProxyType({"n": 2})) == '{"n": 2}'
+        assert dumps.info().hits == 1
+        assert dumps.info().misses == 2
+
+    def test_mutable_values_not_cached(self):
+        """Test that values without a key or identity are not cached."""
+        dumps = CachedJsSafeDumps()
+        data = {"n": 1}
+
+        assert dumps(data) == '{"n": 1}'
+        data["n"] = 2
+        assert dumps(data) == '{"n": 2}'
+        assert dumps.info().currsize == 0
+
+    def test_ttl(self):
+        """Test that cached values expire."""
+        dumps = CachedJsSafeDumps(ttl=60)
+        now = [100.0]
+        dumps.cache.timer = lambda: now[0]
+
+        dumps({"v": 1}, key="k")
+        now[0] += 61
+        assert dumps({"v": 2}, key="k") == '{"v": 2}'
+
+    def test_invalidate(self):
+        """Test removing cached values."""
+        dumps = CachedJsSafeDumps()
+        dumps({"v": 1}, key="a")
+        dumps({"v": 1}, key="b")
+
+        dumps.invalidate("a")
+        assert dumps({"v": 2}, key="a") == '{"v": 2}'
+        assert dumps({"v": 2}, key="b") == '{"v": 1}'
+
+        dumps.invalidate()
+        assert dumps.info().currsize == 0
+
+    def test_default_and_backend(self):
+        """Test that default and backend are passed to js_safe_dumps."""
+        dumps = CachedJsSafeDumps(default=str, backend="stdlib")
+
+        assert dumps([datetime.date(2024, 1, 15)], key=1) == '["2024-01-15"]'
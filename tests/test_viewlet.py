@@ -0,0 +1,301 @@
+"""
+Tests for tet.viewlet module - Viewlet rendering.
+"""
+
+import threading
+import time
+
+import pytest
+from pyramid import testing
+from pyramid.config import Configurator
+from pyramid.threadlocal import get_current_request
+from tet.viewlet import (
+    IBeforeEachViewletRender,
+    IBeforeViewletRender,
+    Viewlets,
+    get_fragment_renderer,
+    get_viewlet_executor,
+    get_viewlet_system,
+    invalidate_fragment_renderers,
+    render_fragment,
+    viewlet,
+)
+
+
+class FragmentRenderer:
+    created = 0
+
+    def __init__(self, info):
+        FragmentRenderer.created += 1
+        self.info = info
+
+    def fragment(self, tpl, value, system):
+        return f"{tpl}:{value['text']}:{system['extra']}"
+
+
+def make_request(settings=None):
+    config = Configurator(settings=settings)
+    config.add_renderer(".frag", FragmentRenderer)
+    config.commit()
+
+    request = testing.DummyRequest()
+    request.registry = config.registry
+    return request
+
+
+@pytest.fixture(autouse=True)
+def reset_count():
+    FragmentRenderer.created = 0
+
+
+class TestRenderFragment:
+    """Test resolving and caching fragment renderers."""
+
+    def test_renderer_cached_per_registry(self):
+        """Test that the renderer of a template is created once."""
+        request = make_request()
+        system = {"request": request, "extra": "x"}
+
+        assert render_fragment("a.frag", {"text": "1"}, system) == "a.frag:1:x"
+        assert render_fragment("a.frag", {"text": "2"}, system) == "a.frag:2:x"
+        assert FragmentRenderer.created == 1
+
+        render_fragment("b.frag", {"text": "3"}, system)
+        render_fragment(
+            "a.frag", {"text": "4"}, {"request": make_request(), "extra": ""}
+        )
+        assert FragmentRenderer.created == 3
+
+    def test_invalidate(self):
+        """Test that invalidation looks the renderers up again."""
+        request = make_request()
+        first = get_fragment_renderer("a.frag", request.registry)
+
+        invalidate_fragment_renderers(request.registry)
+        second = get_fragment_renderer("a.frag", request.registry)
+
+        assert first is not second
+        assert get_fragment_renderer("a.frag", request.registry) is second
+
+    def test_reload_templates_disables_cache(self):
+        """Test that renderers are not cached when templates are reloaded."""
+        request = make_request({"pyramid.reload_templates": "true"})
+
+        get_fragment_renderer("a.frag", request.registry)
+        get_fragment_renderer("a.frag", request.registry)
+        assert FragmentRenderer.created == 2
+
+    def test_current_registry(self):
+        """Test that the current registry is used by default."""
+        request = make_request()
+        with testing.testConfig(registry=request.registry):
+            assert get_fragment_renderer("a.frag") is get_fragment_renderer(
+                "a.frag", request.registry
+            )
+
+    def test_viewlet_uses_cached_renderer(self):
+        """Test that viewlets render through the cached renderer."""
+
+        @viewlet("c.frag")
+        def item(request):
+            return {"text": "item"}
+
+        request = make_request()
+        request.registry.registerHandler(lambda event: event.update(extra="!"), (dict,))
+
+        assert item(request) == "c.frag:item:!"
+        assert item(request) == "c.frag:item:!"
+        assert FragmentRenderer.created == 1
+
+
+class SlowViewlets(Viewlets):
+    def __init__(self, request, delay=0.2):
+        super().__init__(request)
+        self.delay = delay
+        self.threads = []
+
+    def _wait(self):
+        self.threads.append(
+            (threading.current_thread().name, get_current_request() is self.request)
+        )
+        time.sleep(self.delay)
+
+    @viewlet("sidebar.frag")
+    def sidebar(self):
+        self._wait()
+        return {"text": "sidebar"}
+
+    @viewlet("user.frag")
+    def user_card(self, user):
+        self._wait()
+        return {"text": user}
+
+    @viewlet("broken.frag")
+    def broken(self):
+        raise ValueError("broken viewlet")
+
+    def helper(self):
+        pass
+
+
+class TestPrefetch:
+    """Test running viewlet functions in the thread pool."""
+
+    def make_viewlets(self, delay=0.2):
+        request = make_request({"tet.viewlet.prefetch_workers": "4"})
+        request.registry.registerHandler(lambda event: event.update(extra=""), (dict,))
+        return SlowViewlets(request, delay)
+
+    def test_prefetch_runs_concurrently(self):
+        """Test that prefetched viewlets run at the same time."""
+        viewlets = self.make_viewlets()
+
+        start = time.perf_counter()
+        viewlets.prefetch("sidebar").prefetch_call("user_card", "ann")
+        viewlets.prefetch_call("user_card", user="bob")
+
+        assert viewlets.sidebar() == "sidebar.frag:sidebar:"
+        assert viewlets.user_card("ann") == "user.frag:ann:"
+        assert viewlets.user_card(user="bob") == "user.frag:bob:"
+        assert time.perf_counter() - start < 0.5
+
+        assert len(viewlets.threads) == 3
+        for thread_name, has_request in viewlets.threads:
+            assert thread_name.startswith("tet-viewlet")
+            assert has_request
+
+    def test_unmatched_call_runs_inline(self):
+        """Test that calls with other arguments are not taken from the pool."""
+        viewlets = self.make_viewlets(delay=0)
+        viewlets.prefetch_call("user_card", "ann")
+
+        assert viewlets.user_card("bob") == "user.frag:bob:"
+        assert viewlets.threads[-1][0] == threading.current_thread().name
+
+    def test_errors_raised_on_render(self):
+        """Test that an error of a prefetched viewlet is raised when rendered."""
+        viewlets = self.make_viewlets().prefetch("broken")
+
+        with pytest.raises(ValueError, match="broken viewlet"):
+            viewlets.broken()
+
+    def test_not_a_viewlet(self):
+        """Test that only viewlets can be prefetched."""
+        viewlets = self.make_viewlets()
+
+        with pytest.raises(TypeError, match="not a viewlet"):
+            viewlets.prefetch("helper")
+
+    def test_unused_prefetch_cancelled(self):
+        """Test that prefetches never rendered are cancelled at the end."""
+        viewlets = self.make_viewlets()
+        viewlets.prefetch("sidebar", "sidebar", "sidebar", "sidebar", "sidebar")
+        futures = [future for *_, future in viewlets._prefetched]
+
+        viewlets.request._process_finished_callbacks()
+
+        assert viewlets._prefetched == []
+        assert any(future.cancelled() for future in futures)
+
+    def test_streamed_template(self, tmp_path):
+        """Test that prefetches survive until a streamed template uses them."""
+        pytest.importorskip("tonnikala")
+        from pyramid.request import Request
+
+        (tmp_path / "page.tk").write_text(
+            '<html><body><p py:for="i in range(2)">$i</p>'
+            "$literal(viewlets.sidebar())</body></html>"
+        )
+        config = Configurator(settings={"tet.viewlet.prefetch_workers": "2"})
+        config.include("tet.renderers.tonnikala")
+        config.add_tonnikala_search_paths(str(tmp_path))
+        config.add_renderer(".frag", FragmentRenderer)
+        config.add_subscriber(lambda event: event.update(extra=""), dict)
+        viewlets = []
+
+        def page(request):
+            viewlets.append(SlowViewlets(request, delay=0.1).prefetch("sidebar"))
+            return {"viewlets": viewlets[0]}
+
+        config.add_route("page", "/")
+        config.add_view(
+            page, route_name="page", renderer="page.tk", stream_template=True
+        )
+        response = Request.blank("/").get_response(config.make_wsgi_app())
+
+        [prefetched] = viewlets[0]._prefetched
+        assert not prefetched[-1].cancelled()
+
+        body = b"".join(response.app_iter).decode("utf-8")
+        response.app_iter.close()
+        assert "sidebar.frag:sidebar:" in body
+        assert [name for name, _ in viewlets[0].threads] == ["tet-viewlet_0"]
+        assert viewlets[0]._prefetched == []
+
+    def test_executor_per_registry(self):
+        """Test that each registry has its own bounded pool."""
+        first = self.make_viewlets().request.registry
+        second = self.make_viewlets().request.registry
+
+        assert get_viewlet_executor(first) is get_viewlet_executor(first)
+        assert get_viewlet_executor(first) is not get_viewlet_executor(second)
+        assert get_viewlet_executor(first)._max_workers == 4
+
+
+class TestViewletEvents:
+    """Test the before-render events of viewlets."""
+
+    def test_subscribers_run_once_per_request(self):
+        """Test that IBeforeViewletRender subscribers are memoized."""
+        calls = []
+
+        def add_globals(event):
+            calls.append(event.rendering_val["text"])
+            event["extra"] = len(calls)
+
+        @viewlet("c.frag")
+        def item(request, text):
+            return {"text": text}
+
+        request = make_request()
+        request.registry.registerHandler(add_globals, (IBeforeViewletRender,))
+
+        assert item(request, "a") == "c.frag:a:1"
+        assert item(request, "b") == "c.frag:b:1"
+        assert calls == ["a"]
+
+        other = testing.DummyRequest()
+        other.registry = request.registry
+        assert item(other, "c") == "c.frag:c:2"
+
+    def test_each_viewlet_subscribers(self):
+        """Test that IBeforeEachViewletRender subscribers run every time."""
+
+        def add_text(event):
+            event["extra"] = event.rendering_val["text"].upper()
+
+        @viewlet("c.frag")
+        def item(request, text):
+            return {"text": text}
+
+        request = make_request()
+        request.registry.registerHandler(add_text, (IBeforeEachViewletRender,))
+
+        assert item(request, "a") == "c.frag:a:A"
+        assert item(request, "b") == "c.frag:b:B"
+
+    def test_system_values_not_shared(self):
+        """Test that each rendering gets its own copy of the system values."""
+        request = make_request()
+        request.registry.registerHandler(
+            lambda event: event.update(shared=[]), (IBeforeViewletRender,)
+        )
+
+        first = get_viewlet_system(request, {})
+        first["extra"] = 1
+        second = get_viewlet_system(request, {})
+
+        assert "extra" not in second
+        assert second["request"] is request
+        assert IBeforeEachViewletRender.providedBy(second)
+        assert not IBeforeViewletRender.providedBy(second)
@@ -0,0 +1,228 @@
+"""
+Tests for tet.viewlet.cache module - Fragment cache for viewlets.
+"""
+
+import os
+
+import pytest
+from pyramid import testing
+from pyramid.config import Configurator
+from tet.viewlet import viewlet
+from tet.viewlet.cache import (
+    FileViewletStore,
+    MemoryViewletStore,
+    ViewletCacheStats,
+    get_viewlet_cache,
+    invalidate_viewlet_tags,
+)
+
+
+class FragmentRenderer:
+    def __init__(self, info):
+        self.info = info
+
+    def fragment(self, tpl, value, system):
+        return f"<{tpl}>{value['text']}</{tpl}>"
+
+
+@pytest.fixture
+def config():
+    config = Configurator()
+    config.include("tet.viewlet.cache")
+    config.add_renderer(".frag", FragmentRenderer)
+    config.commit()
+    config.begin()
+    yield config
+    config.end()
+
+
+@pytest.fixture
+def request_(config):
+    request = testing.DummyRequest()
+    request.registry = config.registry
+    return request
+
+
+class Viewlets:
+    def __init__(self, request):
+        self.request = request
+        self.calls = []
+
+    @viewlet("plain.frag")
+    def plain(self):
+        self.calls.append("plain")
+        return {"text": "plain"}
+
+    @viewlet("greeting.frag", cache_key=lambda self, name: name, tags=["users"])
+    def greeting(self, name):
+        self.calls.append(name)
+        return {"text": f"Hi {name}"}
+
+    @viewlet("timed.frag", cache_key=lambda self: "all", ttl=60)
+    def timed(self):
+        self.calls.append("timed")
+        return {"text": str(len(self.calls))}
+
+    @viewlet(
+        "user.frag",
+        cache_key=lambda self, user: user if user else None,
+        tags=lambda self, user: [f"user:{user}"],
+    )
+    def user(self, user):
+        self.calls.append(user)
+        return {"text": str(user)}
+
+
+class TestViewletCache:
+    """Test caching the output of viewlets."""
+
+    def test_uncached_viewlet(self, request_):
+        """Test that viewlets without cache_key render every time."""
+        viewlets = Viewlets(request_)
+
+        assert viewlets.plain() == "<plain.frag>plain</plain.frag>"
+        assert viewlets.plain() == "<plain.frag>plain</plain.frag>"
+        assert viewlets.calls == ["plain", "plain"]
+
+    def test_cached_by_key(self, request_):
+        """Test that a cached fragment skips the viewlet function."""
+        viewlets = Viewlets(request_)
+
+        assert viewlets.greeting("Ann") == "<greeting.frag>Hi Ann</greeting.frag>"
+        assert viewlets.greeting("Ann") == "<greeting.frag>Hi Ann</greeting.frag>"
+        assert viewlets.greeting("Bob") == "<greeting.frag>Hi Bob</greeting.frag>"
+        assert viewlets.calls == ["Ann", "Bob"]
+
+        name = f"{__name__}.Viewlets.greeting"
+        info = get_viewlet_cache(request_.registry).info()
+        assert info[name] == ViewletCacheStats(hits=1, misses=2)
+
+    def test_hit_same_as_miss(self, request_):
+        """Test that a hit returns the same type and escaping as a miss."""
+        markupsafe = pytest.importorskip("markupsafe")
+        viewlets = Viewlets(request_)
+
+        miss = viewlets.greeting("<b>x</b>")
+        hit = viewlets.greeting("<b>x</b>")
+
+        assert type(hit) is type(miss) is str
+        assert markupsafe.escape(hit) == markupsafe.escape(miss)
+
+    def test_none_key_skips_cache(self, request_):
+        """Test that a None cache key renders without the cache."""
+        viewlets = Viewlets(request_)
+        viewlets.user(0)
+        viewlets.user(0)
+
+        assert viewlets.calls == [0, 0]
+        assert get_viewlet_cache(request_.registry).info() == {}
+
+    def test_ttl(self, request_):
+        """Test that cached fragments expire."""
+        now = [100.0]
+        request_.registry.tet_viewlet_cache.store.timer = lambda: now[0]
+        viewlets = Viewlets(request_)
+
+        assert viewlets.timed() == "<timed.frag>1</timed.frag>"
+        assert viewlets.timed() == "<timed.frag>1</timed.frag>"
+        now[0] += 61
+        assert viewlets.timed() == "<timed.frag>2</timed.frag>"
+
+    def test_invalidate_tags(self, request_):
+        """Test that invalidating a tag renders its fragments again."""
+        viewlets = Viewlets(request_)
+        viewlets.greeting("Ann")
+        viewlets.user(1)
+        viewlets.user(2)
+
+        invalidate_viewlet_tags(request_, "users", "user:1")
+        viewlets.greeting("Ann")
+        viewlets.user(1)
+        viewlets.user(2)
+
+        assert viewlets.calls == ["Ann", 1, 2, "Ann", 1]
+
+    def test_default_cache(self):
+        """Test that a memory cache is created without the include."""
+        registry = Configurator().registry
+
+        cache = get_viewlet_cache(registry)
+        assert isinstance(cache.store, MemoryViewletStore)
+        assert get_viewlet_cache(registry) is cache
+
+    def test_settings(self, tmp_path):
+        """Test that the settings choose and size the store."""
+        config = Configurator(settings={"tet.viewlet.cache_maxsize": "10"})
+        config.include("tet.viewlet.cache")
+        assert get_viewlet_cache(config.registry).store.cache.maxsize == 10
+
+        config = Configurator(settings={"tet.viewlet.cache_dir": str(tmp_path)})
+        config.include("tet.viewlet.cache")
+        store = get_viewlet_cache(config.registry).store
+        assert isinstance(store, FileViewletStore)
+        assert store.directory == str(tmp_path)
+
+    def test_set_viewlet_cache(self, config, request_, tmp_path):
+        """Test that the directive replaces the store."""
+        config.set_viewlet_cache(FileViewletStore(str(tmp_path)))
+        viewlets = Viewlets(request_)
+
+        viewlets.greeting("Ann")
+        assert Viewlets(request_).greeting("Ann") == (
+            "<greeting.frag>Hi Ann</greeting.frag>"
+        )
+        assert viewlets.calls == ["Ann"]
+
+
+class TestFileViewletStore:
+    """Test the file-backed fragment store."""
+
+    def test_shared_between_instances(self, tmp_path):
+        """Test that stores on the same directory share fragments and tags."""
+        first = FileViewletStore(str(tmp_path))
+        second = FileViewletStore(str(tmp_path))
+
+        first.set("key", "<p>é</p>", None)
+        assert second.get("key") == "<p>é</p>"
+
+        generation = second.generation("tag")
+        first.bump("tag")
+        assert second.generation("tag") != generation
+
+    def test_expiry(self, tmp_path):
+        """Test that expired fragments are removed."""
+        store = FileViewletStore(str(tmp_path))
+        store.set("key", "value", -1)
+
+        assert store.get("key") is None
+        assert not os.path.exists(store._path("fragments", "key"))
+
+    def test_missing_and_corrupt(self, tmp_path):
+        """Test that missing and unreadable fragments are misses."""
+        store = FileViewletStore(str(tmp_path))
+        assert store.get("key") is None
+
+        store.set("key", "value", None)
+        with open(store._path("fragments", "key"), "wb") as f:
+            f.write(b"garbage")
+        assert store.get("key") is None
+
+    def test_clear(self, tmp_path):
+        """Test that clear removes the fragments."""
+        store = FileViewletStore(str(tmp_path))
+        store.set("a", "1", None)
+        store.set("b", "2", 60)
+
+        store.clear()
+        assert store.get("a") is None
+        assert store.get("b") is None
+
+    def test_unwritable_directory(self, tmp_path):
+        """Test that write errors only make the cache miss."""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        store = FileViewletStore(str(blocker / "cache"))
+
+        store.set("key", "value", None)
+        store.bump("tag")
+        assert store.get("key") is None
@@ -0,0 +1,236 @@
+"""Shared measurement and baseline code for the scripts in ``tools/bench``.
+
+A benchmark is a named zero-argument callable. :func:`measure` runs it a
+number of times and reports
+
+- ``ops_per_sec``: calls per second over all timed calls
+- ``p50_us`` and ``p99_us``: median and 99th percentile latency of a single
+  call, in microseconds
+- ``alloc_bytes``: peak memory allocated by a single call, as traced by
+  :mod:`tracemalloc`
+- ``alloc_blocks``: number of memory blocks allocated by a single call
+  that were still alive when it returned, including the return value
+
+Results can be saved into a JSON baseline file and compared with a later
+run; see :func:`add_arguments` and :func:`report`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+BASELINE_VERSION = 1
+
+# the first snapshot is alive while the second one is taken
+_IGNORE_TRACEMALLOC = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _measure_allocations(func: Callable[[], object], samples: int) -> tuple[int, int]:
+    peak_bytes = []
+    blocks = []
+    for _ in range(samples):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            result = func()
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        del result
+        peak_bytes.append(peak)
+        after = after.filter_traces(_IGNORE_TRACEMALLOC)
+        blocks.append(
+            sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        )
+
+    return min(peak_bytes), min(blocks)
+
+
+def measure(
+    func: Callable[[], object],
+    *,
+    number: int = 200,
+    warmup: int = 10,
+    alloc_samples: int = 3,
+) -> dict[str, float]:
+    """
+    Measure a benchmark.
+
+    Every call is timed separately with :func:`time.perf_counter_ns`, with
+    the garbage collector disabled like :mod:`timeit` does. Allocations are
+    measured in separate calls, because tracing slows down the code a lot.
+
+    :param func: The benchmark
+    :param number: Number of timed calls
+    :param warmup: Number of calls made before timing
+    :param alloc_samples: Number of calls traced for allocations; the
+        smallest figures are reported
+    :return: The results, keyed by metric name
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    clock = time.perf_counter_ns
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(number):
+            start = clock()
+            func()
+            timings.append(clock() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    timings.sort()
+    alloc_bytes, alloc_blocks = _measure_allocations(func, alloc_samples)
+    return {
+        "ops_per_sec": number / (sum(timings) / 1e9),
+        "p50_us": _percentile(timings, 0.50) / 1e3,
+        "p99_us": _percentile(timings, 0.99) / 1e3,
+        "alloc_bytes": alloc_bytes,
+        "alloc_blocks": alloc_blocks,
+    }
+
+
+def environment() -> dict[str, str]:
+    """Describe the interpreter and machine the benchmarks were run on."""
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def load_baseline(path: str) -> dict[str, dict[str, float]]:
+    """Load the results saved by :func:`save_baseline`."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    if data.get("version") != BASELINE_VERSION:
+        raise SystemExit(f"{path}: unsupported baseline version {data.get('version')}")
+
+    return data["results"]
+
+
+def save_baseline(path: str, results: dict[str, dict[str, float]], **meta) -> None:
+    """Save ``results`` along with the environment into a JSON file."""
+    data = {
+        "version": BASELINE_VERSION,
+        "environment": environment(),
+        "meta": meta,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the common command line options of benchmark scripts."""
+    parser.add_argument("--number", type=int, default=200, help="timed calls per case")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed calls first")
+    parser.add_argument(
+        "-k", dest="select", default=None, help="only run cases containing this text"
+    )
+    parser.add_argument("--save", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument(
+        "--compare", metavar="FILE", help="compare the results with a saved baseline"
+    )
+
+
+def _change(current: float, previous: float | None, higher_is_better: bool) -> str:
+    if not previous:
+        return ""
+
+    delta = (current - previous) / previous * 100
+    better = delta > 0 if higher_is_better else delta < 0
+    return f" ({delta:+.1f}%{'' if abs(delta) < 5 else ' +' if better else ' -'})"
+
+
+def report(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]] | None = None,
+    file=None,
+) -> None:
+    """
+    Print ``results`` as a table.
+
+    With a ``baseline``, the relative change of every metric is shown after
+    it; changes of 5 % or more are marked with ``+`` when they are
+    improvements and with ``-`` when they are regressions.
+    """
+    file = file or sys.stdout
+    width = max([len(name) for name in results] + [4])
+    print(
+        f"{'case':<{width}}  {'ops/sec':>20}  {'p50 us':>20}  {'p99 us':>20}"
+        f"  {'alloc KiB':>20}  {'blocks':>18}",
+        file=file,
+    )
+    for name, result in results.items():
+        previous = (baseline or {}).get(name, {})
+        cells = [
+            f"{result['ops_per_sec']:.1f}"
+            + _change(result["ops_per_sec"], previous.get("ops_per_sec"), True),
+            f"{result['p50_us']:.1f}"
+            + _change(result["p50_us"], previous.get("p50_us"), False),
+            f"{result['p99_us']:.1f}"
+            + _change(result["p99_us"], previous.get("p99_us"), False),
+            f"{result['alloc_bytes'] / 1024:.1f}"
+            + _change(result["alloc_bytes"], previous.get("alloc_bytes"), False),
+            f"{result['alloc_blocks']}"
+            + _change(result["alloc_blocks"], previous.get("alloc_blocks"), False),
+        ]
+        print(
+            f"{name:<{width}}  {cells[0]:>20}  {cells[1]:>20}  {cells[2]:>20}"
+            f"  {cells[3]:>20}  {cells[4]:>18}",
+            file=file,
+        )
+
+
+def run(
+    benchmarks: dict[str, Callable[[], object]],
+    args: argparse.Namespace,
+    **meta,
+) -> dict[str, dict[str, float]]:
+    """
+    Run the selected benchmarks with the options added by
+    :func:`add_arguments`, report the results and save or compare them.
+
+    :param benchmarks: The benchmarks keyed by case name
+    :param args: The parsed command line options
+    :param meta: Extra information saved in the baseline, such as the sizes
+        of the payloads
+    :return: The results keyed by case name
+    """
+    baseline = load_baseline(args.compare) if args.compare else None
+
+    results = {}
+    for name, func in benchmarks.items():
+        if args.select and args.select not in name:
+            continue
+
+        results[name] = measure(func, number=args.number, warmup=args.warmup)
+
+    report(results, baseline)
+    if args.save:
+        save_baseline(args.save, results, **meta)
+
+    return results
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark the translation cache of ``request.translate``.
+
+One "page" translates a few hundred distinct message ids over and over, as a
+template-heavy page does, through ``request.translate`` as configured by
+:func:`tet.i18n.configure_i18n`:
+
+- ``uncached``: ``tet.i18n.translation_cache_size = 0``, a new
+  ``TranslationString`` and a catalog lookup per call
+- ``cached``: the default translation cache
+- ``mapping``: calls with a mapping, which always bypass the cache
+
+Each page uses a new request, as in production, so per-request setup is
+included. See ``harness.py`` for the reported metrics.
+
+Usage::
+
+    tools/bench/i18n_translate.py
+    tools/bench/i18n_translate.py --msgids 500 --calls 5000 --save before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import struct
+import sys
+import tempfile
+from typing import Callable
+
+import harness
+from pyramid.config import Configurator
+from pyramid.request import Request, apply_request_extensions
+
+from tet.i18n import configure_i18n
+
+
+def write_mo(path: pathlib.Path, messages: dict[str, str]) -> None:
+    """Write a GNU gettext catalog with the given ``{msgid: msgstr}``."""
+    items = sorted((k.encode("utf-8"), v.encode("utf-8")) for k, v in messages.items())
+    ids = strs = b""
+    offsets = []
+    for msgid, msgstr in items:
+        offsets.append((len(ids), len(msgid), len(strs), len(msgstr)))
+        ids += msgid + b"\0"
+        strs += msgstr + b"\0"
+
+    count = len(items)
+    keys_start = 7 * 4 + 16 * count
+    values_start = keys_start + len(ids)
+    table = []
+    for id_offset, id_length, _, _ in offsets:
+        table += [id_length, keys_start + id_offset]
+    for _, _, str_offset, str_length in offsets:
+        table += [str_length, values_start + str_offset]
+
+    header = struct.pack("Iiiiiii", 0x950412DE, 0, count, 28, 28 + count * 8, 0, 0)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(header + struct.pack(f"{len(table)}i", *table) + ids + strs)
+
+
+def make_registry(locale_dir: str, cache_size: int):
+    config = Configurator(settings={"tet.i18n.translation_cache_size": cache_size})
+    configure_i18n(config, "bench")
+    config.add_translation_dirs(locale_dir)
+    config.commit()
+    return config.registry
+
+
+def make_page(registry, msgids: list[str], calls: int, mapping: bool = False):
+    sequence = [msgids[i % len(msgids)] for i in range(calls)]
+    values = {"n": 1} if mapping else None
+
+    def page():
+        request = Request.blank("/")
+        request.registry = registry
+        request._LOCALE_ = "fi"
+        apply_request_extensions(request)
+        translate = request.translate
+        for msgid in sequence:
+            translate(msgid, mapping=values)
+
+    return page
+
+
+def make_benchmarks(
+    locale_dir: str, msgids: int, calls: int
+) -> dict[str, Callable[[], object]]:
+    """Build the benchmarks, keyed by case name."""
+    messages = {"": "Content-Type: text/plain; charset=UTF-8\n"}
+    ids = [f"Message number {i} ${{n}}" for i in range(msgids)]
+    messages.update((msgid, f"Viesti numero {i} ${{n}}") for i, msgid in enumerate(ids))
+    write_mo(pathlib.Path(locale_dir, "fi", "LC_MESSAGES", "bench.mo"), messages)
+
+    uncached = make_registry(locale_dir, 0)
+    cached = make_registry(locale_dir, 4096)
+    return {
+        "uncached": make_page(uncached, ids, calls),
+        "cached": make_page(cached, ids, calls),
+        "mapping": make_page(cached, ids, calls, mapping=True),
+    }
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--msgids", type=int, default=300, help="distinct msgids")
+    parser.add_argument("--calls", type=int, default=3000, help="calls per page")
+    harness.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as locale_dir:
+        benchmarks = make_benchmarks(locale_dir, args.msgids, args.calls)
+        harness.run(benchmarks, args, msgids=args.msgids, calls=args.calls)
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
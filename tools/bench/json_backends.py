@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Compare the JSON serializer backends of :mod:`tet.renderers.json`.
+
+Renders a few realistic API payloads through renderers built with
+:func:`tet.renderers.json.construct_default_renderer`, once per backend in
+:data:`tet.util.json.JSON_BACKENDS`, and prints the mean time per render.
+Backends whose library is not installed are skipped.
+
+Usage::
+
+    tools/bench/json_backends.py
+    tools/bench/json_backends.py --number 200 --rows 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import importlib.util
+import sys
+import timeit
+import warnings
+
+from tet.renderers.json import construct_default_renderer
+from tet.util.json import JSON_BACKENDS
+
+
+class Author:
+    """A model-like object serialized through a registered adapter."""
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+def author_adapter(obj, request):
+    return {"id": obj.id, "name": obj.name}
+
+
+def make_payloads(rows: int) -> dict[str, object]:
+    """Build the payloads to benchmark, keyed by a short description."""
+    created = datetime.datetime(2024, 1, 15, 12, 30, 45)
+    records = [
+        {
+            "id": i,
+            "title": f"Article number {i}",
+            "tags": ["news", "tech", "python"],
+            "score": i * 0.5,
+            "published": i % 2 == 0,
+            "stats": {"views": i * 10, "likes": i, "ratio": 0.25},
+        }
+        for i in range(rows)
+    ]
+    return {
+        "flat records": records,
+        "datetime rows": [
+            {"id": i, "created": created, "day": created.date()} for i in range(rows)
+        ],
+        "adapter objects": [
+            {"id": i, "author": Author(i, f"Author {i}")} for i in range(rows)
+        ],
+    }
+
+
+def available_backends() -> list[str]:
+    return [
+        backend
+        for backend in JSON_BACKENDS
+        if backend == "stdlib" or importlib.util.find_spec(backend) is not None
+    ]
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000, help="rows per payload")
+    parser.add_argument("--number", type=int, default=50, help="renders per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timings per payload")
+    args = parser.parse_args(argv)
+
+    payloads = make_payloads(args.rows)
+    backends = available_backends()
+
+    renderers = {}
+    for backend in backends:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            renderer = construct_default_renderer(backend=backend)
+
+        renderer.add_adapter(Author, author_adapter)
+        renderers[backend] = renderer({})
+
+    print(f"{'payload':<18}" + "".join(f"{b:>14}" for b in backends))
+    for name, payload in payloads.items():
+        cells = []
+        for backend in backends:
+            render = renderers[backend]
+            best = min(
+                timeit.repeat(
+                    lambda render=render, payload=payload: render(payload, {}),
+                    number=args.number,
+                    repeat=args.repeat,
+                )
+            )
+            cells.append(f"{best / args.number * 1000:>11.3f} ms")
+
+        print(f"{name:<18}" + "".join(cells))
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
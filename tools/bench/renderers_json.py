@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Benchmark the JSON renderer and :func:`tet.util.json.js_safe_dumps`.
+
+Representative payloads are rendered through the ``json`` renderer of a
+real :class:`~pyramid.config.Configurator` with the ``renderers.json``
+feature included, using :func:`pyramid.renderers.render` with a request, as
+a view with ``renderer="json"`` would. The payloads are
+
+- flat records of scalars
+- deeply nested dictionaries and lists
+- rows full of datetimes and dates
+- SQLAlchemy ``Row`` keyed tuples from an in-memory SQLite database
+- objects serialized through ``__json__`` and registered adapters
+
+``js_safe_dumps`` is run on the first two and on a bootstrap-style state
+full of characters that need escaping. The payloads are built
+deterministically, so that runs are comparable. See ``harness.py`` for the
+reported metrics.
+
+Usage::
+
+    tools/bench/renderers_json.py
+    tools/bench/renderers_json.py --backend orjson --rows 5000
+    tools/bench/renderers_json.py --save before.json
+    tools/bench/renderers_json.py --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import sys
+from typing import Callable
+
+import harness
+from pyramid.renderers import render
+from pyramid.request import Request
+
+from tet.config import create_configurator
+from tet.util.json import JSON_BACKENDS, js_safe_dumps
+
+
+class Author:
+    """A model-like object serialized through a registered adapter."""
+
+    def __init__(self, id, name, email):
+        self.id = id
+        self.name = name
+        self.email = email
+
+
+def author_adapter(obj, request):
+    return {"id": obj.id, "name": obj.name, "email": obj.email}
+
+
+class Comment:
+    """An object serialized through its ``__json__`` method."""
+
+    def __init__(self, id, author, body):
+        self.id = id
+        self.author = author
+        self.body = body
+
+    def __json__(self, request):
+        return {"id": self.id, "author": self.author, "body": self.body}
+
+
+def flat_records(rows: int) -> list:
+    return [
+        {
+            "id": i,
+            "title": f"Article number {i}",
+            "url": f"/articles/{i}/",
+            "score": i * 0.5,
+            "published": i % 2 == 0,
+            "category": None if i % 3 else "news",
+        }
+        for i in range(rows)
+    ]
+
+
+def deep_nesting(rows: int, depth: int = 24) -> list:
+    def node(i, level):
+        if level == depth:
+            return {"leaf": i, "values": [i, i + 1, i + 2]}
+
+        return {"level": level, "items": [node(i, level + 1)], "name": f"n{level}"}
+
+    return [node(i, 0) for i in range(max(1, rows // depth))]
+
+
+def datetime_rows(rows: int) -> list:
+    start = datetime.datetime(2024, 1, 15, 12, 30, 45)
+    return [
+        {
+            "id": i,
+            "created": start + datetime.timedelta(minutes=i),
+            "modified": start + datetime.timedelta(hours=i),
+            "published": (start + datetime.timedelta(days=i)).date(),
+            "expires": start.date(),
+        }
+        for i in range(rows)
+    ]
+
+
+def keyed_tuples(rows: int) -> list:
+    from sqlalchemy import (
+        Column,
+        Date,
+        Integer,
+        MetaData,
+        String,
+        Table,
+        create_engine,
+        insert,
+        select,
+    )
+
+    metadata = MetaData()
+    articles = Table(
+        "articles",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("title", String),
+        Column("slug", String),
+        Column("published", Date),
+    )
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(articles),
+            [
+                {
+                    "id": i,
+                    "title": f"Article number {i}",
+                    "slug": f"article-{i}",
+                    "published": datetime.date(2024, 1, 1 + i % 28),
+                }
+                for i in range(rows)
+            ],
+        )
+        return connection.execute(select(articles)).all()
+
+
+def adapter_objects(rows: int) -> list:
+    authors = [Author(i, f"Author {i}", f"author{i}@example.com") for i in range(10)]
+    return [
+        {
+            "id": i,
+            "author": authors[i % 10],
+            "comments": [Comment(i * 3 + j, authors[j], "Nice!") for j in range(3)],
+        }
+        for i in range(rows)
+    ]
+
+
+def bootstrap_state(rows: int) -> dict:
+    return {
+        "user": {"name": "</script><script>alert(1)</script>", "id": 1},
+        "routes": {f"route_{i}": f"/app/section/{i}/<id>/" for i in range(rows)},
+        "messages": [f"Line {i} next & <b>bold</b>" for i in range(rows)],
+    }
+
+
+PAYLOADS = {
+    "flat records": flat_records,
+    "deep nesting": deep_nesting,
+    "datetime rows": datetime_rows,
+    "keyed tuples": keyed_tuples,
+    "adapter objects": adapter_objects,
+}
+
+
+def make_benchmarks(rows: int, backend: str) -> dict[str, Callable[[], object]]:
+    """Build the benchmarks, keyed by case name."""
+    settings = {"tet.json.backend": backend}
+    config = create_configurator(
+        settings=settings, included_features=["renderers.json"]
+    )
+    config.add_json_adapter(for_=Author, adapter=author_adapter)
+    config.commit()
+
+    request = Request.blank("/")
+    request.registry = config.registry
+
+    benchmarks = {}
+    for name, factory in PAYLOADS.items():
+        payload = factory(rows)
+        benchmarks[f"render: {name}"] = lambda payload=payload: render(
+            "json", payload, request=request
+        )
+
+    for name in ["flat records", "deep nesting"]:
+        payload = PAYLOADS[name](rows)
+        benchmarks[f"js_safe_dumps: {name}"] = lambda payload=payload: js_safe_dumps(
+            payload
+        )
+
+    state = bootstrap_state(rows)
+    benchmarks["js_safe_dumps: bootstrap state"] = lambda: js_safe_dumps(state)
+    return benchmarks
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000, help="rows per payload")
+    parser.add_argument(
+        "--backend", choices=JSON_BACKENDS, default="stdlib", help="JSON backend"
+    )
+    harness.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    benchmarks = make_benchmarks(args.rows, args.backend)
+    harness.run(benchmarks, args, rows=args.rows, backend=args.backend)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))